@@ -0,0 +1,52 @@
+"""
+Open time entry lookup through the active_sessions table.
+
+Every clocked-in user has exactly one active_sessions row keyed by user id,
+so "is this user clocked in, and on which entry" is a primary key lookup
+instead of a scan of the user's history for a NULL clock_out_time. The
+primary key also makes concurrent clock-ins for the same user fail with an
+IntegrityError, and closing a session is a conditional delete, so only one
+of two concurrent clock-outs succeeds.
+"""
+from database import db
+from models import ActiveSession, TimeEntry
+
+
+def get_open_entry(user_id):
+    """The user's open time entry, or None when they are clocked out"""
+    return TimeEntry.query.join(
+        ActiveSession, ActiveSession.time_entry_id == TimeEntry.id
+    ).filter(ActiveSession.user_id == user_id).first()
+
+
+def open_session(entry):
+    """Mark a new entry as the user's open one; the flush fails if one is already open"""
+    db.session.add(ActiveSession(user_id=entry.user_id, time_entry=entry, started_at=entry.clock_in_time))
+
+
+def close_session(entry):
+    """Remove the entry's session, returning False if another request already closed it"""
+    closed = ActiveSession.query.filter_by(
+        user_id=entry.user_id,
+        time_entry_id=entry.id
+    ).delete(synchronize_session=False)
+    return closed == 1
+
+
+def rebuild_active_sessions():
+    """Recreate active_sessions from time entries without a clock-out time"""
+    ActiveSession.query.delete(synchronize_session=False)
+
+    # If a user somehow has several open entries, the latest one is theirs
+    open_entries = TimeEntry.query.with_entities(
+        TimeEntry.user_id, TimeEntry.id, TimeEntry.clock_in_time
+    ).filter(TimeEntry.clock_out_time.is_(None)).order_by(TimeEntry.user_id, TimeEntry.clock_in_time).all()
+    latest = {user_id: (entry_id, clock_in_time) for user_id, entry_id, clock_in_time in open_entries}
+
+    db.session.bulk_insert_mappings(ActiveSession, [{
+        'user_id': user_id,
+        'time_entry_id': entry_id,
+        'started_at': clock_in_time
+    } for user_id, (entry_id, clock_in_time) in latest.items()])
+    db.session.commit()
+    return len(latest)
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db
+from rollups import rebuild_entry_overtime
+
+def main():
+    """Add the regular/overtime hour columns to time_entries and fill them for closed entries"""
+    with app.app_context():
+        try:
+            with db.engine.connect() as connection:
+                connection.execute(db.text("""
+                    ALTER TABLE time_entries ADD (
+                        regular_hours NUMBER(8,2),
+                        overtime_hours NUMBER(8,2) DEFAULT 0
+                    )
+                """))
+                connection.commit()
+            print("✅ Overtime columns added to time_entries")
+        except Exception as e:
+            if "column being added already exists" in str(e):
+                print("⚠️  Overtime columns already exist")
+            else:
+                print(f"❌ Error adding overtime columns: {e}")
+                return False
+
+        try:
+            count = rebuild_entry_overtime()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error splitting overtime hours: {e}")
+            return False
+
+        print(f"✅ Regular and overtime hours set for {count} time entries")
+        return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db
+
+def main():
+    """Add the token_version column to users; existing rows start at version 0"""
+    with app.app_context():
+        try:
+            with db.engine.connect() as connection:
+                # The default fills existing rows, so the NOT NULL constraint holds straight away
+                connection.execute(db.text("""
+                    ALTER TABLE users ADD (
+                        token_version NUMBER DEFAULT 0 NOT NULL
+                    )
+                """))
+                connection.commit()
+            print("✅ token_version column added to users")
+        except Exception as e:
+            if "column being added already exists" in str(e):
+                print("⚠️  token_version column already exists")
+            else:
+                print(f"❌ Error adding token_version column: {e}")
+                return False
+
+        return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
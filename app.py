@@ -1,8 +1,7 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
+from flask import Flask, render_template, request, jsonify, redirect, url_for, Response, stream_with_context, g
+from flask_jwt_extended import JWTManager, jwt_required, get_jwt, get_jwt_identity
 from flask_cors import CORS
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
 import os
 from dotenv import load_dotenv
@@ -21,7 +20,9 @@ oracle_url = os.getenv('DATABASE_URL', 'oracle+oracledb://system:MyPassword123@l
 app.config['SQLALCHEMY_DATABASE_URI'] = oracle_url
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key-change-in-production')
-app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(days=1)
+# Access tokens carry role claims, so they are short lived and refreshed
+app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(minutes=int(os.getenv('JWT_ACCESS_TOKEN_MINUTES', '15')))
+app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(days=int(os.getenv('JWT_REFRESH_TOKEN_DAYS', '1')))
 
 # OAuth Configuration
 app.config['GOOGLE_CLIENT_ID'] = os.getenv('GOOGLE_CLIENT_ID')
@@ -39,6 +40,17 @@ login_manager.init_app(app)
 login_manager.login_view = 'login'
 
 from models import *
+from rollups import entry_snapshot, record_entry_change, split_entry_overtime
+from timesheet import parse_timesheet_range, summarize_timesheet
+from change_feed import publish, publish_entry_change, publish_user_change
+from active_sessions import get_open_entry, open_session, close_session
+from sqlalchemy.exc import IntegrityError
+from kiosk import kiosk_required
+from identity_cache import get_identity
+from usernames import save_new_user, username_base
+from password_pool import password_pool, PasswordPoolBusy
+from tokens import (create_user_tokens, refresh_access_token, revoke_user_tokens,
+                    TOKEN_CLAIM_COLUMNS, UserTokenRequired)
 from authlib.integrations.flask_client import OAuth
 from flask import session
 import requests
@@ -59,7 +71,17 @@ google = oauth.register(
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return get_identity(user_id)
+
+@app.errorhandler(PasswordPoolBusy)
+def password_pool_busy(e):
+    response = jsonify({'error': str(e)})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+@app.errorhandler(UserTokenRequired)
+def user_token_required(e):
+    return jsonify({'error': str(e)}), 401
 
 
 @app.route('/')
@@ -79,12 +101,15 @@ def login():
 
         user = User.query.filter_by(username=username).first()
 
-        if user and check_password_hash(user.password_hash, password):
+        stored_hash = user.password_hash if user else None
+        if user and password_pool.verify_and_upgrade(user, password):
+            if user.password_hash != stored_hash:
+                # Rehashed with the configured method
+                db.session.commit()
             login_user(user)
-            access_token = create_access_token(identity=user.id)
             return jsonify({
                 'success': True,
-                'access_token': access_token,
+                **create_user_tokens(user),
                 'user_id': user.id,
                 'role': user.role,
                 'message': 'Login successful'
@@ -94,6 +119,14 @@ def login():
 
     return render_template('login.html')
 
+@app.route('/api/token/refresh', methods=['POST'])
+@jwt_required(refresh=True)
+def refresh_token():
+    access_token = refresh_access_token(get_jwt())
+    if access_token is None:
+        return jsonify({'error': 'Token has been revoked'}), 401
+    return jsonify({'access_token': access_token})
+
 @app.route('/logout')
 @login_required
 def logout():
@@ -111,10 +144,7 @@ def clock_in():
     user_id = current_user.id
     data = request.get_json()
 
-    existing_entry = TimeEntry.query.filter_by(
-        user_id=user_id,
-        clock_out_time=None
-    ).first()
+    existing_entry = get_open_entry(user_id)
 
     if existing_entry:
         return jsonify({'error': 'Already clocked in'}), 400
@@ -127,7 +157,16 @@ def clock_in():
     )
 
     db.session.add(time_entry)
-    db.session.commit()
+    open_session(time_entry)
+
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent request clocked this user in first
+        db.session.rollback()
+        return jsonify({'error': 'Already clocked in'}), 400
+
+    publish_entry_change(user_id, time_entry.clock_in_time.date())
 
     return jsonify({'message': 'Clocked in successfully', 'entry_id': time_entry.id})
 
@@ -136,92 +175,201 @@ def clock_in():
 def clock_out():
     user_id = current_user.id
 
-    time_entry = TimeEntry.query.filter_by(
-        user_id=user_id,
-        clock_out_time=None
-    ).first()
+    time_entry = get_open_entry(user_id)
 
     if not time_entry:
         return jsonify({'error': 'Not currently clocked in'}), 400
 
+    if not close_session(time_entry):
+        db.session.rollback()
+        return jsonify({'error': 'Not currently clocked in'}), 400
+
+    before = entry_snapshot(time_entry)
     time_entry.clock_out_time = datetime.utcnow()
 
     duration = time_entry.clock_out_time - time_entry.clock_in_time
     time_entry.total_hours = duration.total_seconds() / 3600
 
+    record_entry_change(before, time_entry)
+    split_entry_overtime(time_entry)
     db.session.commit()
+    publish_entry_change(user_id, time_entry.clock_in_time.date())
 
-    return jsonify({'message': 'Clocked out successfully', 'total_hours': time_entry.total_hours})
+    return jsonify({
+        'message': 'Clocked out successfully',
+        'total_hours': time_entry.total_hours,
+        'regular_hours': time_entry.regular_hours,
+        'overtime_hours': time_entry.overtime_hours
+    })
 
 @app.route('/api/time-entries')
 @login_required
 def get_time_entries():
+    from pagination import keyset_page, count_entries
+    from sqlalchemy.orm import joinedload
+
     user_id = current_user.id
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
+    cursor = request.args.get('cursor') or None
 
-    query = TimeEntry.query.filter_by(user_id=user_id).order_by(TimeEntry.clock_in_time.desc())
+    query = TimeEntry.query.filter_by(user_id=user_id)
 
-    if per_page:
-        entries = query.limit(per_page).all()
-    else:
-        entries = query.all()
+    try:
+        entries, next_cursor = keyset_page(
+            query.options(joinedload(TimeEntry.project)), cursor, per_page, descending=True, page=page
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-    return jsonify([{
-        'id': entry.id,
-        'clock_in_time': entry.clock_in_time.isoformat(),
-        'clock_out_time': entry.clock_out_time.isoformat() if entry.clock_out_time else None,
-        'total_hours': entry.total_hours,
-        'project_id': entry.project_id
-    } for entry in entries])
+    total = count_entries(query)
+
+    return jsonify({
+        'entries': [{
+            'id': entry.id,
+            'clock_in_time': entry.clock_in_time.isoformat(),
+            'clock_out_time': entry.clock_out_time.isoformat() if entry.clock_out_time else None,
+            'total_hours': entry.total_hours,
+            'regular_hours': entry.regular_hours,
+            'overtime_hours': entry.overtime_hours,
+            'project_id': entry.project_id,
+            'project_name': entry.project.name if entry.project else None
+        } for entry in entries],
+        'total': total,
+        'pages': max(1, (total + per_page - 1) // per_page),
+        'current_page': page,
+        'next_cursor': next_cursor
+    })
 
 @app.route('/api/current-status')
 @login_required
 def get_current_status():
-    user_id = current_user.id
-    current_entry = TimeEntry.query.filter_by(
-        user_id=user_id,
-        clock_out_time=None
-    ).first()
+    from status_cache import status_cache
 
-    if current_entry:
-        return jsonify({
-            'status': 'clocked_in',
-            'entry_id': current_entry.id,
-            'clock_in_time': current_entry.clock_in_time.isoformat(),
-            'project_id': current_entry.project_id
-        })
-    else:
-        return jsonify({
-            'status': 'clocked_out'
-        })
+    status = status_cache.get(current_user.id)
+
+    response = jsonify(status.payload)
+    response.set_etag(status.etag)
+    response.last_modified = status.last_modified
+    # Browsers must revalidate, which unchanged polls answer with a 304
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+@app.route('/api/events')
+@login_required
+def api_events():
+    from live_events import (event_hub, format_event, watched_user_ids, RESYNC,
+                             EVENTS_KEEPALIVE_SECONDS, EVENTS_STREAM_ENABLED)
+    from status_cache import status_cache
+
+    # 204 tells EventSource not to reconnect, so the page keeps polling
+    if not EVENTS_STREAM_ENABLED:
+        return '', 204
+
+    user_id = current_user.id
+    subscription = event_hub.subscribe(user_id, watched_user_ids(current_user))
+
+    def stream():
+        try:
+            yield 'retry: 5000\n\n'
+            yield format_event('status', status_cache.get(user_id).payload)
+            # Idle streams must not hold on to a pooled database connection
+            db.session.close()
+
+            while True:
+                changed = subscription.wait(EVENTS_KEEPALIVE_SECONDS)
+                if changed is None:
+                    yield ': keepalive\n\n'
+                    continue
+
+                if RESYNC in changed:
+                    yield format_event('resync', {})
+                    changed = {user_id}
+
+                for changed_id in changed:
+                    payload = status_cache.get(changed_id).payload
+                    if changed_id == user_id:
+                        yield format_event('status', payload)
+                    else:
+                        yield format_event('presence', dict(payload, user_id=changed_id))
+                db.session.close()
+        finally:
+            event_hub.unsubscribe(subscription)
+
+    db.session.close()
+    return Response(stream_with_context(stream()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
 
 @app.route('/api/weekly-summary')
 @login_required
 def get_weekly_summary():
     user_id = current_user.id
-    from datetime import datetime, timedelta
 
     # Get start and end of current week
     today = datetime.now().date()
     start_of_week = today - timedelta(days=today.weekday())
     end_of_week = start_of_week + timedelta(days=6)
 
-    entries = TimeEntry.query.filter(
-        TimeEntry.user_id == user_id,
-        TimeEntry.clock_in_time >= start_of_week,
-        TimeEntry.clock_in_time <= end_of_week + timedelta(days=1)
-    ).all()
-
-    total_hours = sum(entry.total_hours or 0 for entry in entries)
+    summary = summarize_timesheet(user_id, start_of_week, end_of_week)
 
     return jsonify({
-        'total_hours': total_hours,
-        'entries_count': len(entries),
+        'total_hours': summary['total_hours'],
+        'entries_count': summary['entries_count'],
         'week_start': start_of_week.isoformat(),
         'week_end': end_of_week.isoformat()
     })
 
+@app.route('/api/timesheet-summary')
+@login_required
+def api_timesheet_summary():
+    employee_id = request.args.get('employee_id', type=int)
+
+    # Employees can only see their own timesheet
+    if employee_id and employee_id != current_user.id and current_user.role not in ['admin', 'manager']:
+        return jsonify({'error': 'Insufficient permissions'}), 403
+
+    try:
+        start_date, end_date = parse_timesheet_range(
+            request.args.get('start_date'),
+            request.args.get('end_date')
+        )
+        summary = summarize_timesheet(
+            employee_id or current_user.id, start_date, end_date,
+            request.args.get('group_by', 'day')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify(summary)
+
+@app.route('/api/payroll')
+@login_required
+def api_payroll():
+    from payroll import OvertimeRules, run_payroll, PAYROLL_DAILY_OVERTIME_HOURS, PAYROLL_WEEKLY_OVERTIME_HOURS
+
+    if current_user.role not in ['admin', 'hr']:
+        return jsonify({'error': 'Access denied'}), 403
+
+    try:
+        start_date = datetime.strptime(request.args['start_date'], '%Y-%m-%d').date()
+        end_date = datetime.strptime(request.args['end_date'], '%Y-%m-%d').date()
+        if end_date < start_date:
+            raise ValueError('end_date must not be before start_date')
+
+        rules = OvertimeRules(
+            request.args.get('daily_overtime_hours', PAYROLL_DAILY_OVERTIME_HOURS, type=float),
+            request.args.get('weekly_overtime_hours', PAYROLL_WEEKLY_OVERTIME_HOURS, type=float)
+        )
+    except KeyError as e:
+        return jsonify({'error': f'Missing required parameter: {e.args[0]}'}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify(run_payroll(start_date, end_date, rules, request.args.get('department_id', type=int)))
+
 @app.route('/schedule')
 @login_required
 def schedule():
@@ -244,28 +392,35 @@ def profile():
 def update_profile():
     try:
         data = request.get_json()
+        # current_user is a cached snapshot, so changes go to the ORM object
+        user = current_user.record()
 
         # Update user information
-        current_user.first_name = data.get('first_name', current_user.first_name)
-        current_user.last_name = data.get('last_name', current_user.last_name)
-        current_user.email = data.get('email', current_user.email)
+        user.first_name = data.get('first_name', user.first_name)
+        user.last_name = data.get('last_name', user.last_name)
+        user.email = data.get('email', user.email)
 
         # Update department if provided
         department_id = data.get('department_id')
+        previous_department_id = user.department_id
         if department_id:
-            current_user.department_id = int(department_id)
+            user.department_id = int(department_id)
         elif department_id == '':
-            current_user.department_id = None
+            user.department_id = None
+        if user.department_id != previous_department_id:
+            # Issued tokens carry the old department
+            revoke_user_tokens(user)
 
         # Update password if provided
         new_password = data.get('new_password')
         if new_password:
             current_password = data.get('current_password')
-            if not current_password or not check_password_hash(current_user.password_hash, current_password):
+            if not current_password or not password_pool.verify(user.password_hash, current_password):
                 return jsonify({'success': False, 'message': 'Current password is incorrect'}), 400
-            current_user.password_hash = generate_password_hash(new_password)
+            user.password_hash = password_pool.hash(new_password)
 
         db.session.commit()
+        publish_user_change(user.id)
         return jsonify({'success': True, 'message': 'Profile updated successfully'})
 
     except Exception as e:
@@ -359,10 +514,11 @@ def api_users():
             last_name=data['last_name'],
             role=data.get('role', 'employee'),
             department_id=department_id,
-            password_hash=generate_password_hash(data['password'])
+            password_hash=password_pool.hash(data['password'])
         )
         db.session.add(user)
         db.session.commit()
+        publish_user_change(user.id)
         return jsonify({'success': True, 'message': 'User created successfully'})
 
     users = User.query.all()
@@ -377,6 +533,44 @@ def api_users():
         'created_at': u.created_at.isoformat() if u.created_at else None
     } for u in users])
 
+@app.route('/api/users/import', methods=['POST'])
+@login_required
+def api_import_users():
+    from user_import import (UserImportError, parse_import, import_users, count_passwords,
+                             USER_IMPORT_WEB_PASSWORD_ROWS)
+
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    options = request.form if request.files else request.args
+    try:
+        upload = request.files.get('file')
+        if upload:
+            format_type = options.get('format') or upload.filename.rsplit('.', 1)[-1].lower()
+            rows = parse_import(upload.read().decode('utf-8-sig'), format_type)
+        elif request.is_json:
+            rows = parse_import(request.get_json(), 'json')
+        else:
+            rows = parse_import(request.get_data(as_text=True), options.get('format', 'csv'))
+    except (UserImportError, UnicodeDecodeError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    dry_run = options.get('dry_run', 'false').lower() == 'true'
+    # Hashing is slow, so large imports with passwords run from import_users.py instead
+    if not dry_run and count_passwords(rows) > USER_IMPORT_WEB_PASSWORD_ROWS:
+        return jsonify({
+            'error': f'At most {USER_IMPORT_WEB_PASSWORD_ROWS} users with passwords can be imported here; '
+                     'use import_users.py for larger imports'
+        }), 413
+
+    summary = import_users(
+        rows,
+        dry_run=dry_run,
+        skip_invalid=options.get('skip_invalid', 'false').lower() == 'true'
+    )
+    status = 400 if summary['invalid'] and not summary['created'] and not summary['dry_run'] else 200
+    return jsonify(summary), status
+
 @app.route('/api/users/<int:user_id>', methods=['DELETE'])
 @login_required
 def delete_user(user_id):
@@ -392,11 +586,60 @@ def delete_user(user_id):
     try:
         db.session.delete(user)
         db.session.commit()
+        publish_user_change(user_id)
         return jsonify({'success': True, 'message': 'User deleted successfully'})
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': 'Failed to delete user: ' + str(e)}), 500
 
+@app.route('/api/users/<int:user_id>', methods=['PUT'])
+@login_required
+def update_user(user_id):
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    user = User.query.get_or_404(user_id)
+    data = request.get_json() or {}
+
+    if data.get('role') is not None and data['role'] not in ['admin', 'manager', 'hr', 'employee']:
+        return jsonify({'error': 'Invalid role'}), 400
+    if user.id == current_user.id and (data.get('role', 'admin') != 'admin' or data.get('is_active') is False):
+        return jsonify({'error': 'Cannot demote or deactivate your own account'}), 400
+
+    before = {column: getattr(user, column) for column in TOKEN_CLAIM_COLUMNS}
+    if data.get('role') is not None:
+        user.role = data['role']
+    if 'department_id' in data:
+        user.department_id = int(data['department_id']) if data['department_id'] not in (None, '') else None
+    if 'is_active' in data:
+        user.is_active = bool(data['is_active'])
+
+    if any(getattr(user, column) != value for column, value in before.items()):
+        revoke_user_tokens(user)
+
+    db.session.commit()
+    publish_user_change(user_id)
+    return jsonify({'success': True, 'message': 'User updated successfully'})
+
+@app.route('/api/users/<int:user_id>/badge', methods=['PUT'])
+@login_required
+def set_user_badge(user_id):
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    user = User.query.get_or_404(user_id)
+    data = request.get_json() or {}
+    user.badge_code = (data.get('badge_code') or '').strip() or None
+
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': 'Badge code is already assigned to another user'}), 409
+
+    publish_user_change(user_id)
+    return jsonify({'success': True, 'message': 'Badge updated successfully'})
+
 @app.route('/api/projects', methods=['GET', 'POST'])
 @login_required
 def api_projects():
@@ -461,6 +704,7 @@ def api_geofences():
         )
         db.session.add(geofence)
         db.session.commit()
+        publish('geofences', geofence_id=geofence.id)
         return jsonify({'success': True, 'message': 'Geofence created successfully'})
 
     geofences = Geofence.query.all()
@@ -474,243 +718,129 @@ def api_geofences():
         'created_at': g.created_at.isoformat() if g.created_at else None
     } for g in geofences])
 
+GEOFENCE_CHECK_MAX_POINTS = 10000
+GEOFENCE_AUDIT_PAGE_SIZE = 5000
+
+def _geofence_results(latitudes, longitudes):
+    from auth import evaluate_geofences
+    from geofence_index import geofence_index
+
+    fences = geofence_index.fences
+    names = {fence.id: fence.name for fence in fences}
+    containing, nearest, distances = evaluate_geofences(latitudes, longitudes, fences)
+
+    return [{
+        'inside': fence_id != -1,
+        'geofence_id': fence_id if fence_id != -1 else None,
+        'geofence_name': names.get(fence_id),
+        'nearest_geofence_id': nearest_id if nearest_id != -1 else None,
+        'nearest_geofence_name': names.get(nearest_id),
+        'distance_outside_m': None if distance != distance else round(distance, 1)
+    } for fence_id, nearest_id, distance in zip(containing.tolist(), nearest.tolist(), distances.tolist())]
+
+@app.route('/api/geofences/check', methods=['POST'])
+@login_required
+def api_geofences_check():
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    data = request.get_json() or {}
+    points = data.get('points') or []
+
+    if len(points) > GEOFENCE_CHECK_MAX_POINTS:
+        return jsonify({'error': f'At most {GEOFENCE_CHECK_MAX_POINTS} points per request'}), 400
+
+    try:
+        latitudes = [float(p['latitude']) if p.get('latitude') is not None else float('nan') for p in points]
+        longitudes = [float(p['longitude']) if p.get('longitude') is not None else float('nan') for p in points]
+    except (TypeError, ValueError, AttributeError):
+        return jsonify({'error': 'Each point needs numeric latitude and longitude'}), 400
+
+    return jsonify({'results': _geofence_results(latitudes, longitudes)})
+
+@app.route('/api/geofences/audit')
+@login_required
+def api_geofences_audit():
+    from reports import parse_report_range
+    from pagination import keyset_page
+
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    limit = request.args.get('limit', GEOFENCE_AUDIT_PAGE_SIZE, type=int)
+    if not 1 <= limit <= GEOFENCE_CHECK_MAX_POINTS:
+        return jsonify({'error': f'limit must be between 1 and {GEOFENCE_CHECK_MAX_POINTS}'}), 400
+
+    try:
+        start_date, end_date = parse_report_range(request.args.get('start_date'), request.args.get('end_date'))
+
+        # Each request checks at most one page of entries; next_cursor continues the audit
+        entries, next_cursor = keyset_page(
+            TimeEntry.query.with_entities(
+                TimeEntry.id, TimeEntry.user_id, TimeEntry.clock_in_time,
+                TimeEntry.location_lat, TimeEntry.location_lon
+            ).filter(
+                TimeEntry.clock_in_time >= start_date,
+                TimeEntry.clock_in_time < end_date + timedelta(days=1),
+                TimeEntry.location_lat.isnot(None),
+                TimeEntry.location_lon.isnot(None)
+            ),
+            request.args.get('cursor') or None,
+            limit,
+            max_per_page=GEOFENCE_CHECK_MAX_POINTS
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    results = _geofence_results([e.location_lat for e in entries], [e.location_lon for e in entries])
+
+    # Only entries recorded outside every current fence are listed
+    outside = [dict(result, entry_id=entry.id, user_id=entry.user_id,
+                    clock_in_time=entry.clock_in_time.isoformat(),
+                    latitude=entry.location_lat, longitude=entry.location_lon)
+               for entry, result in zip(entries, results) if not result['inside']]
+
+    return jsonify({
+        'start_date': start_date.date().isoformat(),
+        'end_date': end_date.date().isoformat(),
+        'checked': len(entries),
+        'outside_count': len(outside),
+        'outside': outside,
+        'next_cursor': next_cursor
+    })
+
 @app.route('/api/reports', methods=['GET'])
 @login_required
 def api_reports():
-    from datetime import datetime, timedelta
-    from sqlalchemy import func
+    from reports import parse_report_range, build_report
+    from report_cache import cached_report
 
     # Get query parameters
     report_type = request.args.get('report_type', 'attendance')
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
     employee_id = request.args.get('employee_id')
     page = int(request.args.get('page', 1))
+    cursor = request.args.get('cursor') or None
     per_page = 20
 
     try:
-        # Parse dates
-        if start_date:
-            start_date = datetime.strptime(start_date, '%Y-%m-%d')
-        else:
-            start_date = datetime.now() - timedelta(days=7)
-
-        if end_date:
-            end_date = datetime.strptime(end_date, '%Y-%m-%d')
-        else:
-            end_date = datetime.now()
-
-        # Base query for time entries
-        query = TimeEntry.query.filter(
-            TimeEntry.clock_in_time >= start_date,
-            TimeEntry.clock_in_time <= end_date + timedelta(days=1)
+        start_date, end_date = parse_report_range(
+            request.args.get('start_date'),
+            request.args.get('end_date')
         )
 
-        # Filter by employee if specified and user has permission
-        if employee_id and current_user.role in ['admin', 'manager']:
-            query = query.filter(TimeEntry.user_id == employee_id)
-        elif current_user.role not in ['admin', 'manager']:
-            # Regular users can only see their own data
-            query = query.filter(TimeEntry.user_id == current_user.id)
-
-        # Get time entries for calculations
-        time_entries = query.all()
-
-        # Calculate summary statistics
-        total_hours = 0
-        regular_hours = 0
-        overtime_hours = 0
-
-        for entry in time_entries:
-            if entry.clock_out_time:
-                duration = (entry.clock_out_time - entry.clock_in_time).total_seconds() / 3600
-                total_hours += duration
-                if duration <= 8:
-                    regular_hours += duration
-                else:
-                    regular_hours += 8
-                    overtime_hours += duration - 8
-
-        # Calculate attendance rate (simplified)
-        working_days = (end_date - start_date).days + 1
-        attendance_rate = (len(set(entry.clock_in_time.date() for entry in time_entries)) / max(working_days, 1)) * 100
-
-        summary = {
-            'total_hours': total_hours,
-            'regular_hours': regular_hours,
-            'overtime_hours': overtime_hours,
-            'attendance_rate': attendance_rate
-        }
-
-        # Generate chart data based on report type
-        if report_type == 'attendance':
-            chart_data = generate_attendance_chart(time_entries, start_date, end_date)
-        elif report_type == 'overtime':
-            chart_data = generate_overtime_chart(time_entries, start_date, end_date)
-        elif report_type == 'project':
-            chart_data = generate_project_chart(time_entries, start_date, end_date)
-        else:
-            chart_data = generate_attendance_chart(time_entries, start_date, end_date)
-
-        # Generate secondary chart (time distribution)
-        secondary_chart = {
-            'labels': ['Regular Hours', 'Overtime Hours', 'Break Time'],
-            'datasets': [{
-                'data': [regular_hours, overtime_hours, total_hours * 0.1],
-                'backgroundColor': ['#198754', '#ffc107', '#6c757d']
-            }]
-        }
-
-        # Generate table data
-        table_data = generate_table_data(time_entries, report_type, page, per_page)
-
-        return jsonify({
-            'summary': summary,
-            'chart_data': chart_data,
-            'secondary_chart': secondary_chart,
-            'table_data': table_data,
-            'pagination': {
-                'current_page': page,
-                'total_pages': max(1, (len(time_entries) + per_page - 1) // per_page)
-            }
-        })
+        return jsonify(cached_report(
+            current_user, report_type, start_date, end_date, employee_id, page, per_page, cursor,
+            lambda: build_report(
+                current_user, report_type, start_date, end_date,
+                employee_id=employee_id, page=page, per_page=per_page, cursor=cursor
+            )
+        ))
 
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-def generate_attendance_chart(time_entries, start_date, end_date):
-    from collections import defaultdict
-
-    daily_hours = defaultdict(float)
-
-    for entry in time_entries:
-        if entry.clock_out_time:
-            date_key = entry.clock_in_time.date()
-            duration = (entry.clock_out_time - entry.clock_in_time).total_seconds() / 3600
-            daily_hours[date_key] += duration
-
-    # Generate labels for all days in range
-    current_date = start_date.date()
-    end_date_only = end_date.date()
-    labels = []
-    data = []
-
-    while current_date <= end_date_only:
-        labels.append(current_date.strftime('%m/%d'))
-        data.append(daily_hours.get(current_date, 0))
-        current_date += timedelta(days=1)
-
-    return {
-        'labels': labels,
-        'datasets': [{
-            'label': 'Daily Hours',
-            'data': data,
-            'borderColor': '#0d6efd',
-            'backgroundColor': 'rgba(13, 110, 253, 0.1)',
-            'tension': 0.1
-        }]
-    }
-
-def generate_overtime_chart(time_entries, start_date, end_date):
-    from collections import defaultdict
-
-    daily_overtime = defaultdict(float)
-
-    for entry in time_entries:
-        if entry.clock_out_time:
-            date_key = entry.clock_in_time.date()
-            duration = (entry.clock_out_time - entry.clock_in_time).total_seconds() / 3600
-            if duration > 8:
-                daily_overtime[date_key] += duration - 8
-
-    # Generate labels for all days in range
-    current_date = start_date.date()
-    end_date_only = end_date.date()
-    labels = []
-    data = []
-
-    while current_date <= end_date_only:
-        labels.append(current_date.strftime('%m/%d'))
-        data.append(daily_overtime.get(current_date, 0))
-        current_date += timedelta(days=1)
-
-    return {
-        'labels': labels,
-        'datasets': [{
-            'label': 'Overtime Hours',
-            'data': data,
-            'borderColor': '#ffc107',
-            'backgroundColor': 'rgba(255, 193, 7, 0.1)',
-            'tension': 0.1
-        }]
-    }
-
-def generate_project_chart(time_entries, start_date, end_date):
-    from collections import defaultdict
-
-    project_hours = defaultdict(float)
-
-    for entry in time_entries:
-        if entry.clock_out_time:
-            project_name = entry.project.name if entry.project else 'No Project'
-            duration = (entry.clock_out_time - entry.clock_in_time).total_seconds() / 3600
-            project_hours[project_name] += duration
-
-    return {
-        'labels': list(project_hours.keys()),
-        'datasets': [{
-            'label': 'Project Hours',
-            'data': list(project_hours.values()),
-            'borderColor': '#198754',
-            'backgroundColor': 'rgba(25, 135, 84, 0.1)',
-            'tension': 0.1
-        }]
-    }
-
-def generate_table_data(time_entries, report_type, page, per_page):
-    start_index = (page - 1) * per_page
-    end_index = start_index + per_page
-    page_entries = time_entries[start_index:end_index]
-
-    if report_type == 'attendance':
-        headers = ['Date', 'Employee', 'Clock In', 'Clock Out', 'Total Hours', 'Status']
-        rows = []
-        for entry in page_entries:
-            duration = 0
-            status = 'Incomplete'
-            if entry.clock_out_time:
-                duration = (entry.clock_out_time - entry.clock_in_time).total_seconds() / 3600
-                status = 'Complete'
-
-            rows.append([
-                entry.clock_in_time.strftime('%Y-%m-%d'),
-                f"{entry.user.first_name} {entry.user.last_name}",
-                entry.clock_in_time.strftime('%H:%M'),
-                entry.clock_out_time.strftime('%H:%M') if entry.clock_out_time else 'N/A',
-                f"{duration:.2f}",
-                status
-            ])
-    else:
-        # Default table structure
-        headers = ['Date', 'Employee', 'Hours', 'Notes']
-        rows = []
-        for entry in page_entries:
-            duration = 0
-            if entry.clock_out_time:
-                duration = (entry.clock_out_time - entry.clock_in_time).total_seconds() / 3600
-
-            rows.append([
-                entry.clock_in_time.strftime('%Y-%m-%d'),
-                f"{entry.user.first_name} {entry.user.last_name}",
-                f"{duration:.2f}",
-                entry.notes or 'N/A'
-            ])
-
-    return {
-        'headers': headers,
-        'rows': rows
-    }
-
 @app.route('/api/employees', methods=['GET'])
 @login_required
 def api_employees():
@@ -756,23 +886,118 @@ def api_departments():
         'created_at': d.created_at.isoformat() if d.created_at else None
     } for d in departments])
 
+@app.route('/api/audit-logs')
+@login_required
+def api_audit_logs():
+    from audit_archive import search_audit_logs
+
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    try:
+        start = datetime.strptime(request.args['start_date'], '%Y-%m-%d') if request.args.get('start_date') else None
+        end = datetime.strptime(request.args['end_date'], '%Y-%m-%d') + timedelta(days=1) \
+            if request.args.get('end_date') else None
+    except ValueError:
+        return jsonify({'error': 'Dates must be in YYYY-MM-DD format'}), 400
+
+    limit = min(max(request.args.get('limit', 100, type=int), 1), 1000)
+    logs = search_audit_logs(
+        user_id=request.args.get('user_id', type=int),
+        table_name=request.args.get('table_name') or None,
+        record_id=request.args.get('record_id', type=int),
+        action=request.args.get('action') or None,
+        start=start,
+        end=end,
+        limit=limit,
+        include_archive=request.args.get('include_archived', 'true').lower() != 'false'
+    )
+
+    return jsonify({'logs': logs, 'count': len(logs), 'limit': limit})
+
 @app.route('/api/export-report', methods=['POST'])
 @login_required
 def api_export_report():
+    from reports import parse_report_range
+    from exports import EXPORT_FORMATS
+    from export_jobs import enqueue_export, job_to_dict
+
     try:
         data = request.get_json()
-        format_type = data.get('format', 'pdf')
+        format_type = data.get('format', 'csv')
+        filters = data.get('report_filters') or {}
+
+        if format_type not in EXPORT_FORMATS:
+            return jsonify({'error': f'Unsupported export format: {format_type}'}), 400
+
+        # Validate the dates now rather than failing later in the worker
+        parse_report_range(filters.get('start_date'), filters.get('end_date'))
+
+        job = enqueue_export(current_user, format_type, {
+            'start_date': filters.get('start_date'),
+            'end_date': filters.get('end_date'),
+            'employee_id': filters.get('employee_id'),
+            'report_type': filters.get('report_type')
+        })
 
-        # For now, return a simple success message
-        # In a full implementation, this would generate actual files
         return jsonify({
             'success': True,
-            'message': f'Report export in {format_type} format initiated',
-            'download_url': f'/downloads/report.{format_type}'
-        })
+            'message': f'Report export in {format_type} format queued',
+            **job_to_dict(job)
+        }), 202
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/export-jobs/<int:job_id>', methods=['GET'])
+@login_required
+def api_export_job_status(job_id):
+    from export_jobs import can_access_job, job_to_dict
+
+    job = ExportJob.query.get_or_404(job_id)
+    if not can_access_job(current_user, job):
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    return jsonify(job_to_dict(job))
+
+@app.route('/api/export-jobs/<int:job_id>/cancel', methods=['POST'])
+@login_required
+def api_cancel_export_job(job_id):
+    from export_jobs import can_access_job, cancel_job, job_to_dict, FINISHED_STATUSES
+
+    job = ExportJob.query.get_or_404(job_id)
+    if not can_access_job(current_user, job):
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    if job.status in FINISHED_STATUSES:
+        return jsonify({'error': f'Export job already {job.status}'}), 400
+
+    cancel_job(job)
+    return jsonify(job_to_dict(job))
+
+@app.route('/downloads/<int:job_id>')
+@login_required
+def download_export(job_id):
+    from flask import send_file
+    from exports import EXPORT_FORMATS
+    from export_jobs import can_access_job
+
+    job = ExportJob.query.get_or_404(job_id)
+    if not can_access_job(current_user, job):
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    if job.status != 'completed' or not job.file_path or not os.path.exists(job.file_path):
+        return jsonify({'error': f'Export is not available (status: {job.status})'}), 404
+
+    writer, mimetype, extension = EXPORT_FORMATS[job.format]
+    return send_file(
+        job.file_path,
+        mimetype=mimetype,
+        as_attachment=True,
+        download_name=f'report_{job.id}.{extension}'
+    )
+
 # Blueprints temporarily disabled due to circular imports
 # Will be added back once circular import issues are resolved
 
@@ -781,10 +1006,7 @@ def api_export_report():
 def start_break():
     user_id = current_user.id
 
-    active_entry = TimeEntry.query.filter_by(
-        user_id=user_id,
-        clock_out_time=None
-    ).first()
+    active_entry = get_open_entry(user_id)
 
     if not active_entry:
         return jsonify({'error': 'Not currently clocked in'}), 400
@@ -797,23 +1019,127 @@ def end_break():
     user_id = current_user.id
     data = request.get_json()
 
-    active_entry = TimeEntry.query.filter_by(
-        user_id=user_id,
-        clock_out_time=None
-    ).first()
+    active_entry = get_open_entry(user_id)
 
     if not active_entry:
         return jsonify({'error': 'Not currently clocked in'}), 400
 
+    before = entry_snapshot(active_entry)
     break_duration = data.get('break_duration', 0)
     if active_entry.break_duration is None:
         active_entry.break_duration = 0
     active_entry.break_duration += break_duration
 
+    record_entry_change(before, active_entry)
     db.session.commit()
+    publish_entry_change(user_id, active_entry.clock_in_time.date())
 
     return jsonify({'message': 'Break ended', 'total_break_duration': active_entry.break_duration})
 
+@app.route('/api/clock-events/batch', methods=['POST'])
+@login_required
+def clock_events_batch():
+    from clock_events import ClockEventError, apply_clock_events
+
+    data = request.get_json() or {}
+
+    try:
+        results = apply_clock_events(current_user.id, data.get('events'))
+    except ClockEventError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'applied': sum(1 for result in results if result['status'] == 'applied'),
+        'rejected': sum(1 for result in results if result['status'] == 'rejected'),
+        'results': results
+    })
+
+# Kiosk terminal routes
+@app.route('/api/kiosk/terminals', methods=['GET', 'POST'])
+@login_required
+def api_kiosk_terminals():
+    from kiosk import register_terminal
+
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    if request.method == 'POST':
+        data = request.get_json() or {}
+        if not data.get('name'):
+            return jsonify({'error': 'Terminal name is required'}), 400
+
+        terminal, secret = register_terminal(data['name'], data.get('geofence_id'))
+        return jsonify({
+            'success': True,
+            'id': terminal.id,
+            'name': terminal.name,
+            # Only returned once; store it on the terminal
+            'secret': secret
+        }), 201
+
+    terminals = KioskTerminal.query.order_by(KioskTerminal.id).all()
+    return jsonify([{
+        'id': t.id,
+        'name': t.name,
+        'geofence_id': t.geofence_id,
+        'is_active': t.is_active,
+        'created_at': t.created_at.isoformat() if t.created_at else None,
+        'last_authenticated_at': t.last_authenticated_at.isoformat() if t.last_authenticated_at else None
+    } for t in terminals])
+
+@app.route('/api/kiosk/terminals/<int:terminal_id>/deactivate', methods=['POST'])
+@login_required
+def deactivate_kiosk_terminal(terminal_id):
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    terminal = KioskTerminal.query.get_or_404(terminal_id)
+    terminal.is_active = False
+    db.session.commit()
+    publish('kiosk_terminals', terminal_id=terminal_id)
+
+    return jsonify({'success': True, 'message': 'Terminal deactivated'})
+
+@app.route('/api/kiosk/auth', methods=['POST'])
+def kiosk_auth():
+    from kiosk import authenticate_terminal, KIOSK_TOKEN_HOURS
+
+    data = request.get_json() or {}
+    try:
+        terminal_id = int(data.get('terminal_id'))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'terminal_id must be an integer'}), 400
+
+    access_token = authenticate_terminal(terminal_id, data.get('secret'))
+    if not access_token:
+        return jsonify({'error': 'Invalid terminal credentials'}), 401
+
+    return jsonify({'access_token': access_token, 'expires_in': KIOSK_TOKEN_HOURS * 3600})
+
+@app.route('/api/kiosk/scan', methods=['POST'])
+@kiosk_required
+def kiosk_scan():
+    from kiosk import kiosk_directory, record_scan, KioskScanError
+
+    data = request.get_json() or {}
+    employee = kiosk_directory.badge(data.get('badge'))
+    if employee is None:
+        return jsonify({'error': 'Unknown badge'}), 404
+
+    try:
+        action, entry = record_scan(g.kiosk_terminal, employee, data.get('action', 'toggle'))
+    except KioskScanError as e:
+        return jsonify({'error': str(e), 'employee': employee.name}), 409
+
+    return jsonify({
+        'action': action,
+        'employee': employee.name,
+        'entry_id': entry.id,
+        'clock_in_time': entry.clock_in_time.isoformat(),
+        'clock_out_time': entry.clock_out_time.isoformat() if entry.clock_out_time else None,
+        'total_hours': entry.total_hours
+    })
+
 # OAuth Routes
 @app.route('/auth/google')
 def google_login():
@@ -867,17 +1193,7 @@ def google_callback():
                 db.session.commit()
             else:
                 # Create new user
-                username = email.split('@')[0]
-                counter = 1
-                original_username = username
-
-                # Ensure username is unique
-                while User.query.filter_by(username=username).first():
-                    username = f"{original_username}{counter}"
-                    counter += 1
-
                 user = User(
-                    username=username,
                     email=email,
                     first_name=first_name,
                     last_name=last_name,
@@ -889,9 +1205,7 @@ def google_callback():
                     auth_provider='google',
                     email_verified=True  # Google emails are verified
                 )
-
-                db.session.add(user)
-                db.session.commit()
+                save_new_user(user, username_base(email))
 
         # Check if user account is active
         if not user.is_active:
@@ -902,7 +1216,7 @@ def google_callback():
         db.session.commit()
 
         # Create JWT token and log in user
-        access_token = create_access_token(identity=user.id)
+        access_token = create_user_tokens(user)['access_token']
         login_user(user)
 
         # Store user info in session for frontend
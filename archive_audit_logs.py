@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app
+from audit_archive import (archive_audit_logs, prune_archive, AUDIT_ARCHIVE_DIR, AUDIT_ARCHIVE_BATCH_SIZE,
+                           AUDIT_ARCHIVE_KEEP_MONTHS, AUDIT_RETENTION_DAYS)
+
+def main():
+    parser = argparse.ArgumentParser(description='Move old audit log rows into compressed monthly archive segments')
+    parser.add_argument('--older-than-days', type=int, default=AUDIT_RETENTION_DAYS,
+                        help='Archive rows older than this many days')
+    parser.add_argument('--batch-size', type=int, default=AUDIT_ARCHIVE_BATCH_SIZE,
+                        help='Rows archived and deleted per transaction')
+    parser.add_argument('--keep-months', type=int, default=AUDIT_ARCHIVE_KEEP_MONTHS,
+                        help='Delete archived months older than this, 0 keeps them forever')
+    args = parser.parse_args()
+
+    if args.older_than_days < 1 or args.batch_size < 1:
+        print("❌ --older-than-days and --batch-size must be positive")
+        return False
+
+    with app.app_context():
+        try:
+            archived = archive_audit_logs(args.older_than_days, args.batch_size)
+        except Exception as e:
+            print(f"❌ Error archiving audit logs: {e}")
+            return False
+
+    if archived:
+        for month, count in sorted(archived.items()):
+            print(f"✅ Archived {count} audit records for {month}")
+    else:
+        print(f"⚠️  No audit records older than {args.older_than_days} days")
+
+    for month in prune_archive(args.keep_months):
+        print(f"✅ Removed archived audit records for {month}")
+
+    print(f"   Archive directory: {AUDIT_ARCHIVE_DIR}")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,292 @@
+"""
+Archival of old audit log rows into compressed monthly segments.
+
+archive_audit_logs() moves rows older than AUDIT_RETENTION_DAYS out of
+audit_logs into one append-only segment per month under AUDIT_ARCHIVE_DIR.
+Each run appends its rows to the segment as separate gzip members, which
+gzip readers treat as one stream. A small JSON index next to the segment
+records the byte range of every block, with its time range, user ids and
+record id ranges. Searches therefore decompress only the blocks that can
+match.
+
+The segment is synced and the index replaced before the rows are deleted. An
+interrupted run leaves, at worst, rows that are both archived and still live,
+and search_audit_logs() returns those only once.
+"""
+import fcntl
+import gzip
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from database import db
+from models import AuditLog
+
+AUDIT_ARCHIVE_DIR = os.getenv('AUDIT_ARCHIVE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'audit_archive'))
+AUDIT_RETENTION_DAYS = int(os.getenv('AUDIT_RETENTION_DAYS', '90'))
+# Archived months older than this are deleted, 0 keeps them forever
+AUDIT_ARCHIVE_KEEP_MONTHS = int(os.getenv('AUDIT_ARCHIVE_KEEP_MONTHS', '0'))
+AUDIT_ARCHIVE_BATCH_SIZE = 5000
+# Oracle accepts at most 1000 expressions in an IN list
+IN_LIST_SIZE = 1000
+
+AUDIT_COLUMNS = ('id', 'user_id', 'action', 'table_name', 'record_id', 'old_values', 'new_values',
+                 'ip_address', 'user_agent', 'timestamp')
+
+
+def _month_key(timestamp):
+    return timestamp.strftime('%Y-%m')
+
+
+def _month_start(month):
+    return datetime.strptime(month, '%Y-%m')
+
+
+def _next_month(month):
+    start = _month_start(month)
+    return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def segment_path(month):
+    return os.path.join(AUDIT_ARCHIVE_DIR, f'audit-{month}.jsonl.gz')
+
+
+def index_path(month):
+    return os.path.join(AUDIT_ARCHIVE_DIR, f'audit-{month}.index.json')
+
+
+def archived_months():
+    """Months with an archive segment, oldest first"""
+    if not os.path.isdir(AUDIT_ARCHIVE_DIR):
+        return []
+    return sorted(name[len('audit-'):-len('.index.json')] for name in os.listdir(AUDIT_ARCHIVE_DIR)
+                  if name.startswith('audit-') and name.endswith('.index.json'))
+
+
+def load_index(month):
+    try:
+        with open(index_path(month)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'month': month, 'size': 0, 'rows': 0, 'blocks': []}
+
+
+def _write_index(month, index):
+    tmp_path = index_path(month) + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f, separators=(',', ':'))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, index_path(month))
+
+
+@contextmanager
+def _archive_lock():
+    """Serialize archive runs and pruning on this host"""
+    os.makedirs(AUDIT_ARCHIVE_DIR, exist_ok=True)
+    with open(os.path.join(AUDIT_ARCHIVE_DIR, '.lock'), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _row_to_dict(row):
+    record = {column: getattr(row, column) for column in AUDIT_COLUMNS}
+    record['timestamp'] = row.timestamp.isoformat()
+    return record
+
+
+def _block_summary(records):
+    record_ranges = {}
+    for record in records:
+        if record['table_name'] is None or record['record_id'] is None:
+            continue
+        low, high = record_ranges.get(record['table_name'], (record['record_id'], record['record_id']))
+        record_ranges[record['table_name']] = [min(low, record['record_id']), max(high, record['record_id'])]
+
+    return {
+        'rows': len(records),
+        'first_ts': min(record['timestamp'] for record in records),
+        'last_ts': max(record['timestamp'] for record in records),
+        'min_id': min(record['id'] for record in records),
+        'max_id': max(record['id'] for record in records),
+        'user_ids': sorted({record['user_id'] for record in records if record['user_id'] is not None}),
+        'records': record_ranges
+    }
+
+
+def append_block(month, records):
+    """Append records to the month's segment as one gzip member and index it"""
+    index = load_index(month)
+    payload = ''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records)
+    data = gzip.compress(payload.encode('utf-8'))
+
+    with open(segment_path(month), 'ab') as f:
+        # Drop bytes from a run that stopped before it could update the index
+        if f.tell() != index['size']:
+            f.truncate(index['size'])
+            f.seek(index['size'])
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+    block = _block_summary(records)
+    block.update(offset=index['size'], length=len(data))
+    index['blocks'].append(block)
+    index['size'] += len(data)
+    index['rows'] += len(records)
+    _write_index(month, index)
+    return block
+
+
+def archive_audit_logs(older_than_days=AUDIT_RETENTION_DAYS, batch_size=AUDIT_ARCHIVE_BATCH_SIZE, now=None):
+    """Move audit rows older than the cutoff into the archive, returning rows archived per month"""
+    cutoff = (now or datetime.utcnow()) - timedelta(days=older_than_days)
+    archived = {}
+
+    with _archive_lock():
+        last_id = 0
+        while True:
+            rows = AuditLog.query.with_entities(*(getattr(AuditLog, column) for column in AUDIT_COLUMNS)).filter(
+                AuditLog.timestamp < cutoff,
+                AuditLog.id > last_id
+            ).order_by(AuditLog.id).limit(batch_size).all()
+            if not rows:
+                break
+
+            by_month = {}
+            for row in rows:
+                by_month.setdefault(_month_key(row.timestamp), []).append(_row_to_dict(row))
+            for month, records in sorted(by_month.items()):
+                append_block(month, records)
+                archived[month] = archived.get(month, 0) + len(records)
+
+            # Delete exactly the rows just archived; a row committed late inside their
+            # id range is left for the next run instead of being lost
+            ids = [row.id for row in rows]
+            for i in range(0, len(ids), IN_LIST_SIZE):
+                AuditLog.query.filter(
+                    AuditLog.timestamp < cutoff,
+                    AuditLog.id.in_(ids[i:i + IN_LIST_SIZE])
+                ).delete(synchronize_session=False)
+            db.session.commit()
+            last_id = rows[-1].id
+
+    return archived
+
+
+def prune_archive(keep_months=AUDIT_ARCHIVE_KEEP_MONTHS, now=None):
+    """Delete archived months older than keep_months, returning the months removed"""
+    if keep_months <= 0:
+        return []
+
+    now = now or datetime.utcnow()
+    months = now.year * 12 + now.month - keep_months
+    oldest_kept = f'{months // 12:04d}-{months % 12 + 1:02d}'
+
+    removed = []
+    with _archive_lock():
+        for month in archived_months():
+            if month >= oldest_kept:
+                break
+            # The index goes first so a half-removed month is never searched
+            os.remove(index_path(month))
+            if os.path.exists(segment_path(month)):
+                os.remove(segment_path(month))
+            removed.append(month)
+    return removed
+
+
+def _block_may_match(block, user_id, table_name, record_id, start, end):
+    if start and block['last_ts'] < start.isoformat():
+        return False
+    if end and block['first_ts'] >= end.isoformat():
+        return False
+    if user_id is not None and user_id not in block['user_ids']:
+        return False
+    if table_name is not None:
+        record_range = block['records'].get(table_name)
+        if record_range is None:
+            return False
+        if record_id is not None and not record_range[0] <= record_id <= record_range[1]:
+            return False
+    elif record_id is not None and not any(low <= record_id <= high for low, high in block['records'].values()):
+        return False
+    return True
+
+
+def _record_matches(record, user_id, table_name, record_id, action, start, end):
+    return ((user_id is None or record['user_id'] == user_id)
+            and (table_name is None or record['table_name'] == table_name)
+            and (record_id is None or record['record_id'] == record_id)
+            and (action is None or record['action'] == action)
+            and (start is None or record['timestamp'] >= start.isoformat())
+            and (end is None or record['timestamp'] < end.isoformat()))
+
+
+def read_block(month, block):
+    with open(segment_path(month), 'rb') as f:
+        f.seek(block['offset'])
+        data = gzip.decompress(f.read(block['length']))
+    return [json.loads(line) for line in data.decode('utf-8').splitlines()]
+
+
+def search_archive(user_id=None, table_name=None, record_id=None, action=None, start=None, end=None, limit=100):
+    """Archived records matching the filters, newest first"""
+    results = []
+    seen = set()
+    for month in reversed(archived_months()):
+        if start and _next_month(month) <= start:
+            break
+        if end and _month_start(month) >= end:
+            continue
+        # Every later month is older than what has been collected already
+        if len(results) >= limit and _next_month(month).isoformat() <= results[limit - 1]['timestamp']:
+            break
+
+        for block in load_index(month)['blocks']:
+            if _block_may_match(block, user_id, table_name, record_id, start, end):
+                for record in read_block(month, block):
+                    # A run interrupted before its delete archives the same rows again next time
+                    if record['id'] not in seen and _record_matches(record, user_id, table_name, record_id,
+                                                                    action, start, end):
+                        seen.add(record['id'])
+                        results.append(record)
+        results.sort(key=lambda record: (record['timestamp'], record['id']), reverse=True)
+
+    return results[:limit]
+
+
+def search_audit_logs(user_id=None, table_name=None, record_id=None, action=None, start=None, end=None,
+                      limit=100, include_archive=True):
+    """Audit records from the live table and the archive, newest first"""
+    query = AuditLog.query.with_entities(*(getattr(AuditLog, column) for column in AUDIT_COLUMNS))
+    if user_id is not None:
+        query = query.filter(AuditLog.user_id == user_id)
+    if table_name is not None:
+        query = query.filter(AuditLog.table_name == table_name)
+    if record_id is not None:
+        query = query.filter(AuditLog.record_id == record_id)
+    if action is not None:
+        query = query.filter(AuditLog.action == action)
+    if start is not None:
+        query = query.filter(AuditLog.timestamp >= start)
+    if end is not None:
+        query = query.filter(AuditLog.timestamp < end)
+
+    results = [_row_to_dict(row) for row in
+               query.order_by(AuditLog.timestamp.desc(), AuditLog.id.desc()).limit(limit).all()]
+    for record in results:
+        record['archived'] = False
+
+    if include_archive:
+        live_ids = {record['id'] for record in results}
+        for record in search_archive(user_id, table_name, record_id, action, start, end, limit):
+            if record['id'] not in live_ids:
+                record['archived'] = True
+                results.append(record)
+        results.sort(key=lambda record: (record['timestamp'], record['id']), reverse=True)
+
+    return results[:limit]
@@ -0,0 +1,148 @@
+"""
+Buffered audit log writer.
+
+With AUDIT_LOG_MODE=buffered (the default) audit records are queued in memory
+and a background thread writes them with one multi-row insert whenever
+AUDIT_FLUSH_SIZE records are waiting or AUDIT_FLUSH_INTERVAL seconds have
+passed, so logging no longer adds a commit to the request that triggered it.
+Whatever is still queued is written at interpreter exit. AUDIT_LOG_MODE=sync
+writes and commits each record immediately, as before.
+
+A batch that fails while the database is reachable is retried at the next
+AUDIT_FLUSH_RETRIES flushes. After that its rows are inserted one at a time,
+and any row that still fails is logged with its values and dropped, so one
+bad record cannot hold up every later one.
+"""
+import atexit
+import logging
+import os
+import threading
+from collections import deque
+from database import db
+from models import AuditLog
+
+AUDIT_LOG_MODE = os.getenv('AUDIT_LOG_MODE', 'buffered')
+AUDIT_FLUSH_SIZE = int(os.getenv('AUDIT_FLUSH_SIZE', '200'))
+AUDIT_FLUSH_INTERVAL = float(os.getenv('AUDIT_FLUSH_INTERVAL', '2.0'))
+# Records beyond this are dropped, oldest first, if the database stays unavailable
+AUDIT_BUFFER_LIMIT = int(os.getenv('AUDIT_BUFFER_LIMIT', '50000'))
+AUDIT_FLUSH_RETRIES = int(os.getenv('AUDIT_FLUSH_RETRIES', '3'))
+
+logger = logging.getLogger(__name__)
+
+
+class AuditWriter:
+    def __init__(self, mode=AUDIT_LOG_MODE, flush_size=AUDIT_FLUSH_SIZE, flush_interval=AUDIT_FLUSH_INTERVAL,
+                 buffer_limit=AUDIT_BUFFER_LIMIT, retries=AUDIT_FLUSH_RETRIES):
+        self.mode = mode
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.retries = retries
+        self._failures = 0
+        self._buffer = deque(maxlen=buffer_limit)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._app = None
+        self._thread = None
+        self._pid = None
+
+    def record(self, app, row):
+        """Queue one audit_logs row (a dict of column values)"""
+        if self.mode == 'sync':
+            db.session.add(AuditLog(**row))
+            db.session.commit()
+            return
+
+        with self._lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                logger.error('Audit buffer full, dropping the oldest record')
+            self._buffer.append(row)
+            pending = len(self._buffer)
+
+            # Started lazily so each forked worker gets its own thread
+            if self._thread is None or self._pid != os.getpid():
+                self._app = app
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+                self._thread.start()
+
+        if pending >= self.flush_size:
+            self._wake.set()
+
+    def flush(self):
+        """Write everything queued so far, returning the number of rows written"""
+        with self._flush_lock:
+            with self._lock:
+                rows = list(self._buffer)
+                self._buffer.clear()
+            if not rows or self._app is None:
+                return 0
+
+            with self._app.app_context():
+                try:
+                    connection = db.engine.connect()
+                except Exception:
+                    logger.exception('Audit database unavailable, keeping %d records for the next flush', len(rows))
+                    self._requeue(rows)
+                    return 0
+
+                with connection:
+                    return self._write(connection, rows)
+
+    def _write(self, connection, rows):
+        insert = AuditLog.__table__.insert()
+        try:
+            with connection.begin():
+                connection.execute(insert, rows)
+            self._failures = 0
+            return len(rows)
+        except Exception:
+            self._failures += 1
+            if self._failures < self.retries:
+                logger.exception('Failed to write %d audit records, keeping them for the next flush', len(rows))
+                self._requeue(rows)
+                return 0
+            logger.exception('Failed to write %d audit records %d times, writing them one at a time',
+                             len(rows), self._failures)
+
+        self._failures = 0
+        written = 0
+        for index, row in enumerate(rows):
+            try:
+                with connection.begin():
+                    connection.execute(insert, row)
+                written += 1
+            except Exception:
+                if connection.invalidated:
+                    logger.exception('Lost the audit database, keeping %d records for the next flush',
+                                     len(rows) - index)
+                    self._requeue(rows[index:])
+                    break
+                logger.exception('Dropping audit record that cannot be written: %r', row)
+        return written
+
+    def _requeue(self, rows):
+        """Put unwritten rows back ahead of newer ones, dropping the oldest if the buffer overflows"""
+        with self._lock:
+            rows = rows + list(self._buffer)
+            overflow = len(rows) - self._buffer.maxlen
+            if overflow > 0:
+                logger.error('Audit buffer full, dropping the %d oldest records', overflow)
+                rows = rows[overflow:]
+            self._buffer.clear()
+            self._buffer.extend(rows)
+
+    def pending(self):
+        with self._lock:
+            return len(self._buffer)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+
+audit_writer = AuditWriter()
+atexit.register(audit_writer.flush)
@@ -1,19 +1,24 @@
 from functools import wraps
 from flask import request, jsonify, current_app
-from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
-from models import User, AuditLog
-from app import db
-import bcrypt
+from flask_jwt_extended import verify_jwt_in_request, get_jwt
+from audit_writer import audit_writer
+from tokens import current_identity
+from password_pool import password_pool
+from datetime import datetime
+import math
+import numpy as np
+
+GEOFENCE_BATCH_CHUNK = 4096
 
 def require_role(required_role):
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
             verify_jwt_in_request()
-            user_id = get_jwt_identity()
-            user = User.query.get(user_id)
+            claims = get_jwt()
 
-            if not user or not user.is_active:
+            # The role comes from the token; the version check catches revoked tokens
+            if 'role' not in claims or current_identity(claims) is None:
                 return jsonify({'error': 'User not found or inactive'}), 401
 
             role_hierarchy = {
@@ -23,7 +28,7 @@ def require_role(required_role):
                 'admin': 4
             }
 
-            user_level = role_hierarchy.get(user.role, 0)
+            user_level = role_hierarchy.get(claims['role'], 0)
             required_level = role_hierarchy.get(required_role, 5)
 
             if user_level < required_level:
@@ -34,47 +39,34 @@ def require_role(required_role):
     return decorator
 
 def hash_password(password):
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    return password_pool.hash(password)
 
 def check_password(password, hashed_password):
-    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+    return password_pool.verify(hashed_password, password)
 
 def log_action(user_id, action, table_name=None, record_id=None, old_values=None, new_values=None):
     try:
-        audit_log = AuditLog(
-            user_id=user_id,
-            action=action,
-            table_name=table_name,
-            record_id=record_id,
-            old_values=str(old_values) if old_values else None,
-            new_values=str(new_values) if new_values else None,
-            ip_address=request.remote_addr if request else None,
-            user_agent=request.headers.get('User-Agent') if request else None
-        )
-        db.session.add(audit_log)
-        db.session.commit()
+        audit_writer.record(current_app._get_current_object(), {
+            'user_id': user_id,
+            'action': action,
+            'table_name': table_name,
+            'record_id': record_id,
+            'old_values': str(old_values) if old_values else None,
+            'new_values': str(new_values) if new_values else None,
+            'ip_address': request.remote_addr if request else None,
+            'user_agent': request.headers.get('User-Agent') if request else None,
+            'timestamp': datetime.utcnow()
+        })
     except Exception as e:
         current_app.logger.error(f"Failed to log action: {e}")
 
 def validate_geofence(latitude, longitude, allowed_geofences):
-    from models import Geofence
-    import math
+    from geofence_index import geofence_index
 
     if not latitude or not longitude:
         return False
 
-    active_geofences = Geofence.query.filter_by(is_active=True).all()
-
-    for geofence in active_geofences:
-        distance = calculate_distance(
-            latitude, longitude,
-            geofence.center_lat, geofence.center_lon
-        )
-
-        if distance <= geofence.radius:
-            return True
-
-    return False
+    return geofence_index.find(latitude, longitude) is not None
 
 def calculate_distance(lat1, lon1, lat2, lon2):
     R = 6371000
@@ -90,4 +82,62 @@ def calculate_distance(lat1, lon1, lat2, lon2):
 
     c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
 
-    return R * c
\ No newline at end of file
+    return R * c
+
+def calculate_distances(latitudes, longitudes, fence_lats, fence_lons):
+    """Haversine distances in meters between N points and M fence centers as an N x M array"""
+    R = 6371000
+
+    lat1_rad = np.radians(np.asarray(latitudes, dtype=np.float64))[:, None]
+    lat2_rad = np.radians(np.asarray(fence_lats, dtype=np.float64))[None, :]
+    delta_lat = lat2_rad - lat1_rad
+    delta_lon = np.radians(np.asarray(fence_lons, dtype=np.float64)[None, :] -
+                           np.asarray(longitudes, dtype=np.float64)[:, None])
+
+    a = (np.sin(delta_lat / 2) ** 2 +
+         np.cos(lat1_rad) * np.cos(lat2_rad) * np.sin(delta_lon / 2) ** 2)
+
+    return R * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+def evaluate_geofences(latitudes, longitudes, geofences):
+    """
+    Check N points against M geofences in one vectorised pass.
+
+    Returns three arrays of length N: the id of the first fence containing
+    each point (-1 if none), the id of the nearest fence, and the distance in
+    meters from that fence's boundary (0 when inside). Points with missing
+    coordinates get -1 ids and a NaN distance.
+    """
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    count = latitudes.size
+
+    containing = np.full(count, -1, dtype=np.int64)
+    nearest = np.full(count, -1, dtype=np.int64)
+    nearest_distance = np.full(count, np.nan)
+    if not geofences or not count:
+        return containing, nearest, nearest_distance
+
+    fence_ids = np.array([g.id for g in geofences], dtype=np.int64)
+    fence_lats = np.array([g.center_lat for g in geofences], dtype=np.float64)
+    fence_lons = np.array([g.center_lon for g in geofences], dtype=np.float64)
+    radii = np.array([g.radius for g in geofences], dtype=np.float64)
+
+    # Chunk the points so the N x M matrices stay small
+    for start in range(0, count, GEOFENCE_BATCH_CHUNK):
+        chunk = slice(start, start + GEOFENCE_BATCH_CHUNK)
+        valid = ~(np.isnan(latitudes[chunk]) | np.isnan(longitudes[chunk]))
+        rows = np.flatnonzero(valid) + start
+        if not rows.size:
+            continue
+
+        outside_by = calculate_distances(latitudes[rows], longitudes[rows], fence_lats, fence_lons) - radii
+        inside = outside_by <= 0
+        has_fence = inside.any(axis=1)
+        containing[rows[has_fence]] = fence_ids[inside.argmax(axis=1)[has_fence]]
+
+        closest = outside_by.argmin(axis=1)
+        nearest[rows] = fence_ids[closest]
+        nearest_distance[rows] = np.maximum(outside_by[np.arange(rows.size), closest], 0)
+
+    return containing, nearest, nearest_distance
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark password verification throughput at different pool sizes.
+
+Simulates a login storm: a number of request threads each verify passwords
+through a PasswordPool, as /login does. Reports logins per second, latency
+and how many logins the queue limit shed for every pool size. Pool size 0
+verifies inline in the request threads, which is how logins behaved before
+the pool.
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+import numpy as np
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from password_pool import PasswordPool, PasswordPoolBusy, PASSWORD_HASH_METHOD, _hash
+
+class StoredUser:
+    def __init__(self, password_hash):
+        self.password_hash = password_hash
+
+def run_storm(pool, password_hash, logins, threads):
+    latencies = []
+    rejected = []
+    lock = threading.Lock()
+    remaining = iter(range(logins))
+
+    def request_thread():
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    return
+            started = time.perf_counter()
+            try:
+                if not pool.verify_and_upgrade(StoredUser(password_hash), 'correct horse battery staple'):
+                    raise RuntimeError('password did not verify')
+                with lock:
+                    latencies.append(time.perf_counter() - started)
+            except PasswordPoolBusy:
+                with lock:
+                    rejected.append(1)
+
+    workers = [threading.Thread(target=request_thread) for _ in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - started, np.array(latencies), len(rejected)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark login password verification')
+    parser.add_argument('--pool-sizes', default=f'0,1,2,4,{os.cpu_count() or 1}',
+                        help='Comma separated pool sizes to try, 0 verifies inline')
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=32, help='Concurrent login requests')
+    parser.add_argument('--queue', type=int, help='Queue limit, defaults to 8 per pool process')
+    parser.add_argument('--method', default=PASSWORD_HASH_METHOD, help='Password hash method to verify')
+    args = parser.parse_args()
+
+    password_hash = _hash('correct horse battery staple', args.method)
+    print(f"📊 {args.logins} logins from {args.threads} threads, hash method {args.method}")
+
+    for size in sorted({int(size) for size in args.pool_sizes.split(',')}):
+        pool = PasswordPool(size=size, max_pending=args.queue or max(size, 1) * 8, method=args.method)
+        try:
+            # Start the processes before timing
+            pool.verify(password_hash, 'correct horse battery staple')
+            elapsed, latencies, rejected = run_storm(pool, password_hash, args.logins, args.threads)
+        finally:
+            pool.shutdown()
+
+        if not latencies.size:
+            print(f"❌ Pool size {size}: every login was rejected")
+            return False
+
+        print(f"✅ Pool size {size}: {latencies.size / elapsed:.1f} logins/s, "
+              f"p50 {np.percentile(latencies, 50) * 1000:.0f} ms, p95 {np.percentile(latencies, 95) * 1000:.0f} ms, "
+              f"{rejected} rejected")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark the payroll calculation against a per-employee reference loop.
+
+Generates synthetic per-(user, day) hours for a pay period, checks that the
+vectorised engine matches a straightforward Python implementation of the
+daily and weekly overtime rules, and reports the time taken by each.
+"""
+
+import argparse
+import os
+import sys
+import time
+from collections import defaultdict
+from datetime import date
+import numpy as np
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from payroll import OvertimeRules, compute_payroll
+
+def generate_hours(employees, days, seed):
+    rng = np.random.default_rng(seed)
+    first_day = date(2024, 1, 1).toordinal()
+
+    user_ids = np.repeat(np.arange(1, employees + 1), days)
+    day_ordinals = np.tile(np.arange(first_day, first_day + days), employees)
+    worked = np.round(rng.normal(8, 1.5, user_ids.size).clip(0, 14), 2)
+    breaks = np.round(rng.uniform(0, 1, user_ids.size), 2)
+
+    # Roughly one day in seven is not worked
+    worked_days = rng.random(user_ids.size) > 1 / 7
+    return user_ids[worked_days], day_ordinals[worked_days], worked[worked_days], breaks[worked_days]
+
+def reference_payroll(user_ids, day_ordinals, worked_hours, rules):
+    overtime = defaultdict(float)
+    week_regular = defaultdict(float)
+
+    for user_id, day, worked in zip(user_ids.tolist(), day_ordinals.tolist(), worked_hours.tolist()):
+        daily_overtime = max(worked - rules.daily_threshold, 0)
+        overtime[user_id] += daily_overtime
+        week_regular[(user_id, date.fromordinal(day).isocalendar()[:2])] += worked - daily_overtime
+
+    for (user_id, week), regular in week_regular.items():
+        overtime[user_id] += max(regular - rules.weekly_threshold, 0)
+
+    return overtime
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the payroll engine')
+    parser.add_argument('--employees', type=int, default=10000)
+    parser.add_argument('--days', type=int, default=14, help='Length of the pay period')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rules = OvertimeRules(8, 40)
+    user_ids, day_ordinals, worked, breaks = generate_hours(args.employees, args.days, args.seed)
+    print(f"📊 {args.employees} employees, {args.days} days, {user_ids.size} user-day rows")
+
+    timings = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        users, totals = compute_payroll(user_ids, day_ordinals, worked, breaks, rules)
+        timings.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    expected = reference_payroll(user_ids, day_ordinals, worked, rules)
+    reference_time = time.perf_counter() - started
+
+    mismatches = sum(
+        1 for user_id, overtime in zip(users.tolist(), totals['overtime_hours'].tolist())
+        if abs(overtime - expected[user_id]) > 1e-6
+    )
+    if mismatches:
+        print(f"❌ {mismatches} employees differ from the reference calculation")
+        return False
+
+    print(f"✅ Results match the reference calculation")
+    print(f"   Payroll engine: best {min(timings) * 1000:.1f} ms over {args.repeat} runs")
+    print(f"   Reference loop: {reference_time * 1000:.1f} ms")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
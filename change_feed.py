@@ -0,0 +1,103 @@
+"""
+Local change feed shared by all worker processes on a host.
+
+Writers append one JSON line per change to a file opened with O_APPEND, and
+each in-process cache keeps a FeedReader that picks up new lines with a
+single stat() when nothing has changed. This lets gunicorn workers invalidate
+each other's caches without an external broker. Events should be published
+after the database commit they describe.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+
+CHANGE_FEED_PATH = os.getenv('CHANGE_FEED_PATH', os.path.join(tempfile.gettempdir(), 'timetracker-changes.log'))
+CHANGE_FEED_MAX_BYTES = int(os.getenv('CHANGE_FEED_MAX_BYTES', str(8 * 1024 * 1024)))
+
+
+def publish(topic, **data):
+    event = dict(data, topic=topic, ts=time.time())
+    line = (json.dumps(event, default=str) + '\n').encode('utf-8')
+
+    fd = os.open(CHANGE_FEED_PATH, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line)
+        size = os.fstat(fd).st_size
+    finally:
+        os.close(fd)
+
+    if size > CHANGE_FEED_MAX_BYTES:
+        # Readers notice the new inode and treat it as a reset
+        try:
+            os.replace(CHANGE_FEED_PATH, CHANGE_FEED_PATH + '.1')
+        except OSError:
+            pass
+
+
+def publish_entry_change(user_id, *work_dates):
+    """Announce that a user's time entries changed on the given days"""
+    publish(
+        'time_entries',
+        user_id=int(user_id),
+        dates=sorted({d.isoformat() for d in work_dates if d})
+    )
+
+
+def publish_user_change(user_id):
+    """Announce that a user's account details changed"""
+    publish('users', user_id=int(user_id))
+
+
+class FeedReader:
+    """Tracks one consumer's position in the feed"""
+
+    def __init__(self, path=None):
+        self.path = path or CHANGE_FEED_PATH
+        self._lock = threading.Lock()
+        self._inode = None
+        self._offset = 0
+        self._partial = b''
+
+        # Start at the end; a new consumer has nothing cached yet
+        try:
+            stat = os.stat(self.path)
+            self._inode = stat.st_ino
+            self._offset = stat.st_size
+        except FileNotFoundError:
+            pass
+
+    def poll(self):
+        """Return (events, reset); reset means events may have been missed"""
+        with self._lock:
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                return [], False
+
+            reset = False
+            if stat.st_ino != self._inode or stat.st_size < self._offset:
+                reset = self._inode is not None
+                self._inode = stat.st_ino
+                self._offset = 0
+                self._partial = b''
+
+            if stat.st_size == self._offset:
+                return [], reset
+
+            with open(self.path, 'rb') as feed:
+                feed.seek(self._offset)
+                data = feed.read(stat.st_size - self._offset)
+            self._offset += len(data)
+
+            lines = (self._partial + data).split(b'\n')
+            self._partial = lines.pop()
+
+            events = []
+            for line in lines:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    reset = True
+            return events, reset
@@ -0,0 +1,194 @@
+"""
+Batch replay of clock events queued by offline devices.
+
+A batch is an ordered list of timestamped clock_in, break_start, break_end
+and clock_out events for one user. Events are checked against the user's
+open entry, then against the state left by the earlier events in the batch.
+All accepted events go to the database in one transaction, and rejected
+events do not change the state seen by the events that follow them.
+"""
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from database import db
+from models import TimeEntry
+from rollups import entry_snapshot, record_entry_change, split_entry_overtime
+from change_feed import publish_entry_change
+from active_sessions import get_open_entry, open_session, close_session
+
+CLOCK_EVENT_TYPES = ('clock_in', 'break_start', 'break_end', 'clock_out')
+CLOCK_EVENTS_MAX_BATCH = 500
+# Device clocks may run slightly ahead of the server
+CLOCK_EVENT_MAX_SKEW = timedelta(minutes=5)
+CLOCK_STATE_CONFLICT = 'Clock state changed by another request, retry the batch'
+
+
+class ClockEventError(ValueError):
+    pass
+
+
+def parse_event_time(value):
+    """Parse an ISO timestamp into the naive UTC datetimes stored on entries"""
+    if not value:
+        raise ClockEventError('Missing timestamp')
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        raise ClockEventError(f'Invalid timestamp: {value}')
+
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+class _UserClockState:
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.initial_entry = self.open_entry = get_open_entry(user_id)
+        self.break_started_at = None
+        self.snapshots = {}
+
+        # Nothing may be replayed before the latest time already on record
+        latest_in, latest_out = TimeEntry.query.with_entities(
+            func.max(TimeEntry.clock_in_time), func.max(TimeEntry.clock_out_time)
+        ).filter(TimeEntry.user_id == user_id).one()
+        self.last_event_time = max(filter(None, [latest_in, latest_out]), default=None)
+
+        if self.open_entry:
+            self.touch(self.open_entry)
+
+    def touch(self, entry):
+        """Remember what an entry contributed to rollups before this batch"""
+        if id(entry) not in self.snapshots:
+            self.snapshots[id(entry)] = (entry, entry_snapshot(entry) if entry.id else None)
+
+    def require_open(self):
+        if not self.open_entry:
+            raise ClockEventError('Not currently clocked in')
+        return self.open_entry
+
+    def apply(self, event, validate_location):
+        event_type = event.get('type')
+        if event_type not in CLOCK_EVENT_TYPES:
+            raise ClockEventError(f"Unknown event type: {event_type}")
+
+        timestamp = parse_event_time(event.get('timestamp'))
+        if timestamp > datetime.utcnow() + CLOCK_EVENT_MAX_SKEW:
+            raise ClockEventError('Timestamp is in the future')
+        if self.last_event_time and timestamp < self.last_event_time:
+            raise ClockEventError('Timestamp is earlier than the last recorded event')
+
+        if event_type == 'clock_in':
+            if self.open_entry:
+                raise ClockEventError('Already clocked in')
+
+            latitude = event.get('latitude')
+            longitude = event.get('longitude')
+            if latitude and longitude and validate_location and not validate_location(latitude, longitude):
+                raise ClockEventError('Clock-in location not authorized')
+
+            entry = TimeEntry(
+                user_id=self.user_id,
+                clock_in_time=timestamp,
+                location_lat=latitude,
+                location_lon=longitude,
+                project_id=event.get('project_id'),
+                notes=event.get('notes', ''),
+                break_duration=0
+            )
+            db.session.add(entry)
+            self.touch(entry)
+            self.open_entry = entry
+            self.break_started_at = None
+
+        elif event_type == 'break_start':
+            entry = self.require_open()
+            self.break_started_at = timestamp
+
+        elif event_type == 'break_end':
+            entry = self.require_open()
+            if event.get('break_duration') is not None:
+                break_duration = float(event['break_duration'])
+            elif self.break_started_at:
+                break_duration = (timestamp - self.break_started_at).total_seconds() / 3600
+            else:
+                raise ClockEventError('break_end needs a break_duration or an earlier break_start')
+
+            entry.break_duration = (entry.break_duration or 0) + break_duration
+            self.break_started_at = None
+
+        else:
+            entry = self.require_open()
+            entry.clock_out_time = timestamp
+            duration = (timestamp - entry.clock_in_time).total_seconds() / 3600
+            entry.total_hours = max(0, duration - (entry.break_duration or 0))
+            if event.get('notes'):
+                entry.notes = f"{entry.notes or ''}\nClock-out notes: {event['notes']}"
+            self.open_entry = None
+            self.break_started_at = None
+
+        self.last_event_time = timestamp
+        return entry
+
+
+def apply_clock_events(user_id, events, validate_location=None):
+    """
+    Apply an ordered batch of clock events for one user in a single transaction.
+
+    Returns one result per event with its status ('applied' or 'rejected'),
+    the affected entry id and, for rejected events, the reason.
+    """
+    if not isinstance(events, list):
+        raise ClockEventError('events must be a list')
+    if len(events) > CLOCK_EVENTS_MAX_BATCH:
+        raise ClockEventError(f'At most {CLOCK_EVENTS_MAX_BATCH} events per batch')
+
+    state = _UserClockState(user_id)
+    results = []
+    applied_entries = []
+
+    for index, event in enumerate(events):
+        event = event if isinstance(event, dict) else {}
+        try:
+            entry = state.apply(event, validate_location)
+        except (ClockEventError, TypeError, ValueError) as e:
+            results.append({'index': index, 'type': event.get('type'), 'status': 'rejected', 'error': str(e)})
+            continue
+
+        results.append({'index': index, 'type': event['type'], 'status': 'applied'})
+        applied_entries.append(entry)
+
+    try:
+        # New entries are inserted together and updates batched into one flush
+        db.session.flush()
+
+        # Only the final open entry of the batch needs a session row
+        if state.open_entry is not state.initial_entry:
+            if state.initial_entry and not close_session(state.initial_entry):
+                raise ClockEventError(CLOCK_STATE_CONFLICT)
+            if state.open_entry:
+                open_session(state.open_entry)
+
+        # Entries are closed in event order, so each split sees only earlier hours
+        for entry, before in state.snapshots.values():
+            record_entry_change(before, entry)
+            if entry.clock_out_time is not None:
+                split_entry_overtime(entry)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        raise ClockEventError(CLOCK_STATE_CONFLICT)
+    except Exception:
+        db.session.rollback()
+        raise
+
+    entry_ids = iter(entry.id for entry in applied_entries)
+    for result in results:
+        if result['status'] == 'applied':
+            result['entry_id'] = next(entry_ids)
+
+    changed_days = {entry.clock_in_time.date() for entry, before in state.snapshots.values()}
+    if changed_days:
+        publish_entry_change(user_id, *changed_days)
+
+    return results
@@ -0,0 +1,72 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Point the app at a throwaway SQLite file before app.py reads DATABASE_URL
+_db_dir = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+os.environ['CHANGE_FEED_PATH'] = os.path.join(_db_dir, 'changes.log')
+# Matches the cheap fixture hashes, so logins do not rehash them
+os.environ['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+
+from werkzeug.security import generate_password_hash
+from app import app as flask_app, db
+from models import User
+from change_feed import publish
+
+
+@pytest.fixture
+def app():
+    flask_app.config['TESTING'] = True
+    with flask_app.app_context():
+        db.create_all()
+    # Drop anything process-level caches remember from earlier tests
+    publish('reset')
+
+    # Requests push their own app context, so none is held open across them
+    yield flask_app
+
+    with flask_app.app_context():
+        db.drop_all()
+
+
+@pytest.fixture
+def make_user(app):
+    counter = {'n': 0}
+
+    def _make_user(role='employee', password='password123'):
+        counter['n'] += 1
+        n = counter['n']
+        with app.app_context():
+            user = User(
+                username=f'user{n}',
+                email=f'user{n}@example.com',
+                first_name='Test',
+                last_name=f'User{n}',
+                role=role,
+                is_active=True,
+                # Cheap hash so the fixtures do not dominate test time
+                password_hash=generate_password_hash(password, method='pbkdf2:sha256:1000')
+            )
+            db.session.add(user)
+            db.session.commit()
+            db.session.refresh(user)
+            db.session.expunge(user)
+        return user
+
+    return _make_user
+
+
+@pytest.fixture
+def login(app):
+    def _login(user, password='password123'):
+        client = app.test_client()
+        response = client.post('/login', json={'username': user.username, 'password': password})
+        assert response.status_code == 200
+        return client
+
+    return _login
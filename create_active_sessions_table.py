@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db
+from models import ActiveSession
+from active_sessions import rebuild_active_sessions
+
+def main():
+    """Create the active_sessions table and fill it from open time entries"""
+    with app.app_context():
+        try:
+            ActiveSession.__table__.create(db.engine, checkfirst=True)
+            count = rebuild_active_sessions()
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error building active sessions: {e}")
+            return False
+
+        print(f"✅ Active sessions rebuilt for {count} clocked-in users")
+        return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
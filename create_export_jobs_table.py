@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db
+
+# (description, statement, error text meaning it was already applied)
+STEPS = [
+    ("export_job_seq sequence", """
+        CREATE SEQUENCE export_job_seq START WITH 1 INCREMENT BY 1
+    """, "name is already used by an existing object"),
+    ("export_jobs table", """
+        CREATE TABLE export_jobs (
+            id NUMBER PRIMARY KEY,
+            user_id NUMBER NOT NULL,
+            format VARCHAR2(20) NOT NULL,
+            filters CLOB,
+            status VARCHAR2(20) DEFAULT 'queued',
+            cancel_requested NUMBER(1) DEFAULT 0,
+            progress NUMBER(5,2) DEFAULT 0,
+            rows_written NUMBER DEFAULT 0,
+            total_rows NUMBER,
+            file_path VARCHAR2(500),
+            error CLOB,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP,
+            expires_at TIMESTAMP,
+            CONSTRAINT fk_export_jobs_user FOREIGN KEY (user_id) REFERENCES users(id),
+            CONSTRAINT chk_export_job_status CHECK (status IN ('queued', 'running', 'completed', 'failed', 'cancelled', 'expired'))
+        )
+    """, "name is already used by an existing object"),
+    ("export_job_trigger trigger", """
+        CREATE OR REPLACE TRIGGER export_job_trigger
+            BEFORE INSERT ON export_jobs
+            FOR EACH ROW
+        BEGIN
+            :NEW.id := export_job_seq.NEXTVAL;
+        END;
+    """, None),
+    ("idx_export_jobs_status index", """
+        CREATE INDEX idx_export_jobs_status ON export_jobs(status, created_at)
+    """, "name is already used by an existing object"),
+]
+
+def main():
+    """Create the export_jobs table with its sequence, trigger and queue index"""
+    with app.app_context():
+        for description, statement, applied_error in STEPS:
+            try:
+                with db.engine.connect() as connection:
+                    connection.execute(db.text(statement))
+                    connection.commit()
+                print(f"✅ Created {description}")
+            except Exception as e:
+                if applied_error and applied_error in str(e):
+                    print(f"⚠️  {description} already exists")
+                else:
+                    print(f"❌ Error creating {description}: {e}")
+                    return False
+
+        return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
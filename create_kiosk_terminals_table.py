@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db
+
+# (description, statement, error text meaning it was already applied)
+STEPS = [
+    ("badge_code column on users", """
+        ALTER TABLE users ADD (
+            badge_code VARCHAR2(64) CONSTRAINT uq_users_badge_code UNIQUE
+        )
+    """, "column being added already exists"),
+    ("kiosk_terminal_seq sequence", """
+        CREATE SEQUENCE kiosk_terminal_seq START WITH 1 INCREMENT BY 1
+    """, "name is already used by an existing object"),
+    ("kiosk_terminals table", """
+        CREATE TABLE kiosk_terminals (
+            id NUMBER PRIMARY KEY,
+            name VARCHAR2(100) NOT NULL,
+            token_hash VARCHAR2(64) NOT NULL,
+            geofence_id NUMBER,
+            is_active NUMBER(1) DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_authenticated_at TIMESTAMP,
+            CONSTRAINT fk_kiosk_terminals_geofence FOREIGN KEY (geofence_id) REFERENCES geofences(id)
+        )
+    """, "name is already used by an existing object"),
+    ("kiosk_terminal_trigger trigger", """
+        CREATE OR REPLACE TRIGGER kiosk_terminal_trigger
+            BEFORE INSERT ON kiosk_terminals
+            FOR EACH ROW
+        BEGIN
+            :NEW.id := kiosk_terminal_seq.NEXTVAL;
+        END;
+    """, None),
+]
+
+def main():
+    """Add users.badge_code and create the kiosk_terminals table with its sequence and trigger"""
+    with app.app_context():
+        for description, statement, applied_error in STEPS:
+            try:
+                with db.engine.connect() as connection:
+                    connection.execute(db.text(statement))
+                    connection.commit()
+                print(f"✅ Created {description}")
+            except Exception as e:
+                if applied_error and applied_error in str(e):
+                    print(f"⚠️  {description} already exists")
+                else:
+                    print(f"❌ Error creating {description}: {e}")
+                    return False
+
+        return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
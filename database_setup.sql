@@ -9,6 +9,8 @@ CREATE SEQUENCE schedule_seq START WITH 1 INCREMENT BY 1;
 CREATE SEQUENCE leave_request_seq START WITH 1 INCREMENT BY 1;
 CREATE SEQUENCE geofence_seq START WITH 1 INCREMENT BY 1;
 CREATE SEQUENCE audit_log_seq START WITH 1 INCREMENT BY 1;
+CREATE SEQUENCE export_job_seq START WITH 1 INCREMENT BY 1;
+CREATE SEQUENCE kiosk_terminal_seq START WITH 1 INCREMENT BY 1;
 
 -- Departments table
 CREATE TABLE departments (
@@ -41,6 +43,8 @@ CREATE TABLE users (
     profile_picture VARCHAR2(500),
     email_verified NUMBER(1) DEFAULT 0,
     last_login TIMESTAMP,
+    badge_code VARCHAR2(64) UNIQUE,
+    token_version NUMBER DEFAULT 0 NOT NULL,
 
     -- Email verification fields
     email_verification_token VARCHAR2(100),
@@ -80,6 +84,8 @@ CREATE TABLE time_entries (
     location_lon NUMBER(11,8),
     notes CLOB,
     is_overtime NUMBER(1) DEFAULT 0,
+    regular_hours NUMBER(8,2),
+    overtime_hours NUMBER(8,2) DEFAULT 0,
     status VARCHAR2(20) DEFAULT 'active',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     CONSTRAINT fk_time_entries_user FOREIGN KEY (user_id) REFERENCES users(id),
@@ -148,6 +154,62 @@ CREATE TABLE audit_logs (
     CONSTRAINT fk_audit_logs_user FOREIGN KEY (user_id) REFERENCES users(id)
 );
 
+-- Daily rollups table (per-user daily totals maintained on clock-out and edits)
+CREATE TABLE daily_rollups (
+    user_id NUMBER NOT NULL,
+    work_date DATE NOT NULL,
+    worked_hours NUMBER(10,4) DEFAULT 0,
+    break_hours NUMBER(10,4) DEFAULT 0,
+    overtime_hours NUMBER(10,4) DEFAULT 0,
+    entry_count NUMBER DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT pk_daily_rollups PRIMARY KEY (user_id, work_date),
+    CONSTRAINT fk_daily_rollups_user FOREIGN KEY (user_id) REFERENCES users(id)
+);
+
+-- Active sessions table (one row per clocked-in user, pointing at the open time entry)
+CREATE TABLE active_sessions (
+    user_id NUMBER PRIMARY KEY,
+    time_entry_id NUMBER NOT NULL,
+    started_at TIMESTAMP NOT NULL,
+    CONSTRAINT uq_active_sessions_entry UNIQUE (time_entry_id),
+    CONSTRAINT fk_active_sessions_user FOREIGN KEY (user_id) REFERENCES users(id),
+    CONSTRAINT fk_active_sessions_entry FOREIGN KEY (time_entry_id) REFERENCES time_entries(id)
+);
+
+-- Kiosk terminals table (shared clock-in devices, authenticated by a hashed secret)
+CREATE TABLE kiosk_terminals (
+    id NUMBER PRIMARY KEY,
+    name VARCHAR2(100) NOT NULL,
+    token_hash VARCHAR2(64) NOT NULL,
+    geofence_id NUMBER,
+    is_active NUMBER(1) DEFAULT 1,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_authenticated_at TIMESTAMP,
+    CONSTRAINT fk_kiosk_terminals_geofence FOREIGN KEY (geofence_id) REFERENCES geofences(id)
+);
+
+-- Export jobs table (queue for background report exports)
+CREATE TABLE export_jobs (
+    id NUMBER PRIMARY KEY,
+    user_id NUMBER NOT NULL,
+    format VARCHAR2(20) NOT NULL,
+    filters CLOB,
+    status VARCHAR2(20) DEFAULT 'queued',
+    cancel_requested NUMBER(1) DEFAULT 0,
+    progress NUMBER(5,2) DEFAULT 0,
+    rows_written NUMBER DEFAULT 0,
+    total_rows NUMBER,
+    file_path VARCHAR2(500),
+    error CLOB,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP,
+    expires_at TIMESTAMP,
+    CONSTRAINT fk_export_jobs_user FOREIGN KEY (user_id) REFERENCES users(id),
+    CONSTRAINT chk_export_job_status CHECK (status IN ('queued', 'running', 'completed', 'failed', 'cancelled', 'expired'))
+);
+
 -- Create triggers for auto-increment
 CREATE OR REPLACE TRIGGER users_trigger
     BEFORE INSERT ON users
@@ -213,14 +275,35 @@ BEGIN
 END;
 /
 
+CREATE OR REPLACE TRIGGER export_job_trigger
+    BEFORE INSERT ON export_jobs
+    FOR EACH ROW
+BEGIN
+    :NEW.id := export_job_seq.NEXTVAL;
+END;
+/
+
+CREATE OR REPLACE TRIGGER kiosk_terminal_trigger
+    BEFORE INSERT ON kiosk_terminals
+    FOR EACH ROW
+BEGIN
+    :NEW.id := kiosk_terminal_seq.NEXTVAL;
+END;
+/
+
 -- Create indexes for better performance
 CREATE INDEX idx_time_entries_user_id ON time_entries(user_id);
 CREATE INDEX idx_time_entries_date ON time_entries(clock_in_time);
+CREATE INDEX idx_time_entries_user_clock_in ON time_entries(user_id, clock_in_time, id);
 CREATE INDEX idx_schedules_user_id ON schedules(user_id);
 CREATE INDEX idx_schedules_date ON schedules(start_time);
 CREATE INDEX idx_leave_requests_user_id ON leave_requests(user_id);
 CREATE INDEX idx_users_department ON users(department_id);
 CREATE INDEX idx_users_role ON users(role);
+CREATE INDEX idx_export_jobs_status ON export_jobs(status, created_at);
+CREATE INDEX idx_audit_logs_timestamp ON audit_logs(timestamp, id);
+CREATE INDEX idx_audit_logs_user ON audit_logs(user_id, timestamp);
+CREATE INDEX idx_audit_logs_record ON audit_logs(table_name, record_id);
 
 -- Insert sample data
 INSERT INTO departments (name, description) VALUES ('IT', 'Information Technology Department');
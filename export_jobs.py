@@ -0,0 +1,201 @@
+"""
+Background report export jobs.
+
+/api/export-report records a row in export_jobs and returns immediately. The
+export worker (export_worker.py) claims queued jobs, writes the file with the
+streaming exporters from exports.py in a pool of local processes, and records
+progress as it goes. Finished files are served from /downloads/<job_id> until
+they expire. The queue is the database table itself, so no outside services
+are needed.
+"""
+import json
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from database import db
+from models import ExportJob, User
+
+EXPORT_DIR = os.getenv('EXPORT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'export_files'))
+EXPORT_JOB_TTL_HOURS = int(os.getenv('EXPORT_JOB_TTL_HOURS', '24'))
+
+FINISHED_STATUSES = ('completed', 'failed', 'cancelled', 'expired')
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def enqueue_export(user, format_type, filters):
+    job = ExportJob(
+        user_id=user.id,
+        format=format_type,
+        filters=json.dumps(filters or {}),
+        status='queued'
+    )
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def job_to_dict(job):
+    return {
+        'job_id': job.id,
+        'status': job.status,
+        'format': job.format,
+        'progress': job.progress or 0,
+        'rows_written': job.rows_written or 0,
+        'total_rows': job.total_rows,
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'expires_at': job.expires_at.isoformat() if job.expires_at else None,
+        'status_url': f'/api/export-jobs/{job.id}',
+        'download_url': f'/downloads/{job.id}' if job.status == 'completed' else None
+    }
+
+
+def can_access_job(user, job):
+    return job.user_id == user.id or user.role == 'admin'
+
+
+def cancel_job(job):
+    """Cancel a queued job outright, or ask the worker to stop a running one"""
+    if job.status == 'queued':
+        job.status = 'cancelled'
+        job.finished_at = datetime.utcnow()
+    elif job.status == 'running':
+        job.cancel_requested = True
+    db.session.commit()
+
+
+def claim_next_job():
+    """Atomically move the oldest queued job to running, returning its id or None"""
+    candidates = db.session.query(ExportJob.id).filter(
+        ExportJob.status == 'queued'
+    ).order_by(ExportJob.created_at, ExportJob.id).limit(5).all()
+
+    for (job_id,) in candidates:
+        # Only one worker can win the queued -> running transition
+        claimed = ExportJob.query.filter_by(id=job_id, status='queued').update({
+            ExportJob.status: 'running',
+            ExportJob.started_at: datetime.utcnow()
+        }, synchronize_session=False)
+        db.session.commit()
+        if claimed:
+            return job_id
+
+    return None
+
+
+def requeue_interrupted_jobs():
+    """Return jobs left running by a worker that died back to the queue"""
+    count = ExportJob.query.filter_by(status='running').update({
+        ExportJob.status: 'queued',
+        ExportJob.progress: 0,
+        ExportJob.rows_written: 0
+    }, synchronize_session=False)
+    db.session.commit()
+    return count
+
+
+def expire_finished_jobs(now=None):
+    """Delete export files past their expiry and mark the jobs expired"""
+    now = now or datetime.utcnow()
+    expired = ExportJob.query.filter(
+        ExportJob.status == 'completed',
+        ExportJob.expires_at <= now
+    ).all()
+
+    for job in expired:
+        if job.file_path and os.path.exists(job.file_path):
+            os.remove(job.file_path)
+        job.status = 'expired'
+        job.file_path = None
+
+    db.session.commit()
+    return len(expired)
+
+
+def _update_job(job_id, **values):
+    # Progress is written on its own connection because the export query is
+    # still streaming rows on the session's connection
+    with db.engine.begin() as connection:
+        connection.execute(update(ExportJob.__table__).where(ExportJob.id == job_id).values(**values))
+
+
+def _cancel_requested(job_id):
+    with db.engine.connect() as connection:
+        return bool(connection.execute(
+            ExportJob.__table__.select().with_only_columns(ExportJob.cancel_requested).where(ExportJob.id == job_id)
+        ).scalar())
+
+
+def _track_progress(job_id, rows, total_rows, chunk_size):
+    written = 0
+    for row in rows:
+        yield row
+        written += 1
+        if written % chunk_size == 0:
+            if _cancel_requested(job_id):
+                raise ExportCancelled()
+            _update_job(
+                job_id,
+                rows_written=written,
+                progress=min(99.0, written * 100.0 / max(total_rows, 1))
+            )
+    _update_job(job_id, rows_written=written)
+
+
+def generate_export(job_id):
+    """Write the export file for a claimed job; must run inside an app context"""
+    from reports import parse_report_range, scoped_entries_query
+    from exports import EXPORT_FORMATS, EXPORT_CHUNK_SIZE, export_rows
+    from pagination import count_entries
+
+    job = db.session.get(ExportJob, job_id)
+    viewer = db.session.get(User, job.user_id)
+    filters = json.loads(job.filters or '{}')
+    writer, mimetype, extension = EXPORT_FORMATS[job.format]
+
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    final_path = os.path.join(EXPORT_DIR, f'export_{job_id}.{extension}')
+    partial_path = final_path + '.part'
+
+    try:
+        start_date, end_date = parse_report_range(filters.get('start_date'), filters.get('end_date'))
+        query = scoped_entries_query(viewer, start_date, end_date, filters.get('employee_id'))
+        total_rows = count_entries(query)
+        _update_job(job_id, total_rows=total_rows)
+
+        rows = _track_progress(job_id, export_rows(query), total_rows, EXPORT_CHUNK_SIZE)
+        with open(partial_path, 'wb') as output:
+            for chunk in writer(rows):
+                output.write(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+
+        os.replace(partial_path, final_path)
+        finished = datetime.utcnow()
+        _update_job(
+            job_id,
+            status='completed',
+            progress=100.0,
+            file_path=final_path,
+            finished_at=finished,
+            expires_at=finished + timedelta(hours=EXPORT_JOB_TTL_HOURS)
+        )
+    except ExportCancelled:
+        _update_job(job_id, status='cancelled', finished_at=datetime.utcnow())
+    except Exception as e:
+        _update_job(job_id, status='failed', error=str(e), finished_at=datetime.utcnow())
+    finally:
+        db.session.remove()
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+
+
+def run_export_job(job_id):
+    """Process pool entry point"""
+    from app import app
+
+    with app.app_context():
+        generate_export(job_id)
+    return job_id
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db
+from export_jobs import (claim_next_job, expire_finished_jobs, requeue_interrupted_jobs,
+                         run_export_job)
+
+def init_process():
+    """Drop database connections inherited from the parent process"""
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+def main():
+    parser = argparse.ArgumentParser(description='Run background report export jobs')
+    parser.add_argument('--processes', type=int, default=int(os.getenv('EXPORT_WORKER_PROCESSES', '2')),
+                        help='Number of export processes')
+    parser.add_argument('--poll-interval', type=float, default=2.0,
+                        help='Seconds between queue polls when idle')
+    args = parser.parse_args()
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    with app.app_context():
+        requeued = requeue_interrupted_jobs()
+        if requeued:
+            print(f"⚠️  Requeued {requeued} interrupted export jobs")
+
+    print(f"✅ Export worker started with {args.processes} processes")
+
+    in_flight = set()
+    last_expiry_check = 0
+
+    with ProcessPoolExecutor(max_workers=args.processes, initializer=init_process) as pool:
+        while not stopping:
+            in_flight = {future for future in in_flight if not future.done()}
+
+            with app.app_context():
+                if time.time() - last_expiry_check > 60:
+                    expired = expire_finished_jobs()
+                    if expired:
+                        print(f"🧹 Removed {expired} expired export files")
+                    last_expiry_check = time.time()
+
+                claimed = False
+                while len(in_flight) < args.processes:
+                    job_id = claim_next_job()
+                    if job_id is None:
+                        break
+                    print(f"▶️  Starting export job {job_id}")
+                    in_flight.add(pool.submit(run_export_job, job_id))
+                    claimed = True
+
+                db.session.remove()
+
+            if not claimed:
+                time.sleep(args.poll_interval)
+
+        print("⏹  Waiting for running exports to finish")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Streaming report exports.
+
+Rows are read from the database in server-side chunks and written out as they
+arrive, so memory use stays flat regardless of the size of the export. XLSX
+files are produced by streaming the workbook's zip container directly; no
+spreadsheet library is required.
+"""
+import csv
+import io
+import re
+import zipfile
+from xml.sax.saxutils import escape
+from models import TimeEntry, User, Project
+
+EXPORT_CHUNK_SIZE = 1000
+
+EXPORT_HEADERS = [
+    'Entry ID', 'Date', 'Employee ID', 'Employee', 'Clock In', 'Clock Out',
+    'Total Hours', 'Break Hours', 'Project', 'Overtime', 'Notes'
+]
+
+
+def export_rows(query):
+    """Yield one flat tuple per time entry, fetching EXPORT_CHUNK_SIZE rows at a time"""
+    rows = query.join(User, TimeEntry.user_id == User.id).outerjoin(
+        Project, TimeEntry.project_id == Project.id
+    ).with_entities(
+        TimeEntry.id,
+        TimeEntry.clock_in_time,
+        TimeEntry.clock_out_time,
+        TimeEntry.total_hours,
+        TimeEntry.break_duration,
+        TimeEntry.is_overtime,
+        TimeEntry.notes,
+        User.id,
+        User.first_name,
+        User.last_name,
+        Project.name
+    ).order_by(TimeEntry.clock_in_time, TimeEntry.id).yield_per(EXPORT_CHUNK_SIZE)
+
+    for (entry_id, clock_in, clock_out, total_hours, break_duration, is_overtime,
+         notes, user_id, first_name, last_name, project_name) in rows:
+        yield (
+            entry_id,
+            clock_in.strftime('%Y-%m-%d'),
+            user_id,
+            f"{first_name} {last_name}",
+            clock_in.strftime('%Y-%m-%d %H:%M:%S'),
+            clock_out.strftime('%Y-%m-%d %H:%M:%S') if clock_out else '',
+            round(total_hours, 2) if total_hours is not None else '',
+            round(break_duration or 0, 2),
+            project_name or '',
+            'Yes' if is_overtime else 'No',
+            notes or ''
+        )
+
+
+def iter_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_HEADERS)
+
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % EXPORT_CHUNK_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+class _ChunkBuffer(io.RawIOBase):
+    """Write-only, non-seekable sink that hands back whatever was written since the last drain"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+# Characters that are not allowed in XML 1.0 documents
+_INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Time Entries" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_row(values):
+    cells = []
+    for value in values:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            cells.append(f'<c><v>{value}</v></c>')
+        else:
+            text = escape(_INVALID_XML_CHARS.sub('', str(value)))
+            cells.append(f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+    return '<row>' + ''.join(cells) + '</row>'
+
+
+def iter_xlsx(rows):
+    buffer = _ChunkBuffer()
+    workbook = zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_DEFLATED)
+
+    for name, content in _XLSX_PARTS.items():
+        workbook.writestr(name, content)
+
+    # The sheet size is unknown up front, so allow it to exceed the classic zip limits
+    with workbook.open('xl/worksheets/sheet1.xml', mode='w', force_zip64=True) as sheet:
+        sheet.write((
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            + _xlsx_row(EXPORT_HEADERS)
+        ).encode('utf-8'))
+
+        for count, row in enumerate(rows, 1):
+            sheet.write(_xlsx_row(row).encode('utf-8'))
+            if count % EXPORT_CHUNK_SIZE == 0:
+                yield buffer.drain()
+
+        sheet.write(b'</sheetData></worksheet>')
+
+    workbook.close()
+    yield buffer.drain()
+
+
+EXPORT_FORMATS = {
+    'csv': (iter_csv, 'text/csv', 'csv'),
+    'excel': (iter_xlsx, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+    'xlsx': (iter_xlsx, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+}
@@ -0,0 +1,135 @@
+"""
+In-process grid index over active geofences.
+
+Each fence is registered in every grid cell its bounding box touches, so a
+clock-in only looks at the fences in its own cell, discards those whose
+bounding box does not contain the point, and computes the exact distance for
+the rest. The index is rebuilt lazily when the change feed reports a
+geofence change, and after GEOFENCE_INDEX_TTL_SECONDS in case fences were
+edited directly in the database.
+"""
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from change_feed import FeedReader
+
+GEOFENCE_GRID_DEGREES = float(os.getenv('GEOFENCE_GRID_DEGREES', '0.05'))
+GEOFENCE_INDEX_TTL_SECONDS = int(os.getenv('GEOFENCE_INDEX_TTL_SECONDS', '300'))
+
+# Same Earth radius as the haversine check in auth.calculate_distance
+EARTH_RADIUS_METERS = 6371000
+METERS_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_METERS / 180
+# Widens bounding boxes so rounding never drops a point the exact check accepts
+BOUNDING_BOX_MARGIN = 1.01
+
+
+class IndexedFence:
+    __slots__ = ('id', 'name', 'center_lat', 'center_lon', 'radius', 'lat_span', 'lon_span')
+
+    def __init__(self, fence_id, name, center_lat, center_lon, radius):
+        self.id = fence_id
+        self.name = name
+        self.center_lat = center_lat
+        self.center_lon = center_lon
+        self.radius = radius
+
+        # Half extents of the bounding box in degrees
+        self.lat_span = radius * BOUNDING_BOX_MARGIN / METERS_PER_DEGREE_LAT
+        cos_lat = math.cos(math.radians(min(abs(center_lat) + self.lat_span, 90)))
+        self.lon_span = (min(radius * BOUNDING_BOX_MARGIN / (METERS_PER_DEGREE_LAT * cos_lat), 180)
+                         if cos_lat > 1e-9 else 180)
+
+    def in_bounding_box(self, latitude, longitude):
+        if abs(latitude - self.center_lat) > self.lat_span:
+            return False
+        # Compare longitudes across the antimeridian
+        return abs((longitude - self.center_lon + 180) % 360 - 180) <= self.lon_span
+
+
+class GeofenceIndex:
+    def __init__(self, cell_degrees=GEOFENCE_GRID_DEGREES, ttl=GEOFENCE_INDEX_TTL_SECONDS, reader=None):
+        self.cell_degrees = cell_degrees
+        self.ttl = ttl
+        self._lon_cells = int(math.ceil(360 / cell_degrees))
+        self._reader = reader or FeedReader()
+        self._lock = threading.Lock()
+        self._cells = None
+        self._fences = []
+        self._built_at = 0
+
+    def _cell(self, latitude, longitude):
+        return (
+            int(math.floor(latitude / self.cell_degrees)),
+            int(math.floor(longitude / self.cell_degrees)) % self._lon_cells
+        )
+
+    def build(self, fences):
+        cells = defaultdict(list)
+
+        for fence in fences:
+            lat_first = int(math.floor((fence.center_lat - fence.lat_span) / self.cell_degrees))
+            lat_last = int(math.floor((fence.center_lat + fence.lat_span) / self.cell_degrees))
+            lon_first = int(math.floor((fence.center_lon - fence.lon_span) / self.cell_degrees))
+            lon_last = int(math.floor((fence.center_lon + fence.lon_span) / self.cell_degrees))
+            # Never walk around the globe more than once
+            lon_last = min(lon_last, lon_first + self._lon_cells - 1)
+
+            for lat_cell in range(lat_first, lat_last + 1):
+                for lon_cell in range(lon_first, lon_last + 1):
+                    cells[(lat_cell, lon_cell % self._lon_cells)].append(fence)
+
+        cells = dict(cells)
+        with self._lock:
+            self._cells = cells
+            self._fences = list(fences)
+            self._built_at = time.monotonic()
+        return cells
+
+    def load(self):
+        from models import Geofence
+
+        rows = Geofence.query.with_entities(
+            Geofence.id, Geofence.name, Geofence.center_lat, Geofence.center_lon, Geofence.radius
+        ).filter_by(is_active=True).all()
+        return self.build([IndexedFence(*row) for row in rows])
+
+    def invalidate(self):
+        with self._lock:
+            self._cells = None
+
+    def _sync(self):
+        """Return the current cell map, rebuilding it first if it is stale"""
+        events, reset = self._reader.poll()
+        if reset or any(event.get('topic') in ('geofences', 'reset') for event in events):
+            self.invalidate()
+
+        with self._lock:
+            cells = self._cells
+            if cells is not None and time.monotonic() - self._built_at <= self.ttl:
+                return cells
+        return self.load()
+
+    def candidates(self, latitude, longitude):
+        """Fences whose bounding box contains the point"""
+        nearby = self._sync().get(self._cell(latitude, longitude), ())
+        return [fence for fence in nearby if fence.in_bounding_box(latitude, longitude)]
+
+    def find(self, latitude, longitude):
+        """First active fence containing the point, or None"""
+        from auth import calculate_distance
+
+        for fence in self.candidates(latitude, longitude):
+            if calculate_distance(latitude, longitude, fence.center_lat, fence.center_lon) <= fence.radius:
+                return fence
+        return None
+
+    @property
+    def fences(self):
+        self._sync()
+        with self._lock:
+            return list(self._fences)
+
+
+geofence_index = GeofenceIndex()
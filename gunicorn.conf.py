@@ -0,0 +1,23 @@
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('GUNICORN_WORKERS', '4'))
+
+# Regular routes run on threaded workers, where the password process pool,
+# its backpressure semaphore and the audit flush thread behave as tested.
+# /api/events keeps one connection open per browser tab, so docker-compose
+# serves it from a separate timetracker-events group started with
+# GUNICORN_WORKER_CLASS=gevent, which holds thousands of idle streams per
+# process. That group only serves the stream; the app group sets
+# EVENTS_STREAM_ENABLED=0 so direct requests fall back to polling.
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '2000'))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+
+
+def worker_exit(server, worker):
+    # Write audit records still buffered in this worker before it goes away
+    from audit_writer import audit_writer
+    audit_writer.flush()
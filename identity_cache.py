@@ -0,0 +1,129 @@
+"""
+In-process cache of user identities for authentication and role checks.
+
+Flask-Login's user loader and require_role() only need a user's role, active
+flag and a few display fields, so they read a snapshot of the user's columns
+from this cache instead of querying users on every request. Snapshots expire
+after IDENTITY_CACHE_TTL_SECONDS, and are dropped as soon as the change feed
+reports a change to the user. Code that modifies a user must load the ORM
+object itself and call publish_user_change() after committing.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from flask import g, has_app_context
+from flask_login import UserMixin
+from change_feed import FeedReader
+
+IDENTITY_CACHE_TTL_SECONDS = int(os.getenv('IDENTITY_CACHE_TTL_SECONDS', '60'))
+IDENTITY_CACHE_SIZE = int(os.getenv('IDENTITY_CACHE_SIZE', '10000'))
+
+# Secrets and one-time tokens stay out of the cache
+EXCLUDED_COLUMNS = ('password_hash', 'email_verification_token', 'email_verification_expires')
+
+
+class CachedIdentity(UserMixin):
+    """Read-only snapshot of a user's columns, used as current_user"""
+
+    def __init__(self, values):
+        self._values = values
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__['_values'][name]
+        except KeyError:
+            raise AttributeError(name)
+
+    @property
+    def is_active(self):
+        return bool(self._values['is_active'])
+
+    @property
+    def department(self):
+        from database import db
+        from models import Department
+        return db.session.get(Department, self.department_id) if self.department_id else None
+
+    def record(self):
+        """The user's ORM object, for code that needs to change it"""
+        from database import db
+        from models import User
+        return db.session.get(User, self.id)
+
+    def __repr__(self):
+        return f'<CachedIdentity {self.id} {self.username}>'
+
+
+def _load(user_id):
+    from models import User
+
+    columns = [column for column in User.__table__.columns if column.name not in EXCLUDED_COLUMNS]
+    row = User.query.with_entities(*columns).filter(User.id == user_id).first()
+    return CachedIdentity(dict(zip((column.name for column in columns), row))) if row else None
+
+
+class IdentityCache:
+    def __init__(self, ttl=IDENTITY_CACHE_TTL_SECONDS, max_entries=IDENTITY_CACHE_SIZE, reader=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._reader = reader or FeedReader()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """The user's identity, or None if there is no such user"""
+        self._sync()
+        now = time.monotonic()
+
+        with self._lock:
+            cached = self._entries.get(user_id)
+            if cached is not None and now - cached[1] <= self.ttl:
+                self._entries.move_to_end(user_id)
+                return cached[0]
+
+        identity = _load(user_id)
+        with self._lock:
+            self._entries[user_id] = (identity, now)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return identity
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _sync(self):
+        events, reset = self._reader.poll()
+        if reset:
+            self.clear()
+
+        for event in events:
+            if event.get('topic') == 'users':
+                self.invalidate(event.get('user_id'))
+            elif event.get('topic') == 'reset':
+                self.clear()
+
+
+identity_cache = IdentityCache()
+
+
+def get_identity(user_id):
+    """A user's identity, looked up at most once per request"""
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+
+    if not has_app_context():
+        return identity_cache.get(user_id)
+
+    identities = g.setdefault('_identities', {})
+    if user_id not in identities:
+        identities[user_id] = identity_cache.get(user_id)
+    return identities[user_id]
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app
+from password_pool import PasswordPool
+from user_import import UserImportError, parse_import, import_users
+
+def main():
+    parser = argparse.ArgumentParser(description='Create users in bulk from a CSV or JSON file')
+    parser.add_argument('file', help='CSV with a header row, or a JSON list of user objects')
+    parser.add_argument('--format', choices=['csv', 'json'], help='Defaults to the file extension')
+    parser.add_argument('--dry-run', action='store_true', help='Validate only, create nothing')
+    parser.add_argument('--skip-invalid', action='store_true', help='Create the valid rows even if some are invalid')
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1,
+                        help='Processes used to hash passwords')
+    parser.add_argument('--results', help='Write the per-row results to this JSON file')
+    args = parser.parse_args()
+
+    format_type = args.format or os.path.splitext(args.file)[1].lstrip('.').lower()
+    try:
+        with open(args.file, encoding='utf-8-sig') as f:
+            rows = parse_import(f.read(), format_type)
+    except (OSError, UserImportError) as e:
+        print(f"❌ Cannot read {args.file}: {e}")
+        return False
+
+    pool = PasswordPool(size=args.processes)
+    started = time.perf_counter()
+    try:
+        with app.app_context():
+            summary = import_users(rows, dry_run=args.dry_run, skip_invalid=args.skip_invalid, pool=pool)
+    except Exception as e:
+        print(f"❌ Error importing users: {e}")
+        return False
+    finally:
+        pool.shutdown()
+    elapsed = time.perf_counter() - started
+
+    if args.results:
+        with open(args.results, 'w') as f:
+            json.dump(summary['results'], f, indent=2)
+
+    for result in summary['results']:
+        if result['status'] == 'invalid':
+            print(f"⚠️  Row {result['row']}: {'; '.join(result['errors'])}")
+
+    if args.dry_run:
+        print(f"✅ {summary['total'] - summary['invalid']} of {summary['total']} rows are valid")
+        return not summary['invalid']
+    if not summary['created']:
+        print(f"❌ No users created, {summary['invalid']} invalid rows")
+        return False
+
+    print(f"✅ Created {summary['created']} users in {elapsed:.1f}s")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,188 @@
+"""
+Kiosk mode for shared clock-in terminals.
+
+A registered terminal exchanges its secret for a JWT once, then submits badge
+scans for any number of employees. Badges and active terminals are resolved
+from an in-process directory that is rebuilt when the change feed reports a
+user or terminal change, so a scan costs one open-session lookup and one
+commit.
+"""
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import g, jsonify
+from flask_jwt_extended import create_access_token, get_jwt, verify_jwt_in_request
+from sqlalchemy.exc import IntegrityError
+from database import db
+from models import Geofence, KioskTerminal, TimeEntry, User
+from active_sessions import get_open_entry, open_session, close_session
+from rollups import entry_snapshot, record_entry_change, split_entry_overtime
+from change_feed import FeedReader, publish, publish_entry_change
+
+KIOSK_TOKEN_HOURS = int(os.getenv('KIOSK_TOKEN_HOURS', '12'))
+KIOSK_DIRECTORY_TTL_SECONDS = int(os.getenv('KIOSK_DIRECTORY_TTL_SECONDS', '300'))
+KIOSK_ACTIONS = ('toggle', 'clock_in', 'clock_out')
+
+
+class KioskScanError(ValueError):
+    pass
+
+
+def hash_terminal_secret(secret):
+    return hashlib.sha256(secret.encode('utf-8')).hexdigest()
+
+
+def register_terminal(name, geofence_id=None):
+    """Create a terminal and return it with its secret, which is only shown once"""
+    secret = secrets.token_urlsafe(32)
+    terminal = KioskTerminal(name=name, geofence_id=geofence_id, token_hash=hash_terminal_secret(secret))
+    db.session.add(terminal)
+    db.session.commit()
+    publish('kiosk_terminals', terminal_id=terminal.id)
+    return terminal, secret
+
+
+def authenticate_terminal(terminal_id, secret):
+    """Exchange a terminal secret for an access token, or None if it is not valid"""
+    terminal = KioskTerminal.query.get(terminal_id)
+    if not terminal or not terminal.is_active or not secret:
+        return None
+    if not hmac.compare_digest(terminal.token_hash, hash_terminal_secret(secret)):
+        return None
+
+    terminal.last_authenticated_at = datetime.utcnow()
+    db.session.commit()
+
+    return create_access_token(
+        identity=f'kiosk:{terminal.id}',
+        additional_claims={'kiosk_terminal': terminal.id},
+        expires_delta=timedelta(hours=KIOSK_TOKEN_HOURS)
+    )
+
+
+class KioskDirectoryEntry:
+    __slots__ = ('id', 'name', 'latitude', 'longitude')
+
+    def __init__(self, entry_id, name, latitude=None, longitude=None):
+        self.id = entry_id
+        self.name = name
+        self.latitude = latitude
+        self.longitude = longitude
+
+
+class KioskDirectory:
+    """Badge codes of active users and active terminals, kept in memory"""
+
+    def __init__(self, ttl=KIOSK_DIRECTORY_TTL_SECONDS, reader=None):
+        self.ttl = ttl
+        self._reader = reader or FeedReader()
+        self._lock = threading.Lock()
+        self._badges = None
+        self._terminals = None
+        self._loaded_at = 0
+
+    def load(self):
+        users = User.query.with_entities(
+            User.id, User.first_name, User.last_name, User.badge_code
+        ).filter(User.badge_code.isnot(None), User.is_active == True).all()
+
+        terminals = KioskTerminal.query.with_entities(
+            KioskTerminal.id, KioskTerminal.name, Geofence.center_lat, Geofence.center_lon
+        ).outerjoin(Geofence, Geofence.id == KioskTerminal.geofence_id).filter(KioskTerminal.is_active == True).all()
+
+        badges = {row.badge_code: KioskDirectoryEntry(row.id, f"{row.first_name} {row.last_name}") for row in users}
+        terminals = {row.id: KioskDirectoryEntry(*row) for row in terminals}
+
+        with self._lock:
+            self._badges = badges
+            self._terminals = terminals
+            self._loaded_at = time.monotonic()
+        return badges, terminals
+
+    def invalidate(self):
+        with self._lock:
+            self._badges = None
+
+    def _current(self):
+        events, reset = self._reader.poll()
+        if reset or any(event.get('topic') in ('users', 'kiosk_terminals', 'reset') for event in events):
+            self.invalidate()
+
+        with self._lock:
+            if self._badges is not None and time.monotonic() - self._loaded_at <= self.ttl:
+                return self._badges, self._terminals
+        return self.load()
+
+    def badge(self, code):
+        return self._current()[0].get((code or '').strip())
+
+    def terminal(self, terminal_id):
+        return self._current()[1].get(terminal_id)
+
+
+kiosk_directory = KioskDirectory()
+
+
+def kiosk_required(f):
+    """Require a kiosk terminal token; the terminal is available as g.kiosk_terminal"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        verify_jwt_in_request()
+        terminal = kiosk_directory.terminal(get_jwt().get('kiosk_terminal'))
+        if terminal is None:
+            return jsonify({'error': 'Terminal not registered or inactive'}), 401
+
+        g.kiosk_terminal = terminal
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def record_scan(terminal, employee, action='toggle'):
+    """Clock an employee in or out from a terminal, returning the action taken and the entry"""
+    if action not in KIOSK_ACTIONS:
+        raise KioskScanError(f"action must be one of: {', '.join(KIOSK_ACTIONS)}")
+
+    entry = get_open_entry(employee.id)
+    if action == 'toggle':
+        action = 'clock_out' if entry else 'clock_in'
+
+    if action == 'clock_in':
+        if entry:
+            raise KioskScanError('Already clocked in')
+
+        entry = TimeEntry(
+            user_id=employee.id,
+            clock_in_time=datetime.utcnow(),
+            location_lat=terminal.latitude,
+            location_lon=terminal.longitude,
+            notes=f'Kiosk: {terminal.name}',
+            break_duration=0
+        )
+        db.session.add(entry)
+        open_session(entry)
+    else:
+        if not entry or not close_session(entry):
+            db.session.rollback()
+            raise KioskScanError('Not currently clocked in')
+
+        before = entry_snapshot(entry)
+        entry.clock_out_time = datetime.utcnow()
+        duration = (entry.clock_out_time - entry.clock_in_time).total_seconds() / 3600
+        entry.total_hours = max(0, duration - (entry.break_duration or 0))
+        record_entry_change(before, entry)
+        split_entry_overtime(entry)
+
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent scan clocked this employee in first
+        db.session.rollback()
+        raise KioskScanError('Already clocked in')
+
+    publish_entry_change(employee.id, entry.clock_in_time.date())
+    return action, entry
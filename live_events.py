@@ -0,0 +1,145 @@
+"""
+Fan-out of clock status changes to /api/events subscribers.
+
+One background thread per worker process tails the change feed and wakes
+the subscriptions interested in each changed user: the user's own stream,
+and the streams of managers watching that user's department (admins watch
+everyone). Streams then read the new status from the status cache, so a
+change costs one status lookup per process rather than per connection.
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from change_feed import FeedReader
+
+# Disable on sync or threaded workers, where each open stream would occupy a worker or thread
+EVENTS_STREAM_ENABLED = os.getenv('EVENTS_STREAM_ENABLED', '1') == '1'
+EVENTS_POLL_INTERVAL = float(os.getenv('EVENTS_POLL_INTERVAL', '0.5'))
+EVENTS_KEEPALIVE_SECONDS = float(os.getenv('EVENTS_KEEPALIVE_SECONDS', '25'))
+EVENTS_QUEUE_SIZE = 256
+
+# Sent instead of a user id when subscribers may have missed changes
+RESYNC = 'resync'
+
+
+def format_event(name, data):
+    return f"event: {name}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def watched_user_ids(user):
+    """Users whose presence the viewer is shown, or None for everyone"""
+    from models import Department, User
+
+    if user.role == 'admin':
+        return None
+    if user.role != 'manager':
+        return set()
+
+    rows = User.query.with_entities(User.id).join(
+        Department, Department.id == User.department_id
+    ).filter(Department.manager_id == user.id).all()
+    return {row.id for row in rows} - {user.id}
+
+
+class Subscription:
+    def __init__(self, user_id, watched):
+        self.user_id = user_id
+        self.watched = watched
+        self._queue = queue.Queue(maxsize=EVENTS_QUEUE_SIZE)
+
+    def notify(self, user_id):
+        try:
+            self._queue.put_nowait(user_id)
+        except queue.Full:
+            # A slow reader re-fetches everything instead of growing the queue
+            while True:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            self._queue.put_nowait(RESYNC)
+
+    def wait(self, timeout):
+        """Changed user ids since the last call, or None after the timeout"""
+        try:
+            changed = {self._queue.get(timeout=timeout)}
+        except queue.Empty:
+            return None
+
+        while True:
+            try:
+                changed.add(self._queue.get_nowait())
+            except queue.Empty:
+                return changed
+
+
+class EventHub:
+    def __init__(self, reader=None, poll_interval=EVENTS_POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self._reader = reader
+        self._lock = threading.Lock()
+        self._by_user = defaultdict(set)
+        self._watch_all = set()
+        self._thread = None
+
+    def subscribe(self, user_id, watched=None):
+        subscription = Subscription(user_id, watched)
+
+        with self._lock:
+            self._by_user[user_id].add(subscription)
+            if watched is None:
+                self._watch_all.add(subscription)
+            else:
+                for watched_id in watched:
+                    self._by_user[watched_id].add(subscription)
+
+            # Started lazily so each forked worker gets its own thread
+            if self._thread is None:
+                self._reader = self._reader or FeedReader()
+                self._thread = threading.Thread(target=self._run, name='event-hub', daemon=True)
+                self._thread.start()
+
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._watch_all.discard(subscription)
+            for user_id in {subscription.user_id} | (subscription.watched or set()):
+                subscribers = self._by_user.get(user_id)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._by_user[user_id]
+
+    def dispatch(self, events, reset):
+        with self._lock:
+            if reset or any(event.get('topic') == 'reset' for event in events):
+                targets = set(self._watch_all).union(*self._by_user.values())
+                for subscription in targets:
+                    subscription.notify(RESYNC)
+                return
+
+            for event in events:
+                if event.get('topic') != 'time_entries':
+                    continue
+                user_id = event.get('user_id')
+                for subscription in self._by_user.get(user_id, set()) | self._watch_all:
+                    subscription.notify(user_id)
+
+    def _run(self):
+        while True:
+            try:
+                events, reset = self._reader.poll()
+                if events or reset:
+                    self.dispatch(events, reset)
+            except Exception:
+                # Keep serving; the next poll picks up where this one stopped
+                logging.getLogger(__name__).exception('Event hub failed to dispatch changes')
+            time.sleep(self.poll_interval)
+
+
+event_hub = EventHub()
@@ -27,6 +27,12 @@ class User(UserMixin, db.Model):
     email_verified = db.Column(db.Boolean, default=False)
     last_login = db.Column(db.DateTime, nullable=True)
 
+    # Badge or PIN used to clock in at kiosk terminals
+    badge_code = db.Column(db.String(64), unique=True, nullable=True)
+
+    # Bumped to revoke issued JWTs when role, department or active flag change
+    token_version = db.Column(db.Integer, nullable=False, default=0)
+
     # Email verification fields
     email_verification_token = db.Column(db.String(100), nullable=True)
     email_verification_expires = db.Column(db.DateTime, nullable=True)
@@ -66,6 +72,9 @@ class TimeEntry(db.Model):
     location_lon = db.Column(db.Float)
     notes = db.Column(db.Text)
     is_overtime = db.Column(db.Boolean, default=False)
+    # Split of total_hours, set when the entry is closed
+    regular_hours = db.Column(db.Float)
+    overtime_hours = db.Column(db.Float, default=0)
     status = db.Column(db.String(20), default='active')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
@@ -138,4 +147,55 @@ class AuditLog(db.Model):
     new_values = db.Column(db.Text)
     ip_address = db.Column(db.String(45))
     user_agent = db.Column(db.Text)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
\ No newline at end of file
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+
+class DailyRollup(db.Model):
+    __tablename__ = 'daily_rollups'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    work_date = db.Column(db.Date, primary_key=True)
+    worked_hours = db.Column(db.Float, default=0)
+    break_hours = db.Column(db.Float, default=0)
+    overtime_hours = db.Column(db.Float, default=0)
+    entry_count = db.Column(db.Integer, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ActiveSession(db.Model):
+    __tablename__ = 'active_sessions'
+
+    # One row per clocked-in user, pointing at their open time entry
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    time_entry_id = db.Column(db.Integer, db.ForeignKey('time_entries.id'), unique=True, nullable=False)
+    started_at = db.Column(db.DateTime, nullable=False)
+
+    time_entry = db.relationship('TimeEntry')
+
+class KioskTerminal(db.Model):
+    __tablename__ = 'kiosk_terminals'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    token_hash = db.Column(db.String(64), nullable=False)  # SHA-256 of the terminal secret
+    geofence_id = db.Column(db.Integer, db.ForeignKey('geofences.id'), nullable=True)
+    is_active = db.Column(db.Boolean, default=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_authenticated_at = db.Column(db.DateTime)
+
+class ExportJob(db.Model):
+    __tablename__ = 'export_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    format = db.Column(db.String(20), nullable=False)
+    filters = db.Column(db.Text)  # JSON encoded report filters
+    status = db.Column(db.String(20), default='queued')  # queued, running, completed, failed, cancelled, expired
+    cancel_requested = db.Column(db.Boolean, default=False)
+    progress = db.Column(db.Float, default=0)
+    rows_written = db.Column(db.Integer, default=0)
+    total_rows = db.Column(db.Integer)
+    file_path = db.Column(db.String(500))
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    expires_at = db.Column(db.DateTime)
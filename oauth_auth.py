@@ -1,8 +1,10 @@
 from flask import Blueprint, request, jsonify, redirect, url_for, session
-from flask_jwt_extended import create_access_token
+from tokens import create_user_tokens
 from authlib.integrations.flask_client import OAuth
 from models import User, db
 from auth import log_action
+from password_pool import password_pool
+from usernames import save_new_user, username_base
 import os
 import requests
 from datetime import datetime
@@ -82,22 +84,11 @@ def google_callback():
                 log_action(user.id, 'GOOGLE_ACCOUNT_LINKED')
             else:
                 # Create new user
-                # Generate username from email
-                username = email.split('@')[0]
-                counter = 1
-                original_username = username
-
-                # Ensure username is unique
-                while User.query.filter_by(username=username).first():
-                    username = f"{original_username}{counter}"
-                    counter += 1
-
                 # Check if admin approval is required
                 require_approval = os.getenv('REQUIRE_ADMIN_APPROVAL', 'false').lower() == 'true'
                 is_active = not require_approval  # If approval required, start inactive
 
                 user = User(
-                    username=username,
                     email=email,
                     first_name=first_name,
                     last_name=last_name,
@@ -109,9 +100,8 @@ def google_callback():
                     auth_provider='google',
                     email_verified=True  # Google emails are verified
                 )
-
-                db.session.add(user)
-                db.session.commit()
+                # Username is generated from the email
+                save_new_user(user, username_base(email))
                 log_action(user.id, 'GOOGLE_ACCOUNT_CREATED')
 
         # Check if user account is active
@@ -123,7 +113,7 @@ def google_callback():
         db.session.commit()
 
         # Create JWT token
-        access_token = create_access_token(identity=user.id)
+        access_token = create_user_tokens(user)['access_token']
 
         # Store user info in session for frontend
         session['user_id'] = user.id
@@ -149,10 +139,9 @@ def link_google_account():
         return jsonify({'error': 'Username and password required'}), 400
 
     # Verify user credentials
-    from werkzeug.security import check_password_hash
     user = User.query.filter_by(username=username).first()
 
-    if not user or not check_password_hash(user.password_hash, password):
+    if not user or not password_pool.verify(user.password_hash, password):
         return jsonify({'error': 'Invalid credentials'}), 401
 
     if user.google_id:
@@ -219,11 +208,12 @@ def google_link_callback():
 @oauth_bp.route('/auth/unlink/google', methods=['POST'])
 def unlink_google_account():
     """Unlink Google account from user"""
-    from flask_jwt_extended import jwt_required, get_jwt_identity
+    from flask_jwt_extended import jwt_required
+    from tokens import jwt_user_id
 
     @jwt_required()
     def _unlink():
-        user_id = get_jwt_identity()
+        user_id = jwt_user_id()
         user = User.query.get(user_id)
 
         if not user:
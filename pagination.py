@@ -0,0 +1,78 @@
+"""
+Keyset (cursor) pagination over time entries.
+
+Pages are ordered by (clock_in_time, id) and the cursor encodes the last row of
+the previous page, so fetching a deep page is an index range scan rather than
+an OFFSET that has to skip every earlier row. Callers that still ask for a
+page number without a cursor get that page by OFFSET, so the page they are
+told they received is the one they got.
+"""
+import base64
+from datetime import datetime
+from sqlalchemy import and_, or_, func
+from models import TimeEntry
+
+MAX_PER_PAGE = 100
+
+
+def encode_cursor(clock_in_time, entry_id):
+    raw = f"{clock_in_time.isoformat()}|{entry_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Return (clock_in_time, id) from a cursor, raising ValueError if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        clock_in_time, entry_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(clock_in_time), int(entry_id)
+    except Exception:
+        raise ValueError('Invalid pagination cursor')
+
+
+def keyset_page(query, cursor=None, per_page=20, descending=False, page=1, max_per_page=MAX_PER_PAGE):
+    """
+    Fetch one page of entries after the cursor, returning (entries, next_cursor).
+
+    Without a cursor, page numbers above 1 are served by OFFSET for older clients.
+    """
+    if not 1 <= per_page <= max_per_page:
+        raise ValueError(f'per_page must be between 1 and {max_per_page}')
+    if page < 1:
+        raise ValueError('page must be at least 1')
+
+    if cursor:
+        clock_in_time, entry_id = decode_cursor(cursor)
+        if descending:
+            query = query.filter(or_(
+                TimeEntry.clock_in_time < clock_in_time,
+                and_(TimeEntry.clock_in_time == clock_in_time, TimeEntry.id < entry_id)
+            ))
+        else:
+            query = query.filter(or_(
+                TimeEntry.clock_in_time > clock_in_time,
+                and_(TimeEntry.clock_in_time == clock_in_time, TimeEntry.id > entry_id)
+            ))
+
+    if descending:
+        query = query.order_by(TimeEntry.clock_in_time.desc(), TimeEntry.id.desc())
+    else:
+        query = query.order_by(TimeEntry.clock_in_time, TimeEntry.id)
+
+    if not cursor and page > 1:
+        query = query.offset((page - 1) * per_page)
+
+    # Fetch one extra row to learn whether another page follows
+    entries = query.limit(per_page + 1).all()
+    next_cursor = None
+    if len(entries) > per_page:
+        entries = entries[:per_page]
+        last = entries[-1]
+        next_cursor = encode_cursor(last.clock_in_time, last.id)
+
+    return entries, next_cursor
+
+
+def count_entries(query):
+    """Row count without loading or ordering the entries"""
+    return query.with_entities(func.count(TimeEntry.id)).order_by(None).scalar() or 0
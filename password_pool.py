@@ -0,0 +1,128 @@
+"""
+Password hashing and verification in a pool of worker processes.
+
+Hashing is deliberately slow, so doing it inside a web worker stalls every
+other request that worker could be serving. The functions here send the work
+to a process pool shared by the threads of one worker process. At most
+PASSWORD_POOL_QUEUE operations may be waiting or running at once. Beyond
+that, PasswordPoolBusy is raised straight away, and the app answers 503, so
+a login storm is shed early instead of piling up behind the pool.
+
+New hashes use PASSWORD_HASH_METHOD. Hashes made with any other method still
+verify, including bcrypt hashes from earlier versions of auth.hash_password().
+They are replaced with a PASSWORD_HASH_METHOD hash the next time the user
+logs in. PASSWORD_POOL_SIZE=0 does the work inline.
+"""
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+import bcrypt
+from werkzeug.security import generate_password_hash, check_password_hash
+
+PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+PASSWORD_POOL_SIZE = int(os.getenv('PASSWORD_POOL_SIZE', '2'))
+PASSWORD_POOL_QUEUE = int(os.getenv('PASSWORD_POOL_QUEUE', str(max(PASSWORD_POOL_SIZE, 1) * 8)))
+PASSWORD_POOL_TIMEOUT = float(os.getenv('PASSWORD_POOL_TIMEOUT', '10'))
+
+
+class PasswordPoolBusy(Exception):
+    pass
+
+
+def needs_rehash(password_hash, method=PASSWORD_HASH_METHOD):
+    return not password_hash.startswith(f'{method}$')
+
+
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+
+def _verify(password_hash, password):
+    if password_hash.startswith(('$2a$', '$2b$', '$2y$')):
+        return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+    return check_password_hash(password_hash, password)
+
+
+def _verify_and_rehash(password_hash, password, method):
+    """Whether the password matches, and its hash with the configured method if that differs"""
+    if not password_hash or not _verify(password_hash, password):
+        return False, None
+    return True, _hash(password, method) if needs_rehash(password_hash, method) else None
+
+
+def _hash_many(passwords, method):
+    return [_hash(password, method) for password in passwords]
+
+
+class PasswordPool:
+    def __init__(self, size=PASSWORD_POOL_SIZE, max_pending=PASSWORD_POOL_QUEUE, timeout=PASSWORD_POOL_TIMEOUT,
+                 method=PASSWORD_HASH_METHOD):
+        self.size = size
+        self.timeout = timeout
+        self.method = method
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def _get_executor(self):
+        with self._lock:
+            # Started lazily so each forked worker gets its own pool
+            if self._executor is None or self._pid != os.getpid():
+                # Spawned children only import this module, not the app or its threads
+                self._executor = ProcessPoolExecutor(self.size, mp_context=multiprocessing.get_context('spawn'))
+                self._pid = os.getpid()
+            return self._executor
+
+    def _run(self, function, *args):
+        if self.size <= 0:
+            return function(*args)
+
+        if not self._slots.acquire(blocking=False):
+            raise PasswordPoolBusy('Too many password operations in progress, try again shortly')
+        try:
+            return self._get_executor().submit(function, *args).result(timeout=self.timeout)
+        except TimeoutError:
+            raise PasswordPoolBusy('Password check timed out, try again shortly')
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return bool(password_hash) and self._run(_verify, password_hash, password)
+
+    def verify_and_upgrade(self, user, password):
+        """
+        Check a user's password, rehashing it with the configured method if needed.
+
+        The new hash is set on the user without committing.
+        """
+        matches, new_hash = self._run(_verify_and_rehash, user.password_hash, password, self.method)
+        if new_hash:
+            user.password_hash = new_hash
+        return matches
+
+    def hash_many(self, passwords, chunk_size=64):
+        """Hash a batch of passwords across all pool processes, in order"""
+        passwords = list(passwords)
+        if self.size <= 0:
+            return _hash_many(passwords, self.method)
+
+        # Bulk work bypasses the request queue limit but keeps every process busy
+        chunks = [passwords[i:i + chunk_size] for i in range(0, len(passwords), chunk_size)]
+        futures = [self._get_executor().submit(_hash_many, chunk, self.method) for chunk in chunks]
+        return [password_hash for future in futures for password_hash in future.result()]
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_pool = PasswordPool()
+atexit.register(password_pool.shutdown)
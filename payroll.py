@@ -0,0 +1,157 @@
+"""
+Pay period calculation for all active employees at once.
+
+Worked and break hours are fetched with one query grouped by user and day,
+then regular and overtime hours are split with vectorised NumPy operations:
+hours above the daily threshold are daily overtime, and the remaining regular
+hours above the weekly threshold (Monday based weeks) are weekly overtime.
+Weeks that straddle the period boundary only count the days inside the period.
+"""
+import os
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import func
+from models import TimeEntry, User
+from sql_functions import day_of, as_date
+
+PAYROLL_DAILY_OVERTIME_HOURS = float(os.getenv('PAYROLL_DAILY_OVERTIME_HOURS', '8'))
+PAYROLL_WEEKLY_OVERTIME_HOURS = float(os.getenv('PAYROLL_WEEKLY_OVERTIME_HOURS', '40'))
+
+
+class OvertimeRules:
+    """Overtime thresholds in hours; None or 0 disables a rule"""
+
+    def __init__(self, daily_threshold=PAYROLL_DAILY_OVERTIME_HOURS, weekly_threshold=PAYROLL_WEEKLY_OVERTIME_HOURS):
+        self.daily_threshold = daily_threshold or None
+        self.weekly_threshold = weekly_threshold or None
+
+    def to_dict(self):
+        return {
+            'daily_overtime_hours': self.daily_threshold,
+            'weekly_overtime_hours': self.weekly_threshold
+        }
+
+
+def _group_sum(keys, values):
+    """Sum values per distinct key, returning (unique keys, index of each key, sums)"""
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    return unique_keys, inverse, np.bincount(inverse, weights=values, minlength=unique_keys.size)
+
+
+def compute_payroll(user_ids, day_ordinals, worked_hours, break_hours, rules=None):
+    """
+    Split per-(user, day) hours into regular and overtime hours per user.
+
+    All arguments are equal length arrays with at most one element per user
+    and day. Returns the distinct user ids and a dict of per-user arrays.
+    """
+    rules = rules or OvertimeRules()
+    user_ids = np.asarray(user_ids, dtype=np.int64)
+    day_ordinals = np.asarray(day_ordinals, dtype=np.int64)
+    worked_hours = np.asarray(worked_hours, dtype=np.float64)
+    break_hours = np.asarray(break_hours, dtype=np.float64)
+
+    if rules.daily_threshold:
+        daily_overtime = np.maximum(worked_hours - rules.daily_threshold, 0)
+    else:
+        daily_overtime = np.zeros_like(worked_hours)
+    daily_regular = worked_hours - daily_overtime
+
+    users, user_index, _ = _group_sum(user_ids, worked_hours)
+
+    if rules.weekly_threshold and users.size:
+        # Ordinal 1 (0001-01-01) is a Monday, so this numbers Monday based weeks
+        weeks = (day_ordinals - 1) // 7
+        week_keys = user_index * (int(weeks.max()) + 1) + weeks
+        _, week_index, week_regular = _group_sum(week_keys, daily_regular)
+        week_overtime = np.maximum(week_regular - rules.weekly_threshold, 0)
+        week_users = np.zeros(week_regular.size, dtype=np.int64)
+        week_users[week_index] = user_index
+        weekly_overtime = np.bincount(week_users, weights=week_overtime, minlength=users.size)
+    else:
+        weekly_overtime = np.zeros(users.size)
+
+    def per_user(values):
+        return np.bincount(user_index, weights=values, minlength=users.size)
+
+    total_worked = per_user(worked_hours)
+    daily_overtime_total = per_user(daily_overtime)
+    overtime = daily_overtime_total + weekly_overtime
+
+    return users, {
+        'worked_hours': total_worked,
+        'regular_hours': total_worked - overtime,
+        'daily_overtime_hours': daily_overtime_total,
+        'weekly_overtime_hours': weekly_overtime,
+        'overtime_hours': overtime,
+        'break_hours': per_user(break_hours),
+        'days_worked': np.bincount(user_index, minlength=users.size)
+    }
+
+
+def fetch_daily_hours(start_date, end_date, department_id=None):
+    """Net worked and break hours per (active user, day) for completed entries in the period"""
+    day = day_of(TimeEntry.clock_in_time)
+    query = TimeEntry.query.with_entities(
+        TimeEntry.user_id,
+        day,
+        func.sum(func.coalesce(TimeEntry.total_hours, 0)),
+        func.sum(func.coalesce(TimeEntry.break_duration, 0))
+    ).join(User, User.id == TimeEntry.user_id).filter(
+        User.is_active == True,
+        TimeEntry.clock_out_time.isnot(None),
+        TimeEntry.clock_in_time >= datetime.combine(start_date, datetime.min.time()),
+        TimeEntry.clock_in_time < datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+    )
+    if department_id:
+        query = query.filter(User.department_id == department_id)
+
+    rows = query.group_by(TimeEntry.user_id, day).all()
+    count = len(rows)
+
+    return (
+        np.fromiter((row[0] for row in rows), dtype=np.int64, count=count),
+        np.fromiter((as_date(row[1]).toordinal() for row in rows), dtype=np.int64, count=count),
+        np.fromiter((float(row[2] or 0) for row in rows), dtype=np.float64, count=count),
+        np.fromiter((float(row[3] or 0) for row in rows), dtype=np.float64, count=count)
+    )
+
+
+def run_payroll(start_date, end_date, rules=None, department_id=None):
+    """Payroll lines for every active employee, including those without hours"""
+    rules = rules or OvertimeRules()
+
+    employees = User.query.with_entities(
+        User.id, User.username, User.first_name, User.last_name, User.department_id
+    ).filter(User.is_active == True)
+    if department_id:
+        employees = employees.filter(User.department_id == department_id)
+    employees = employees.order_by(User.id).all()
+
+    users, totals = compute_payroll(*fetch_daily_hours(start_date, end_date, department_id), rules=rules)
+    positions = {user_id: position for position, user_id in enumerate(users.tolist())}
+    columns = {name: values.tolist() for name, values in totals.items()}
+
+    lines = []
+    for employee in employees:
+        position = positions.get(employee.id)
+        line = {
+            'user_id': employee.id,
+            'username': employee.username,
+            'name': f"{employee.first_name} {employee.last_name}",
+            'department_id': employee.department_id
+        }
+        for name, values in columns.items():
+            line[name] = values[position] if position is not None else 0
+        lines.append(line)
+
+    return {
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'rules': rules.to_dict(),
+        'employees': lines,
+        'totals': {
+            name: float(totals[name].sum())
+            for name in ('worked_hours', 'regular_hours', 'overtime_hours', 'break_hours')
+        }
+    }
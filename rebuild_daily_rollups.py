@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import sys
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db
+from models import DailyRollup
+from rollups import rebuild_rollups, rebuild_entry_overtime
+from change_feed import publish
+
+def parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild per-user daily rollups from time entries')
+    parser.add_argument('--start', type=parse_date, help='First day to rebuild (YYYY-MM-DD)')
+    parser.add_argument('--end', type=parse_date, help='Last day to rebuild (YYYY-MM-DD)')
+    parser.add_argument('--user', type=int, help='Only rebuild rollups for this user id')
+    args = parser.parse_args()
+
+    with app.app_context():
+        DailyRollup.__table__.create(db.engine, checkfirst=True)
+
+        try:
+            count = rebuild_rollups(args.start, args.end, args.user)
+            split_count = rebuild_entry_overtime(args.start, args.end, args.user)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error rebuilding daily rollups: {e}")
+            return False
+
+        # Cached reports may have been built from the drifted rollups
+        publish('reset', reason='daily_rollups_rebuilt')
+        print(f"✅ Rebuilt {count} daily rollup rows")
+        print(f"✅ Recomputed regular and overtime hours for {split_count} time entries")
+        return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
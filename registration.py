@@ -1,7 +1,8 @@
 from flask import Blueprint, request, jsonify, render_template, redirect, url_for
 from models import User, db
 from auth import hash_password, log_action
-from werkzeug.security import generate_password_hash
+from password_pool import password_pool
+from usernames import save_new_user, username_base
 import os
 import re
 import secrets
@@ -172,16 +173,6 @@ def register():
     if User.query.filter_by(email=email).first():
         return jsonify({'error': 'Email address already registered'}), 400
 
-    # Generate username from email
-    username = email.split('@')[0]
-    counter = 1
-    original_username = username
-
-    # Ensure username is unique
-    while User.query.filter_by(username=username).first():
-        username = f"{original_username}{counter}"
-        counter += 1
-
     # Validate password strength
     if len(password) < 8:
         return jsonify({'error': 'Password must be at least 8 characters long'}), 400
@@ -190,14 +181,16 @@ def register():
     require_approval = os.getenv('REQUIRE_ADMIN_APPROVAL', 'false').lower() == 'true'
     is_active = not require_approval
 
+    # Hashed before the try so a busy pool answers 503 rather than failing the registration
+    password_hash = password_pool.hash(password)
+
     # Create user
     try:
         user = User(
-            username=username,
             email=email,
             first_name=first_name,
             last_name=last_name,
-            password_hash=generate_password_hash(password),
+            password_hash=password_hash,
             role='employee',
             is_active=is_active,
             auth_provider='local',
@@ -211,8 +204,8 @@ def register():
             user.email_verification_token = verification_token
             user.email_verification_expires = datetime.utcnow() + timedelta(hours=24)
 
-        db.session.add(user)
-        db.session.commit()
+        # Username is generated from the email
+        save_new_user(user, username_base(email))
 
         log_action(user.id, 'USER_REGISTERED')
 
@@ -0,0 +1,99 @@
+"""
+In-process cache for /api/reports results.
+
+Entries are keyed by the viewer's scope and the report filters, evicted in LRU
+order and after a TTL, and dropped as soon as the change feed reports a write
+to a user and day that the cached report covers.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+from change_feed import FeedReader
+
+REPORT_CACHE_SIZE = int(os.getenv('REPORT_CACHE_SIZE', '256'))
+REPORT_CACHE_TTL_SECONDS = int(os.getenv('REPORT_CACHE_TTL_SECONDS', '300'))
+
+
+def report_scope(viewer, employee_id=None):
+    """User id the report is limited to, or None when it covers everyone"""
+    if viewer.role in ['admin', 'manager']:
+        return int(employee_id) if employee_id else None
+    return viewer.id
+
+
+class ReportCache:
+    def __init__(self, max_entries=REPORT_CACHE_SIZE, ttl=REPORT_CACHE_TTL_SECONDS, reader=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._reader = reader or FeedReader()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        # Only get() consumes the feed: a result computed before a write is
+        # stored by set() and then evicted by the next get()
+        self._sync()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, scope, first_day, last_day, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, scope, first_day, last_day):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, scope, first_day, last_day, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def invalidate(self, user_id, days):
+        with self._lock:
+            for key, (expires_at, scope, first_day, last_day, value) in list(self._entries.items()):
+                if scope is not None and scope != user_id:
+                    continue
+                if any(first_day <= day <= last_day for day in days):
+                    del self._entries[key]
+
+    def _sync(self):
+        events, reset = self._reader.poll()
+        if reset:
+            self.clear()
+
+        for event in events:
+            if event.get('topic') == 'time_entries':
+                days = [date.fromisoformat(d) for d in event.get('dates', [])]
+                self.invalidate(event.get('user_id'), days)
+            elif event.get('topic') == 'reset':
+                self.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+report_cache = ReportCache()
+
+
+def cached_report(viewer, report_type, start_date, end_date, employee_id, page, per_page, cursor, build):
+    """Return a cached report payload or build and cache it"""
+    # Reports with the same effective user filter are identical whoever asks
+    scope = report_scope(viewer, employee_id)
+    key = (scope, start_date, end_date, report_type, page, per_page, cursor)
+
+    result = report_cache.get(key)
+    if result is None:
+        result = build()
+        # Entries up to the day after end_date fall inside the report's window
+        report_cache.set(key, result, scope, start_date.date(), end_date.date() + timedelta(days=1))
+    return result
@@ -0,0 +1,289 @@
+"""
+Report engine for /api/reports.
+
+A single grouped query reduces the matching time entries to one bucket per
+(day, project). The buckets are loaded into columnar NumPy arrays, and the
+summary, every chart type and the page count are computed from those arrays
+with bincount-style grouping, so the work done in Python grows with the number
+of buckets rather than the number of entries.
+
+Overtime is the per-user daily overtime kept in daily_rollups, the same
+figure the timesheet summaries report, so several short entries on one day
+can add up to overtime. The summary's total, regular and overtime hours all
+come from the rollups, so they share one basis: hours net of breaks, by the
+day the entry started.
+"""
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import case, func
+from sqlalchemy.orm import joinedload
+from models import TimeEntry, Project, DailyRollup
+from sql_functions import hours_between, day_of, as_date
+from pagination import keyset_page
+
+
+def parse_report_range(start_date, end_date):
+    """Parse YYYY-MM-DD query parameters, defaulting to the last 7 days"""
+    # Defaults are whole days, like explicit dates, so repeated requests share a cache key
+    today = datetime.combine(datetime.now().date(), datetime.min.time())
+
+    if start_date:
+        start_date = datetime.strptime(start_date, '%Y-%m-%d')
+    else:
+        start_date = today - timedelta(days=7)
+
+    if end_date:
+        end_date = datetime.strptime(end_date, '%Y-%m-%d')
+    else:
+        end_date = today
+
+    return start_date, end_date
+
+
+def scoped_entries_query(viewer, start_date, end_date, employee_id=None):
+    """Time entries in the date range that the viewer is allowed to see"""
+    query = TimeEntry.query.filter(
+        TimeEntry.clock_in_time >= start_date,
+        TimeEntry.clock_in_time <= end_date + timedelta(days=1)
+    )
+
+    # Filter by employee if specified and user has permission
+    if employee_id and viewer.role in ['admin', 'manager']:
+        query = query.filter(TimeEntry.user_id == employee_id)
+    elif viewer.role not in ['admin', 'manager']:
+        # Regular users can only see their own data
+        query = query.filter(TimeEntry.user_id == viewer.id)
+
+    return query
+
+
+def scoped_rollups_query(viewer, start_date, end_date, employee_id=None):
+    """Daily rollups in the date range with the same visibility rules as entries"""
+    query = DailyRollup.query.filter(
+        DailyRollup.work_date >= start_date.date(),
+        DailyRollup.work_date <= end_date.date()
+    )
+
+    if employee_id and viewer.role in ['admin', 'manager']:
+        query = query.filter(DailyRollup.user_id == employee_id)
+    elif viewer.role not in ['admin', 'manager']:
+        query = query.filter(DailyRollup.user_id == viewer.id)
+
+    return query
+
+
+def entry_hours():
+    return hours_between(TimeEntry.clock_in_time, TimeEntry.clock_out_time)
+
+
+class ReportBuckets:
+    """Columnar per-(day, project) totals for the entries in a report, plus daily rollup totals"""
+
+    def __init__(self, rows, rollup_rows):
+        count = len(rows)
+        self.days = np.fromiter((as_date(row[0]).toordinal() for row in rows), dtype=np.int64, count=count)
+        # Project id 0 stands for entries without a project
+        self.projects = np.fromiter((row[1] or 0 for row in rows), dtype=np.int64, count=count)
+        self.hours = np.fromiter((float(row[2] or 0) for row in rows), dtype=np.float64, count=count)
+        self.entries = np.fromiter((int(row[3] or 0) for row in rows), dtype=np.int64, count=count)
+        self.completed = np.fromiter((int(row[4] or 0) for row in rows), dtype=np.int64, count=count)
+
+        count = len(rollup_rows)
+        self.rollup_days = np.fromiter((as_date(row[0]).toordinal() for row in rollup_rows),
+                                       dtype=np.int64, count=count)
+        self.worked = np.fromiter((float(row[1] or 0) for row in rollup_rows), dtype=np.float64, count=count)
+        self.overtime = np.fromiter((float(row[2] or 0) for row in rollup_rows), dtype=np.float64, count=count)
+
+
+def fetch_report_buckets(query, rollups_query):
+    day = day_of(TimeEntry.clock_in_time)
+    rows = query.with_entities(
+        day,
+        TimeEntry.project_id,
+        func.sum(entry_hours()),
+        func.count(TimeEntry.id),
+        func.sum(case((TimeEntry.clock_out_time.isnot(None), 1), else_=0))
+    ).group_by(day, TimeEntry.project_id).all()
+
+    rollup_rows = rollups_query.with_entities(
+        DailyRollup.work_date,
+        func.sum(DailyRollup.worked_hours),
+        func.sum(DailyRollup.overtime_hours)
+    ).group_by(DailyRollup.work_date).all()
+
+    return ReportBuckets(rows, rollup_rows)
+
+
+def generate_summary(buckets, start_date, end_date):
+    # Rollups only hold completed entries, net of breaks
+    total_hours = float(buckets.worked.sum())
+    overtime_hours = float(buckets.overtime.sum())
+    days_present = np.unique(buckets.days).size
+
+    # Calculate attendance rate (simplified)
+    working_days = (end_date - start_date).days + 1
+    attendance_rate = (days_present / max(working_days, 1)) * 100
+
+    return {
+        'total_hours': total_hours,
+        'regular_hours': max(0, total_hours - overtime_hours),
+        'overtime_hours': overtime_hours,
+        'attendance_rate': attendance_rate
+    }
+
+
+def _daily_series(days, values, start_date, end_date):
+    first_day = start_date.date()
+    day_count = max((end_date.date() - first_day).days + 1, 0)
+
+    offsets = days - first_day.toordinal()
+    in_range = (offsets >= 0) & (offsets < day_count)
+    totals = np.bincount(offsets[in_range], weights=values[in_range], minlength=day_count)
+
+    labels = [(first_day + timedelta(days=i)).strftime('%m/%d') for i in range(day_count)]
+    return labels, totals.tolist()
+
+
+def generate_attendance_chart(buckets, start_date, end_date):
+    labels, data = _daily_series(buckets.days, buckets.hours, start_date, end_date)
+
+    return {
+        'labels': labels,
+        'datasets': [{
+            'label': 'Daily Hours',
+            'data': data,
+            'borderColor': '#0d6efd',
+            'backgroundColor': 'rgba(13, 110, 253, 0.1)',
+            'tension': 0.1
+        }]
+    }
+
+
+def generate_overtime_chart(buckets, start_date, end_date):
+    labels, data = _daily_series(buckets.rollup_days, buckets.overtime, start_date, end_date)
+
+    return {
+        'labels': labels,
+        'datasets': [{
+            'label': 'Overtime Hours',
+            'data': data,
+            'borderColor': '#ffc107',
+            'backgroundColor': 'rgba(255, 193, 7, 0.1)',
+            'tension': 0.1
+        }]
+    }
+
+
+def generate_project_chart(buckets, start_date, end_date):
+    # Only completed entries count towards project hours
+    completed = buckets.completed > 0
+    project_ids, inverse = np.unique(buckets.projects[completed], return_inverse=True)
+    totals = np.bincount(inverse, weights=buckets.hours[completed], minlength=project_ids.size)
+
+    names = dict(Project.query.with_entities(Project.id, Project.name).filter(
+        Project.id.in_([int(project_id) for project_id in project_ids if project_id])
+    ).all()) if project_ids.any() else {}
+
+    project_hours = {}
+    for project_id, hours in zip(project_ids.tolist(), totals.tolist()):
+        label = names.get(project_id) or 'No Project'
+        project_hours[label] = project_hours.get(label, 0) + hours
+
+    labels = sorted(project_hours)
+
+    return {
+        'labels': labels,
+        'datasets': [{
+            'label': 'Project Hours',
+            'data': [project_hours[label] for label in labels],
+            'borderColor': '#198754',
+            'backgroundColor': 'rgba(25, 135, 84, 0.1)',
+            'tension': 0.1
+        }]
+    }
+
+
+def generate_table_data(query, report_type, cursor, per_page, page=1):
+    # Load each row's employee in the same statement instead of one query per row
+    page_entries, next_cursor = keyset_page(
+        query.options(joinedload(TimeEntry.user)), cursor, per_page, page=page
+    )
+
+    if report_type == 'attendance':
+        headers = ['Date', 'Employee', 'Clock In', 'Clock Out', 'Total Hours', 'Status']
+        rows = []
+        for entry in page_entries:
+            duration = 0
+            status = 'Incomplete'
+            if entry.clock_out_time:
+                duration = (entry.clock_out_time - entry.clock_in_time).total_seconds() / 3600
+                status = 'Complete'
+
+            rows.append([
+                entry.clock_in_time.strftime('%Y-%m-%d'),
+                f"{entry.user.first_name} {entry.user.last_name}",
+                entry.clock_in_time.strftime('%H:%M'),
+                entry.clock_out_time.strftime('%H:%M') if entry.clock_out_time else 'N/A',
+                f"{duration:.2f}",
+                status
+            ])
+    else:
+        # Default table structure
+        headers = ['Date', 'Employee', 'Hours', 'Notes']
+        rows = []
+        for entry in page_entries:
+            duration = 0
+            if entry.clock_out_time:
+                duration = (entry.clock_out_time - entry.clock_in_time).total_seconds() / 3600
+
+            rows.append([
+                entry.clock_in_time.strftime('%Y-%m-%d'),
+                f"{entry.user.first_name} {entry.user.last_name}",
+                f"{duration:.2f}",
+                entry.notes or 'N/A'
+            ])
+
+    return {
+        'headers': headers,
+        'rows': rows
+    }, next_cursor
+
+
+def build_report(viewer, report_type, start_date, end_date, employee_id=None, page=1, per_page=20, cursor=None):
+    """Assemble the /api/reports payload; the table page starts after `cursor`"""
+    query = scoped_entries_query(viewer, start_date, end_date, employee_id)
+    buckets = fetch_report_buckets(query, scoped_rollups_query(viewer, start_date, end_date, employee_id))
+
+    summary = generate_summary(buckets, start_date, end_date)
+
+    # Generate chart data based on report type
+    if report_type == 'overtime':
+        chart_data = generate_overtime_chart(buckets, start_date, end_date)
+    elif report_type == 'project':
+        chart_data = generate_project_chart(buckets, start_date, end_date)
+    else:
+        chart_data = generate_attendance_chart(buckets, start_date, end_date)
+
+    # Generate secondary chart (time distribution)
+    secondary_chart = {
+        'labels': ['Regular Hours', 'Overtime Hours', 'Break Time'],
+        'datasets': [{
+            'data': [summary['regular_hours'], summary['overtime_hours'], summary['total_hours'] * 0.1],
+            'backgroundColor': ['#198754', '#ffc107', '#6c757d']
+        }]
+    }
+
+    table_data, next_cursor = generate_table_data(query, report_type, cursor, per_page, page)
+    total_entries = int(buckets.entries.sum())
+
+    return {
+        'summary': summary,
+        'chart_data': chart_data,
+        'secondary_chart': secondary_chart,
+        'table_data': table_data,
+        'pagination': {
+            'current_page': page,
+            'total_pages': max(1, (total_entries + per_page - 1) // per_page),
+            'next_cursor': next_cursor
+        }
+    }
@@ -0,0 +1,264 @@
+"""
+Per-user daily rollups of time entries.
+
+Each row in daily_rollups holds the worked hours, break hours, overtime and
+number of completed entries for one user on one day. Rows are adjusted
+incrementally in the same transaction as the time entry change, and
+rebuild_rollups() recomputes them from time_entries to repair any drift.
+When two transactions create the same day's row at once, the one whose
+insert fails adds its delta to the other's row instead.
+
+When an entry is closed, split_entry_overtime() reads its day's and week's
+totals back from the rollups and stores how many of the entry's hours were
+regular and how many overtime, using the payroll overtime rules. Entries are
+split in the order they were closed, so the hours that cross a threshold are
+counted as overtime. The rollups' own overtime_hours uses the same daily
+threshold.
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import case, func
+from sqlalchemy.exc import IntegrityError
+from database import db
+from models import DailyRollup, TimeEntry
+from payroll import OvertimeRules
+from sql_functions import day_of, as_date
+
+# Matches the NUMBER(8,2) regular_hours and overtime_hours columns
+HOURS_PRECISION = 2
+
+
+def entry_snapshot(entry):
+    """Capture what an entry currently contributes to its day's rollup"""
+    if not entry or not entry.clock_in_time:
+        return None
+
+    closed = entry.clock_out_time is not None
+    return (
+        entry.user_id,
+        entry.clock_in_time.date(),
+        (entry.total_hours or 0) if closed else 0,
+        entry.break_duration or 0,
+        1 if closed else 0
+    )
+
+
+def _daily_overtime(worked, threshold):
+    return max(0, worked - threshold) if threshold else 0
+
+
+def _overtime_for(worked_expression, threshold):
+    if not threshold:
+        return 0
+    return case((worked_expression > threshold, worked_expression - threshold), else_=0)
+
+
+def _update_rollup(user_id, work_date, worked, breaks, entries, threshold):
+    new_worked = DailyRollup.worked_hours + worked
+    return DailyRollup.query.filter_by(
+        user_id=user_id,
+        work_date=work_date
+    ).update({
+        DailyRollup.worked_hours: new_worked,
+        DailyRollup.break_hours: DailyRollup.break_hours + breaks,
+        DailyRollup.overtime_hours: _overtime_for(new_worked, threshold),
+        DailyRollup.entry_count: DailyRollup.entry_count + entries,
+        DailyRollup.updated_at: datetime.utcnow()
+    }, synchronize_session=False)
+
+
+def apply_delta(user_id, work_date, worked=0, breaks=0, entries=0):
+    """Add a delta to one user/day rollup row without committing"""
+    if not (worked or breaks or entries):
+        return
+
+    threshold = OvertimeRules().daily_threshold
+    if _update_rollup(user_id, work_date, worked, breaks, entries, threshold):
+        return
+
+    try:
+        # The savepoint keeps the caller's transaction usable if the insert loses a race
+        with db.session.begin_nested():
+            db.session.add(DailyRollup(
+                user_id=user_id,
+                work_date=work_date,
+                worked_hours=worked,
+                break_hours=breaks,
+                overtime_hours=_daily_overtime(worked, threshold),
+                entry_count=entries
+            ))
+    except IntegrityError:
+        # Another transaction created the row first, so add to it instead
+        _update_rollup(user_id, work_date, worked, breaks, entries, threshold)
+
+
+def record_entry_change(before, entry):
+    """Move an entry's contribution from its previous snapshot to its current state"""
+    after = entry_snapshot(entry)
+    if before == after:
+        return
+
+    if before:
+        user_id, work_date, worked, breaks, entries = before
+        apply_delta(user_id, work_date, -worked, -breaks, -entries)
+
+    if after:
+        user_id, work_date, worked, breaks, entries = after
+        apply_delta(user_id, work_date, worked, breaks, entries)
+
+
+def _overtime_split(hours, day_before, week_regular_before, rules):
+    """Regular and overtime hours of an entry worked on top of its day's and week's earlier totals"""
+    daily_overtime = 0
+    if rules.daily_threshold:
+        daily_overtime = (max(0, day_before + hours - rules.daily_threshold)
+                          - max(0, day_before - rules.daily_threshold))
+
+    weekly_overtime = 0
+    if rules.weekly_threshold:
+        week_regular_after = week_regular_before + hours - daily_overtime
+        weekly_overtime = (max(0, week_regular_after - rules.weekly_threshold)
+                           - max(0, week_regular_before - rules.weekly_threshold))
+
+    # Rollups are kept with float deltas, so clamp any rounding drift
+    overtime = min(hours, max(0, daily_overtime + weekly_overtime))
+    return hours - overtime, overtime
+
+
+def _daily_regular(worked, rules):
+    return min(worked, rules.daily_threshold) if rules.daily_threshold else worked
+
+
+def _set_split(entry, regular, overtime):
+    entry.regular_hours = round(regular, HOURS_PRECISION)
+    entry.overtime_hours = round(overtime, HOURS_PRECISION)
+    entry.is_overtime = entry.overtime_hours > 0
+
+
+def split_entry_overtime(entry, rules=None):
+    """
+    Store the regular/overtime split of a just closed entry without committing.
+
+    Call after record_entry_change() so the rollups already include the entry.
+    Costs one query however many entries the user has that day or week.
+    """
+    rules = rules or OvertimeRules()
+    hours = entry.total_hours or 0
+    work_date = entry.clock_in_time.date()
+    week_start = work_date - timedelta(days=work_date.weekday())
+
+    daily_regular = DailyRollup.worked_hours
+    if rules.daily_threshold:
+        daily_regular = case((DailyRollup.worked_hours > rules.daily_threshold, rules.daily_threshold),
+                             else_=DailyRollup.worked_hours)
+
+    day_after, week_regular_after = db.session.query(
+        func.sum(case((DailyRollup.work_date == work_date, DailyRollup.worked_hours), else_=0)),
+        func.sum(daily_regular)
+    ).filter(
+        DailyRollup.user_id == entry.user_id,
+        DailyRollup.work_date >= week_start,
+        DailyRollup.work_date <= work_date
+    ).one()
+
+    day_after = float(day_after or 0)
+    day_before = day_after - hours
+    week_regular_before = (float(week_regular_after or 0)
+                           - (_daily_regular(day_after, rules) - _daily_regular(day_before, rules)))
+
+    _set_split(entry, *_overtime_split(hours, day_before, week_regular_before, rules))
+
+
+def rebuild_entry_overtime(start_date=None, end_date=None, user_id=None, rules=None):
+    """
+    Recompute the regular/overtime split of closed entries without committing.
+
+    The range is widened to whole Monday based weeks, since the weekly rule
+    depends on every day of the week. Returns the number of entries updated.
+    """
+    rules = rules or OvertimeRules()
+    query = TimeEntry.query.with_entities(
+        TimeEntry.id, TimeEntry.user_id, TimeEntry.clock_in_time, TimeEntry.total_hours
+    ).filter(TimeEntry.clock_out_time.isnot(None))
+
+    if start_date:
+        week_start = start_date - timedelta(days=start_date.weekday())
+        query = query.filter(TimeEntry.clock_in_time >= datetime.combine(week_start, datetime.min.time()))
+    if end_date:
+        week_end = end_date + timedelta(days=7 - end_date.weekday())
+        query = query.filter(TimeEntry.clock_in_time < datetime.combine(week_end, datetime.min.time()))
+    if user_id:
+        query = query.filter(TimeEntry.user_id == user_id)
+
+    day_totals = {}
+    week_regular = {}
+    updates = []
+    for entry_id, entry_user_id, clock_in_time, total_hours in query.order_by(
+            TimeEntry.clock_out_time, TimeEntry.id).yield_per(1000):
+        hours = total_hours or 0
+        work_date = clock_in_time.date()
+        day_key = (entry_user_id, work_date)
+        week_key = (entry_user_id, work_date - timedelta(days=work_date.weekday()))
+
+        day_before = day_totals.get(day_key, 0)
+        week_before = week_regular.get(week_key, 0)
+        regular, overtime = _overtime_split(hours, day_before, week_before, rules)
+
+        day_totals[day_key] = day_before + hours
+        week_regular[week_key] = week_before + (_daily_regular(day_before + hours, rules)
+                                                - _daily_regular(day_before, rules))
+        updates.append({
+            'id': entry_id,
+            'regular_hours': round(regular, HOURS_PRECISION),
+            'overtime_hours': round(overtime, HOURS_PRECISION),
+            'is_overtime': round(overtime, HOURS_PRECISION) > 0
+        })
+
+    for i in range(0, len(updates), 1000):
+        db.session.bulk_update_mappings(TimeEntry, updates[i:i + 1000])
+    return len(updates)
+
+
+def rebuild_rollups(start_date=None, end_date=None, user_id=None):
+    """Recompute rollups from time_entries, returning the number of rows written"""
+    day = day_of(TimeEntry.clock_in_time)
+    closed = TimeEntry.clock_out_time.isnot(None)
+
+    entries = TimeEntry.query
+    rollups = DailyRollup.query
+    if start_date:
+        entries = entries.filter(TimeEntry.clock_in_time >= datetime.combine(start_date, datetime.min.time()))
+        rollups = rollups.filter(DailyRollup.work_date >= start_date)
+    if end_date:
+        entries = entries.filter(TimeEntry.clock_in_time < datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
+        rollups = rollups.filter(DailyRollup.work_date <= end_date)
+    if user_id:
+        entries = entries.filter(TimeEntry.user_id == user_id)
+        rollups = rollups.filter(DailyRollup.user_id == user_id)
+
+    totals = entries.with_entities(
+        TimeEntry.user_id,
+        day,
+        func.sum(case((closed, func.coalesce(TimeEntry.total_hours, 0)), else_=0)),
+        func.sum(func.coalesce(TimeEntry.break_duration, 0)),
+        func.sum(case((closed, 1), else_=0))
+    ).group_by(TimeEntry.user_id, day).all()
+
+    rollups.delete(synchronize_session=False)
+
+    threshold = OvertimeRules().daily_threshold
+    now = datetime.utcnow()
+    rows = [{
+        'user_id': row_user_id,
+        'work_date': as_date(work_date),
+        'worked_hours': float(worked or 0),
+        'break_hours': float(breaks or 0),
+        'overtime_hours': _daily_overtime(float(worked or 0), threshold),
+        'entry_count': int(count or 0),
+        'updated_at': now
+    } for row_user_id, work_date, worked, breaks, count in totals]
+
+    if rows:
+        db.session.execute(DailyRollup.__table__.insert(), rows)
+    db.session.commit()
+
+    return len(rows)
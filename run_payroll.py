@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+import argparse
+import csv
+import os
+import sys
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app
+from payroll import (OvertimeRules, run_payroll, PAYROLL_DAILY_OVERTIME_HOURS,
+                     PAYROLL_WEEKLY_OVERTIME_HOURS)
+
+PAYROLL_COLUMNS = ['user_id', 'username', 'name', 'department_id', 'worked_hours', 'regular_hours',
+                   'daily_overtime_hours', 'weekly_overtime_hours', 'overtime_hours', 'break_hours',
+                   'days_worked']
+
+def parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+def main():
+    parser = argparse.ArgumentParser(description='Calculate payroll hours for all active employees')
+    parser.add_argument('--start', type=parse_date, required=True, help='First day of the pay period (YYYY-MM-DD)')
+    parser.add_argument('--end', type=parse_date, required=True, help='Last day of the pay period (YYYY-MM-DD)')
+    parser.add_argument('--daily-overtime', type=float, default=PAYROLL_DAILY_OVERTIME_HOURS,
+                        help='Daily overtime threshold in hours, 0 to disable')
+    parser.add_argument('--weekly-overtime', type=float, default=PAYROLL_WEEKLY_OVERTIME_HOURS,
+                        help='Weekly overtime threshold in hours, 0 to disable')
+    parser.add_argument('--department', type=int, help='Only include this department id')
+    parser.add_argument('--output', help='CSV file to write (defaults to stdout)')
+    args = parser.parse_args()
+
+    if args.end < args.start:
+        print("❌ --end must not be before --start")
+        return False
+
+    with app.app_context():
+        payroll = run_payroll(args.start, args.end, OvertimeRules(args.daily_overtime, args.weekly_overtime),
+                              args.department)
+
+    output = open(args.output, 'w', newline='') if args.output else sys.stdout
+    try:
+        writer = csv.DictWriter(output, fieldnames=PAYROLL_COLUMNS)
+        writer.writeheader()
+        writer.writerows(payroll['employees'])
+    finally:
+        if args.output:
+            output.close()
+
+    if args.output:
+        totals = payroll['totals']
+        print(f"✅ Wrote {len(payroll['employees'])} payroll lines to {args.output}")
+        print(f"   Regular: {totals['regular_hours']:.2f}h, overtime: {totals['overtime_hours']:.2f}h, "
+              f"breaks: {totals['break_hours']:.2f}h")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,67 @@
+"""
+Portable SQL expressions used by the reporting queries.
+
+Oracle is the production database, but each expression also compiles for SQLite
+(local development) and a generic ANSI fallback.
+"""
+from datetime import date, datetime
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.types import Date, Float
+
+
+class hours_between(FunctionElement):
+    """Elapsed hours between two timestamp columns (start, end)"""
+    type = Float()
+    name = 'hours_between'
+    inherit_cache = True
+
+
+@compiles(hours_between)
+def _hours_between_default(element, compiler, **kw):
+    start, end = [compiler.process(arg, **kw) for arg in element.clauses]
+    return f"(EXTRACT(EPOCH FROM ({end} - {start})) / 3600.0)"
+
+
+@compiles(hours_between, 'oracle')
+def _hours_between_oracle(element, compiler, **kw):
+    start, end = [compiler.process(arg, **kw) for arg in element.clauses]
+    # DATE arithmetic yields days as a NUMBER, unlike TIMESTAMP which yields an INTERVAL
+    return f"((CAST({end} AS DATE) - CAST({start} AS DATE)) * 24)"
+
+
+@compiles(hours_between, 'sqlite')
+def _hours_between_sqlite(element, compiler, **kw):
+    start, end = [compiler.process(arg, **kw) for arg in element.clauses]
+    return f"((strftime('%s', {end}) - strftime('%s', {start})) / 3600.0)"
+
+
+class day_of(FunctionElement):
+    """Calendar day of a timestamp column, used for GROUP BY day"""
+    type = Date()
+    name = 'day_of'
+    inherit_cache = True
+
+
+@compiles(day_of)
+def _day_of_default(element, compiler, **kw):
+    return f"CAST({compiler.process(element.clauses, **kw)} AS DATE)"
+
+
+@compiles(day_of, 'oracle')
+def _day_of_oracle(element, compiler, **kw):
+    return f"TRUNC({compiler.process(element.clauses, **kw)})"
+
+
+@compiles(day_of, 'sqlite')
+def _day_of_sqlite(element, compiler, **kw):
+    return f"date({compiler.process(element.clauses, **kw)})"
+
+
+def as_date(value):
+    """Normalize a day bucket returned by the driver to a date"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
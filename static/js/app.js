@@ -5,7 +5,10 @@ const app = {
     currentUser: null,
     accessToken: localStorage.getItem('access_token'),
     isClocked: false,
-    currentLocation: null
+    currentLocation: null,
+    statusEtag: null,
+    eventSource: null,
+    liveUpdates: false
 };
 
 // Initialize app
@@ -20,7 +23,13 @@ function initializeApp() {
 
     // Initialize real-time updates
     setInterval(updateCurrentTime, 1000);
-    setInterval(loadCurrentStatus, 30000); // Update status every 30 seconds
+    connectEventStream();
+    // Polling is the fallback while the event stream is not connected
+    setInterval(function() {
+        if (!app.liveUpdates) {
+            loadCurrentStatus();
+        }
+    }, 30000);
 
     // Initialize event listeners
     setupEventListeners();
@@ -66,6 +75,7 @@ function getCurrentUser() {
 
 function logout() {
     localStorage.removeItem('access_token');
+    localStorage.removeItem('refresh_token');
     localStorage.removeItem('user_id');
     localStorage.removeItem('user_role');
     app.accessToken = null;
@@ -86,10 +96,49 @@ function updateCurrentTime() {
     });
 }
 
+function connectEventStream() {
+    if (!window.EventSource) {
+        return;
+    }
+
+    app.eventSource = new EventSource('/api/events');
+
+    app.eventSource.addEventListener('open', function() {
+        app.liveUpdates = true;
+    });
+
+    app.eventSource.addEventListener('status', function(event) {
+        updateClockStatus(JSON.parse(event.data));
+    });
+
+    app.eventSource.addEventListener('presence', function(event) {
+        // Team views listen for this to update a member's status in place
+        document.dispatchEvent(new CustomEvent('presence-change', { detail: JSON.parse(event.data) }));
+    });
+
+    app.eventSource.addEventListener('resync', function() {
+        document.dispatchEvent(new CustomEvent('presence-resync'));
+    });
+
+    app.eventSource.addEventListener('error', function() {
+        // The browser reconnects on its own; poll until it does
+        app.liveUpdates = false;
+    });
+}
+
 function loadCurrentStatus() {
-    fetch('/api/current-status')
+    const headers = {};
+    if (app.statusEtag) {
+        headers['If-None-Match'] = app.statusEtag;
+    }
+
+    fetch('/api/current-status', { headers: headers, cache: 'no-store' })
     .then(response => {
-        if (response.ok) {
+        if (response.status === 304) {
+            // Status unchanged since the last poll
+            return null;
+        } else if (response.ok) {
+            app.statusEtag = response.headers.get('ETag');
             return response.json();
         } else if (response.status === 302 || response.redirected) {
             // User not authenticated, redirect to login
@@ -106,6 +155,7 @@ function loadCurrentStatus() {
     })
     .catch(error => {
         console.error('Error loading status:', error);
+        app.statusEtag = null;
         // If authentication error, show default clocked out status
         updateClockStatus({ status: 'clocked_out' });
     });
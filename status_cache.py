@@ -0,0 +1,90 @@
+"""
+Per-user clock status cache for /api/current-status polling.
+
+Statuses are kept in process until the change feed reports a time entry
+change for the user. Each status carries an ETag derived from its content,
+so every worker computes the same tag and unchanged polls can be answered
+with 304 Not Modified from any of them.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from change_feed import FeedReader
+from active_sessions import get_open_entry
+
+STATUS_CACHE_SIZE = int(os.getenv('STATUS_CACHE_SIZE', '10000'))
+
+
+class CachedStatus:
+    __slots__ = ('payload', 'etag', 'last_modified')
+
+    def __init__(self, payload, last_modified):
+        self.payload = payload
+        self.etag = hashlib.sha1(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+        self.last_modified = last_modified
+
+
+def build_status(user_id):
+    current_entry = get_open_entry(user_id)
+
+    if current_entry:
+        return CachedStatus({
+            'status': 'clocked_in',
+            'entry_id': current_entry.id,
+            'clock_in_time': current_entry.clock_in_time.isoformat(),
+            'project_id': current_entry.project_id
+        }, current_entry.clock_in_time)
+
+    return CachedStatus({'status': 'clocked_out'}, datetime.utcnow().replace(microsecond=0))
+
+
+class StatusCache:
+    def __init__(self, max_entries=STATUS_CACHE_SIZE, reader=None):
+        self.max_entries = max_entries
+        self._reader = reader or FeedReader()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """Cached status for the user, building it from the database on a miss"""
+        # As with the report cache, a status built before a concurrent write
+        # is dropped by the next get() once that write's event arrives
+        self._sync()
+
+        with self._lock:
+            status = self._entries.get(user_id)
+            if status is not None:
+                self._entries.move_to_end(user_id)
+                return status
+
+        status = build_status(user_id)
+        with self._lock:
+            self._entries[user_id] = status
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return status
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _sync(self):
+        events, reset = self._reader.poll()
+        if reset:
+            self.clear()
+
+        for event in events:
+            if event.get('topic') == 'time_entries':
+                self.invalidate(event.get('user_id'))
+            elif event.get('topic') == 'reset':
+                self.clear()
+
+
+status_cache = StatusCache()
@@ -0,0 +1,138 @@
+import random
+import threading
+
+from app import db
+from models import ActiveSession, DailyRollup, TimeEntry
+
+
+def run_concurrently(count, action):
+    """Run action(index) in count threads released at the same moment"""
+    barrier = threading.Barrier(count)
+    results = [None] * count
+    errors = []
+
+    def worker(index):
+        try:
+            barrier.wait()
+            results[index] = action(index)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors, errors
+    return results
+
+
+def assert_sessions_consistent(app, user_ids):
+    with app.app_context():
+        for user_id in user_ids:
+            open_ids = [entry.id for entry in TimeEntry.query.filter_by(user_id=user_id, clock_out_time=None)]
+            session = db.session.get(ActiveSession, user_id)
+
+            assert len(open_ids) <= 1
+            assert (session.time_entry_id if session else None) == (open_ids[0] if open_ids else None)
+
+
+def test_concurrent_clock_ins_open_a_single_session(app, make_user, login):
+    user = make_user()
+    clients = [login(user) for _ in range(8)]
+
+    statuses = run_concurrently(len(clients), lambda i: clients[i].post('/api/clock-in', json={}).status_code)
+
+    assert sorted(statuses) == [200] + [400] * 7
+    assert_sessions_consistent(app, [user.id])
+    with app.app_context():
+        assert TimeEntry.query.filter_by(user_id=user.id).count() == 1
+
+
+def test_concurrent_clock_outs_close_the_session_once(app, make_user, login):
+    user = make_user()
+    clients = [login(user) for _ in range(8)]
+    assert clients[0].post('/api/clock-in', json={}).status_code == 200
+
+    statuses = run_concurrently(len(clients), lambda i: clients[i].post('/api/clock-out').status_code)
+
+    assert sorted(statuses) == [200] + [400] * 7
+    assert_sessions_consistent(app, [user.id])
+    with app.app_context():
+        assert ActiveSession.query.count() == 0
+        # The entry was closed, and counted in the rollups, exactly once
+        assert sum(r.entry_count for r in DailyRollup.query.filter_by(user_id=user.id)) == 1
+
+
+def test_interleaved_clock_cycles_stay_consistent(app, make_user, login):
+    users = [make_user() for _ in range(3)]
+    clients = [login(users[i % len(users)]) for i in range(9)]
+
+    def cycle(index):
+        rng = random.Random(index)
+        for _ in range(15):
+            path = '/api/clock-in' if rng.random() < 0.5 else '/api/clock-out'
+            response = clients[index].post(path, json={})
+            assert response.status_code in (200, 400), response.data
+
+    run_concurrently(len(clients), cycle)
+
+    assert_sessions_consistent(app, [user.id for user in users])
+
+
+def test_concurrent_rollup_deltas_all_count(app, make_user):
+    from datetime import date
+    from rollups import apply_delta
+
+    users = [make_user() for _ in range(2)]
+    days = [date(2024, 3, 4), date(2024, 3, 5)]
+
+    def add_hours(index):
+        with app.app_context():
+            for i in range(6):
+                # Every thread starts on a day that has no row yet
+                apply_delta(users[(index + i) % 2].id, days[i % 2], worked=1.5, breaks=0.25, entries=1)
+                db.session.commit()
+
+    run_concurrently(8, add_hours)
+
+    with app.app_context():
+        rows = DailyRollup.query.all()
+        assert len(rows) == 4
+        assert sum(row.entry_count for row in rows) == 48
+        assert sum(row.worked_hours for row in rows) == 72
+        assert sum(row.break_hours for row in rows) == 12
+
+
+def test_rollup_insert_that_loses_the_race_adds_to_the_winners_row(app, make_user, monkeypatch):
+    from datetime import date
+    import rollups
+
+    user = make_user()
+    day = date(2024, 3, 4)
+    with app.app_context():
+        db.session.add(DailyRollup(user_id=user.id, work_date=day, worked_hours=2, break_hours=0,
+                                   overtime_hours=0, entry_count=1))
+        db.session.commit()
+
+    # The first UPDATE misses, as if the other transaction had not committed its row yet
+    real_update = rollups._update_rollup
+    calls = []
+
+    def racing_update(*args):
+        calls.append(args)
+        return 0 if len(calls) == 2 else real_update(*args)
+
+    monkeypatch.setattr(rollups, '_update_rollup', racing_update)
+
+    with app.app_context():
+        rollups.apply_delta(user.id, date(2024, 3, 3), worked=1, entries=1)
+        rollups.apply_delta(user.id, day, worked=1.5, breaks=0.5, entries=1)
+        db.session.commit()
+
+        assert len(calls) == 3
+        rows = {row.work_date: row for row in DailyRollup.query.filter_by(user_id=user.id)}
+        assert (rows[day].worked_hours, rows[day].break_hours, rows[day].entry_count) == (3.5, 0.5, 2)
+        # The earlier change in the same transaction survives the failed insert
+        assert rows[date(2024, 3, 3)].entry_count == 1
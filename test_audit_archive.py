@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import audit_archive
+from audit_archive import archive_audit_logs, search_audit_logs, append_block, load_index, _row_to_dict
+from database import db
+from models import AuditLog
+
+
+@pytest.fixture
+def archive_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(audit_archive, 'AUDIT_ARCHIVE_DIR', str(tmp_path))
+    return tmp_path
+
+
+def add_logs(app, user_id, timestamps):
+    with app.app_context():
+        for i, timestamp in enumerate(timestamps):
+            db.session.add(AuditLog(user_id=user_id, action='clock_in', table_name='time_entries',
+                                    record_id=i + 1, new_values=str({'n': i}), timestamp=timestamp))
+        db.session.commit()
+
+
+def test_archived_rows_are_still_searchable(app, make_user, login, archive_dir):
+    admin, employee = make_user('admin'), make_user()
+    now = datetime.utcnow()
+    old = [now - timedelta(days=200 + i) for i in range(30)]
+    add_logs(app, employee.id, old + [now - timedelta(hours=1)])
+    add_logs(app, admin.id, [now - timedelta(days=300)])
+
+    with app.app_context():
+        archived = archive_audit_logs(older_than_days=90, batch_size=7)
+        assert sum(archived.values()) == 31
+        assert AuditLog.query.count() == 1
+
+        logs = search_audit_logs(user_id=employee.id, limit=100)
+        assert len(logs) == 31
+        assert logs[0]['archived'] is False
+        assert all(log['archived'] for log in logs[1:])
+        assert [log['timestamp'] for log in logs] == sorted((log['timestamp'] for log in logs), reverse=True)
+
+        assert [log['record_id'] for log in search_audit_logs(record_id=5, table_name='time_entries')] == [5]
+        assert len(search_audit_logs(user_id=employee.id, include_archive=False)) == 1
+
+    response = login(admin).get(f'/api/audit-logs?user_id={admin.id}&end_date={now.date().isoformat()}')
+    assert response.status_code == 200
+    assert response.get_json()['count'] == 1
+    assert login(employee).get('/api/audit-logs').status_code == 403
+
+
+def test_interrupted_archive_run_does_not_duplicate_rows(app, make_user, archive_dir):
+    user = make_user()
+    timestamp = datetime(2020, 3, 15, 9, 0)
+    add_logs(app, user.id, [timestamp + timedelta(minutes=i) for i in range(5)])
+
+    with app.app_context():
+        # A run that wrote its block but stopped before deleting the rows
+        rows = AuditLog.query.order_by(AuditLog.id).all()
+        append_block('2020-03', [_row_to_dict(row) for row in rows])
+
+        archive_audit_logs(older_than_days=90)
+        assert load_index('2020-03')['rows'] == 10
+        assert AuditLog.query.count() == 0
+        assert len(search_audit_logs(user_id=user.id)) == 5
+
+
+def test_rows_committed_late_inside_the_batch_range_are_kept(app, make_user, archive_dir, monkeypatch):
+    user = make_user()
+    timestamp = datetime(2020, 3, 15, 9, 0)
+    with app.app_context():
+        for record_id in (10, 20, 30):
+            db.session.add(AuditLog(id=record_id, user_id=user.id, action='clock_in', table_name='time_entries',
+                                    record_id=record_id, timestamp=timestamp))
+        db.session.commit()
+
+    real_append_block = audit_archive.append_block
+
+    def append_block_with_late_row(month, records):
+        # A transaction that took id 15 earlier commits while the batch is being archived
+        if not AuditLog.query.get(15):
+            db.session.add(AuditLog(id=15, user_id=user.id, action='clock_out', table_name='time_entries',
+                                    record_id=15, timestamp=timestamp))
+            db.session.flush()
+        return real_append_block(month, records)
+
+    monkeypatch.setattr(audit_archive, 'append_block', append_block_with_late_row)
+
+    with app.app_context():
+        assert archive_audit_logs(older_than_days=90) == {'2020-03': 3}
+        assert [row.id for row in AuditLog.query.all()] == [15]
+
+        assert archive_audit_logs(older_than_days=90) == {'2020-03': 1}
+        assert AuditLog.query.count() == 0
+        assert sorted(log['id'] for log in search_audit_logs(user_id=user.id)) == [10, 15, 20, 30]
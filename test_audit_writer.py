@@ -0,0 +1,46 @@
+import logging
+from datetime import datetime
+
+from database import db
+from models import AuditLog
+from audit_writer import AuditWriter
+
+
+def audit_row(action):
+    return {'user_id': None, 'action': action, 'table_name': None, 'record_id': None, 'old_values': None,
+            'new_values': None, 'ip_address': None, 'user_agent': None, 'timestamp': datetime.utcnow()}
+
+
+def buffered_writer(app, rows, **options):
+    writer = AuditWriter(mode='buffered', flush_size=10 ** 6, flush_interval=3600, **options)
+    for row in rows:
+        writer.record(app, row)
+    return writer
+
+
+def test_a_row_that_always_fails_does_not_block_later_records(app, caplog):
+    # action is NOT NULL, so this row can never be written
+    writer = buffered_writer(app, [audit_row('FIRST'), audit_row(None), audit_row('SECOND')], retries=2)
+
+    assert writer.flush() == 0
+    assert writer.pending() == 3
+
+    writer.record(app, audit_row('THIRD'))
+    with caplog.at_level(logging.ERROR, logger='audit_writer'):
+        assert writer.flush() == 3
+    assert writer.pending() == 0
+    assert 'Dropping audit record' in caplog.text
+
+    with app.app_context():
+        assert [log.action for log in AuditLog.query.order_by(AuditLog.id)] == ['FIRST', 'SECOND', 'THIRD']
+
+    writer.record(app, audit_row('FOURTH'))
+    assert writer.flush() == 1
+
+
+def test_requeued_rows_drop_the_oldest_when_the_buffer_is_full(app):
+    # Records that arrived while a failed batch was being written
+    writer = buffered_writer(app, [audit_row('NEW1'), audit_row('NEW2')], buffer_limit=3)
+
+    writer._requeue([audit_row('OLD1'), audit_row('OLD2')])
+    assert [row['action'] for row in writer._buffer] == ['OLD2', 'NEW1', 'NEW2']
@@ -0,0 +1,84 @@
+import math
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from auth import calculate_distance, calculate_distances, evaluate_geofences
+from database import db
+from geofence_index import IndexedFence
+from models import Geofence, TimeEntry
+
+FENCES = [IndexedFence(1, 'Office', 46.05, 14.5, 500), IndexedFence(2, 'Depot', 46.06, 14.52, 300)]
+
+
+def test_vectorised_distances_match_the_scalar_haversine():
+    latitudes = [46.05, 46.0545, 46.06, -33.9, 0.0]
+    longitudes = [14.5, 14.5, 14.525, 151.2, 179.99]
+    fence_lats = [fence.center_lat for fence in FENCES]
+    fence_lons = [fence.center_lon for fence in FENCES]
+
+    distances = calculate_distances(latitudes, longitudes, fence_lats, fence_lons)
+
+    expected = [[calculate_distance(lat, lon, fence_lat, fence_lon) for fence_lat, fence_lon in zip(fence_lats, fence_lons)]
+                for lat, lon in zip(latitudes, longitudes)]
+    np.testing.assert_allclose(distances, expected, rtol=1e-9)
+
+
+def test_batch_evaluation_matches_point_by_point_checks():
+    latitudes = [46.05, 46.0549, 46.06, 46.07, float('nan'), 46.05]
+    longitudes = [14.5, 14.5, 14.52, 14.6, 14.5, float('nan')]
+
+    containing, nearest, distance = evaluate_geofences(latitudes, longitudes, FENCES)
+
+    for i, (lat, lon) in enumerate(zip(latitudes[:4], longitudes[:4])):
+        outside_by = {fence.id: calculate_distance(lat, lon, fence.center_lat, fence.center_lon) - fence.radius
+                      for fence in FENCES}
+        inside = [fence_id for fence_id, gap in outside_by.items() if gap <= 0]
+        closest = min(outside_by, key=outside_by.get)
+        assert containing[i] == (inside[0] if inside else -1)
+        assert nearest[i] == closest
+        assert distance[i] == pytest.approx(max(outside_by[closest], 0))
+
+    # Missing coordinates match nothing
+    assert containing[4:].tolist() == [-1, -1]
+    assert nearest[4:].tolist() == [-1, -1]
+    assert all(math.isnan(value) for value in distance[4:])
+
+
+def test_batch_evaluation_without_fences_or_points():
+    containing, nearest, distance = evaluate_geofences([46.05], [14.5], [])
+    assert (containing.tolist(), nearest.tolist(), math.isnan(distance[0])) == ([-1], [-1], True)
+    assert [array.size for array in evaluate_geofences([], [], FENCES)] == [0, 0, 0]
+
+
+def test_batch_check_is_limited_to_managers(app, make_user, login):
+    points = {'points': [{'latitude': 46.05, 'longitude': 14.5}]}
+    assert login(make_user()).post('/api/geofences/check', json=points).status_code == 403
+    assert login(make_user('manager')).post('/api/geofences/check', json=points).status_code == 200
+
+
+def test_audit_pages_through_entries_with_a_cursor(app, make_user, login):
+    admin = make_user('admin')
+    start = datetime.now().replace(hour=6, minute=0, second=0, microsecond=0) - timedelta(days=2)
+    with app.app_context():
+        db.session.add(Geofence(name='Office', center_lat=46.05, center_lon=14.5, radius=500, is_active=True))
+        for i in range(5):
+            db.session.add(TimeEntry(user_id=admin.id, clock_in_time=start + timedelta(hours=i),
+                                     location_lat=46.05 + (0.1 if i % 2 else 0), location_lon=14.5))
+        db.session.commit()
+
+    client = login(admin)
+    seen, outside, cursor = 0, [], ''
+    while True:
+        response = client.get(f'/api/geofences/audit?limit=2&cursor={cursor}').get_json()
+        assert response['checked'] <= 2
+        seen += response['checked']
+        outside += [entry['entry_id'] for entry in response['outside']]
+        cursor = response['next_cursor']
+        if not cursor:
+            break
+
+    assert seen == 5
+    assert len(outside) == 2
+    assert client.get('/api/geofences/audit?limit=0').status_code == 400
@@ -0,0 +1,46 @@
+import math
+import pytest
+from auth import calculate_distance
+from geofence_index import GeofenceIndex, IndexedFence
+
+CENTER_LAT, CENTER_LON, RADIUS = 46.05, 14.5, 1000
+
+
+@pytest.fixture
+def index(tmp_path):
+    from change_feed import FeedReader
+
+    index = GeofenceIndex(ttl=3600, reader=FeedReader(str(tmp_path / 'changes.log')))
+    index.build([IndexedFence(1, 'Office', CENTER_LAT, CENTER_LON, RADIUS)])
+    return index
+
+
+def offset(meters, bearing):
+    """The point the given distance from the fence center along a compass bearing in degrees"""
+    meters_per_degree = math.pi * 6371000 / 180
+    latitude = CENTER_LAT + meters * math.cos(math.radians(bearing)) / meters_per_degree
+    longitude = CENTER_LON + (meters * math.sin(math.radians(bearing)) /
+                              (meters_per_degree * math.cos(math.radians(CENTER_LAT))))
+    return latitude, longitude
+
+
+@pytest.mark.parametrize('bearing', [0, 90, 180, 270, 45])
+def test_points_just_inside_the_fence_are_found(index, bearing):
+    latitude, longitude = offset(RADIUS - 0.5, bearing)
+    assert calculate_distance(latitude, longitude, CENTER_LAT, CENTER_LON) <= RADIUS
+
+    fence = index.find(latitude, longitude)
+    assert fence is not None and fence.id == 1
+
+
+@pytest.mark.parametrize('bearing', [0, 90, 180, 270, 45])
+def test_points_just_outside_the_fence_are_rejected(index, bearing):
+    latitude, longitude = offset(RADIUS + 2, bearing)
+    assert calculate_distance(latitude, longitude, CENTER_LAT, CENTER_LON) > RADIUS
+
+    assert index.find(latitude, longitude) is None
+
+
+def test_reported_boundary_points_are_accepted(index):
+    assert index.find(CENTER_LAT + 0.00899, CENTER_LON) is not None
+    assert index.find(CENTER_LAT, CENTER_LON + 0.01295) is not None
@@ -0,0 +1,44 @@
+from database import db
+from models import User
+from change_feed import publish_user_change
+from test_query_counts import count_statements
+
+
+def user_queries(statements):
+    return [s for s in statements if 'FROM users' in s]
+
+
+def test_authenticated_requests_do_not_query_users(app, make_user, login):
+    client = login(make_user())
+    assert client.get('/api/time-entries').status_code == 200
+
+    with count_statements(app) as statements:
+        assert client.get('/api/time-entries').status_code == 200
+        assert client.get('/api/timesheet-summary').status_code == 200
+
+    assert user_queries(statements) == []
+
+
+def test_user_changes_invalidate_the_cached_identity(app, make_user, login):
+    user = make_user()
+    client = login(user)
+    assert client.get('/api/payroll?start_date=2026-03-02&end_date=2026-03-08').status_code == 403
+
+    with app.app_context():
+        db.session.get(User, user.id).role = 'hr'
+        db.session.commit()
+    publish_user_change(user.id)
+
+    assert client.get('/api/payroll?start_date=2026-03-02&end_date=2026-03-08').status_code == 200
+
+
+def test_profile_update_changes_the_stored_user(app, make_user, login):
+    user = make_user()
+    client = login(user)
+
+    response = client.post('/profile', json={'first_name': 'Renamed'})
+    assert response.status_code == 200, response.data
+
+    with app.app_context():
+        assert db.session.get(User, user.id).first_name == 'Renamed'
+    assert b'Renamed' in client.get('/profile').data
@@ -0,0 +1,89 @@
+import threading
+
+import live_events
+from database import db
+from models import Department, User
+from live_events import EventHub, Subscription, RESYNC, EVENTS_QUEUE_SIZE, watched_user_ids
+
+
+class FakeReader:
+    """Hands the hub queued (events, reset) batches instead of tailing the change feed"""
+
+    def __init__(self):
+        self._batches = []
+        self._lock = threading.Lock()
+
+    def push(self, events, reset=False):
+        with self._lock:
+            self._batches.append((events, reset))
+
+    def poll(self):
+        with self._lock:
+            return self._batches.pop(0) if self._batches else ([], False)
+
+
+def entry_change(user_id):
+    return {'topic': 'time_entries', 'user_id': user_id, 'dates': []}
+
+
+def test_changes_reach_the_user_watchers_and_admins():
+    reader = FakeReader()
+    hub = EventHub(reader=reader, poll_interval=0.01)
+    own = hub.subscribe(1, set())
+    manager = hub.subscribe(2, {1})
+    admin = hub.subscribe(3, None)
+    other = hub.subscribe(4, set())
+
+    reader.push([entry_change(1), {'topic': 'users', 'user_id': 4}])
+
+    assert own.wait(1) == {1}
+    assert manager.wait(1) == {1}
+    assert admin.wait(1) == {1}
+    assert other.wait(0.1) is None
+
+    hub.unsubscribe(manager)
+    reader.push([entry_change(1)])
+    assert own.wait(1) == {1}
+    assert manager.wait(0.1) is None
+
+
+def test_resets_ask_every_subscription_to_resync():
+    hub = EventHub(reader=FakeReader())
+    subscriptions = [hub.subscribe(1, set()), hub.subscribe(2, {5}), hub.subscribe(3, None)]
+
+    hub.dispatch([], True)
+    assert [subscription.wait(1) for subscription in subscriptions] == [{RESYNC}] * 3
+
+    hub.dispatch([{'topic': 'reset'}], False)
+    assert [subscription.wait(1) for subscription in subscriptions] == [{RESYNC}] * 3
+
+
+def test_a_full_queue_is_replaced_by_a_resync():
+    subscription = Subscription(1, set())
+    for user_id in range(EVENTS_QUEUE_SIZE + 1):
+        subscription.notify(user_id)
+
+    assert subscription.wait(1) == {RESYNC}
+    assert subscription.wait(0.01) is None
+
+
+def test_managers_watch_the_users_in_departments_they_manage(app, make_user):
+    manager, member, outsider = make_user('manager'), make_user(), make_user()
+
+    with app.app_context():
+        department = Department(name='Operations', manager_id=manager.id)
+        db.session.add(department)
+        db.session.flush()
+        for user in (manager, member):
+            db.session.get(User, user.id).department_id = department.id
+        db.session.commit()
+
+        assert watched_user_ids(db.session.get(User, manager.id)) == {member.id}
+        assert watched_user_ids(db.session.get(User, outsider.id)) == set()
+        assert watched_user_ids(make_user('admin')) is None
+
+
+def test_disabled_streams_answer_204(app, make_user, login, monkeypatch):
+    monkeypatch.setattr(live_events, 'EVENTS_STREAM_ENABLED', False)
+    response = login(make_user()).get('/api/events')
+    assert response.status_code == 204
@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta
+
+from database import db
+from models import DailyRollup, TimeEntry
+from payroll import OvertimeRules
+import rollups
+from rollups import (entry_snapshot, record_entry_change, split_entry_overtime, rebuild_entry_overtime,
+                     rebuild_rollups)
+from test_query_counts import count_statements
+
+MONDAY = datetime(2026, 3, 2, 7, 0)
+
+
+def work_shift(user_id, clock_in, hours, break_hours=0):
+    """Open and close an entry the way clock-out does, returning its (regular, overtime) split"""
+    entry = TimeEntry(user_id=user_id, clock_in_time=clock_in, break_duration=break_hours)
+    db.session.add(entry)
+    db.session.commit()
+
+    before = entry_snapshot(entry)
+    entry.clock_out_time = clock_in + timedelta(hours=hours + break_hours)
+    entry.total_hours = hours
+    record_entry_change(before, entry)
+    split_entry_overtime(entry)
+    db.session.commit()
+    return entry.regular_hours, entry.overtime_hours
+
+
+def test_overtime_is_split_at_the_daily_and_weekly_thresholds(app, make_user):
+    user = make_user()
+
+    with app.app_context():
+        splits = []
+        for day in range(5):
+            start = MONDAY + timedelta(days=day)
+            splits.append(work_shift(user.id, start, 5))
+            splits.append(work_shift(user.id, start + timedelta(hours=6), 4))
+        # Forty regular hours are already worked, so all of Saturday is overtime
+        splits.append(work_shift(user.id, MONDAY + timedelta(days=5), 6))
+
+        assert splits == [(5, 0), (3, 1)] * 5 + [(0, 6)]
+
+        # A full recompute agrees with the splits made at clock-out
+        rebuild_entry_overtime(MONDAY.date(), MONDAY.date(), user.id)
+        db.session.commit()
+        rebuilt = [(e.regular_hours, e.overtime_hours) for e in TimeEntry.query.order_by(TimeEntry.clock_out_time)]
+        assert rebuilt == splits
+
+
+def test_clock_out_statements_do_not_grow_with_shifts_worked(app, make_user, login):
+    user = make_user()
+    client = login(user)
+
+    def clock_out_statements():
+        assert client.post('/api/clock-in', json={}).status_code == 200
+        with count_statements(app) as statements:
+            assert client.post('/api/clock-out').status_code == 200
+        return len(statements)
+
+    # The day's first clock-out also inserts its rollup row
+    clock_out_statements()
+    second = clock_out_statements()
+    for _ in range(5):
+        clock_out_statements()
+
+    assert clock_out_statements() == second
+
+
+def test_reports_and_timesheets_agree_on_daily_overtime(app, make_user, login):
+    user = make_user()
+    with app.app_context():
+        # Neither entry is over the threshold on its own
+        work_shift(user.id, MONDAY, 5)
+        work_shift(user.id, MONDAY + timedelta(hours=6), 5)
+
+    client = login(user)
+    day = MONDAY.date().isoformat()
+    report = client.get(f'/api/reports?report_type=overtime&start_date={day}&end_date={day}').get_json()
+    timesheet = client.get(f'/api/timesheet-summary?start_date={day}&end_date={day}').get_json()
+
+    assert report['summary']['overtime_hours'] == timesheet['overtime_hours'] == 2
+    assert report['chart_data']['datasets'][0]['data'] == [2]
+
+
+def test_rollup_overtime_follows_the_payroll_daily_threshold(app, make_user, monkeypatch):
+    monkeypatch.setattr(rollups, 'OvertimeRules', lambda: OvertimeRules(daily_threshold=6, weekly_threshold=40))
+    user = make_user()
+
+    with app.app_context():
+        assert work_shift(user.id, MONDAY, 7 + 1 / 3) == (6, 1.33)
+        assert round(db.session.get(DailyRollup, (user.id, MONDAY.date())).overtime_hours, 6) == 1.333333
+
+        rebuild_rollups(MONDAY.date(), MONDAY.date(), user.id)
+        assert round(db.session.get(DailyRollup, (user.id, MONDAY.date())).overtime_hours, 6) == 1.333333
+
+
+def test_report_summary_totals_share_the_rollup_basis(app, make_user, login):
+    user = make_user()
+    with app.app_context():
+        # Ten hours on the clock, one of them a break
+        work_shift(user.id, MONDAY, 9, break_hours=1)
+
+    client = login(user)
+    day = MONDAY.date().isoformat()
+    summary = client.get(f'/api/reports?start_date={day}&end_date={day}').get_json()['summary']
+    timesheet = client.get(f'/api/timesheet-summary?start_date={day}&end_date={day}').get_json()
+
+    assert (summary['total_hours'], summary['regular_hours'], summary['overtime_hours']) == (9, 8, 1)
+    assert summary['total_hours'] == timesheet['total_hours']
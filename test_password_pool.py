@@ -0,0 +1,42 @@
+import bcrypt
+
+from database import db
+from models import User
+from password_pool import password_pool, PASSWORD_HASH_METHOD
+
+
+def test_legacy_hash_is_upgraded_on_login(app, make_user, login):
+    user = make_user()
+    with app.app_context():
+        stored = db.session.get(User, user.id)
+        stored.password_hash = bcrypt.hashpw(b'password123', bcrypt.gensalt(4)).decode('utf-8')
+        db.session.commit()
+
+    login(user)
+
+    with app.app_context():
+        assert db.session.get(User, user.id).password_hash.startswith(f'{PASSWORD_HASH_METHOD}$')
+    login(user)
+    assert app.test_client().post('/login', json={'username': user.username, 'password': 'wrong'}).status_code == 401
+
+
+def test_logins_are_rejected_while_the_pool_is_full(app, make_user, login):
+    user = make_user()
+    held = 0
+    while password_pool._slots.acquire(blocking=False):
+        held += 1
+    try:
+        response = app.test_client().post('/login', json={'username': user.username, 'password': 'password123'})
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+    finally:
+        for _ in range(held):
+            password_pool._slots.release()
+
+    login(user)
+
+
+def test_hash_many_keeps_order(app):
+    passwords = [f'secret-{n}' for n in range(70)]
+    hashes = password_pool.hash_many(passwords)
+    assert all(password_pool.verify(h, p) for h, p in zip(hashes, passwords))
@@ -0,0 +1,161 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from database import db
+from models import TimeEntry, Project
+from change_feed import publish_entry_change
+from report_cache import report_cache
+
+
+@contextmanager
+def count_statements(app):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def add_entries(app, user_ids, project_ids, count):
+    start = datetime.now().replace(hour=8, minute=0, second=0, microsecond=0) - timedelta(days=5)
+    changed = set()
+    with app.app_context():
+        for i in range(count):
+            clock_in = start + timedelta(hours=i % 100)
+            db.session.add(TimeEntry(
+                user_id=user_ids[i % len(user_ids)],
+                clock_in_time=clock_in,
+                clock_out_time=clock_in + timedelta(hours=4),
+                total_hours=4,
+                break_duration=0,
+                project_id=project_ids[i % len(project_ids)]
+            ))
+            changed.add((user_ids[i % len(user_ids)], clock_in.date()))
+        db.session.commit()
+
+    for user_id, day in changed:
+        publish_entry_change(user_id, day)
+
+
+def statements_for(app, client, url):
+    with count_statements(app) as statements:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(statements)
+
+
+@pytest.mark.parametrize('url', [
+    '/api/reports?report_type=attendance',
+    '/api/reports?report_type=project',
+    '/api/reports?report_type=overtime',
+    '/api/time-entries',
+    '/api/timesheet-summary?start_date=2024-01-01&end_date=2026-12-31&group_by=week',
+])
+def test_statement_count_does_not_grow_with_rows(app, make_user, login, url):
+    admin = make_user(role='admin')
+    employees = [make_user() for _ in range(5)]
+    user_ids = [user.id for user in [admin] + employees]
+
+    with app.app_context():
+        projects = [Project(name=f'Project {n}') for n in range(3)]
+        db.session.add_all(projects)
+        db.session.commit()
+        project_ids = [project.id for project in projects]
+
+    client = login(admin)
+    # Warm the identity cache so both measurements skip the user lookup
+    assert client.get(url).status_code == 200
+
+    add_entries(app, user_ids, project_ids, 3)
+    few = statements_for(app, client, url)
+
+    add_entries(app, user_ids, project_ids, 60)
+    many = statements_for(app, client, url)
+
+    assert few == many
+
+
+def test_unchanged_status_poll_does_not_query_time_entries(app, make_user, login):
+    user = make_user()
+    client = login(user)
+
+    first = client.get('/api/current-status')
+    assert first.status_code == 200
+
+    with count_statements(app) as statements:
+        response = client.get('/api/current-status', headers={'If-None-Match': first.headers['ETag']})
+    assert response.status_code == 304
+    assert not [s for s in statements if 'time_entries' in s or 'active_sessions' in s]
+
+    assert client.post('/api/clock-in', json={}).status_code == 200
+    response = client.get('/api/current-status', headers={'If-None-Match': first.headers['ETag']})
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'clocked_in'
+
+
+@pytest.mark.parametrize('per_page', [0, -1, 101])
+def test_out_of_range_page_sizes_are_rejected(app, make_user, login, per_page):
+    client = login(make_user())
+    response = client.get(f'/api/time-entries?per_page={per_page}')
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'per_page must be between 1 and 100'}
+
+
+def test_default_report_range_is_served_from_the_cache(app, make_user, login):
+    client = login(make_user())
+    assert client.get('/api/reports').status_code == 200
+    cached = len(report_cache)
+
+    with count_statements(app) as statements:
+        assert client.get('/api/reports').status_code == 200
+    assert not [s for s in statements if 'time_entries' in s]
+    assert len(report_cache) == cached
+
+
+def test_page_numbers_without_a_cursor_serve_that_page(app, make_user, login):
+    user = make_user()
+    add_entries(app, [user.id], [None], 5)
+    client = login(user)
+
+    first = client.get('/api/time-entries?per_page=2').get_json()
+    by_cursor = client.get(f"/api/time-entries?per_page=2&page=2&cursor={first['next_cursor']}").get_json()
+    by_page = client.get('/api/time-entries?per_page=2&page=2').get_json()
+
+    assert by_page['current_page'] == by_cursor['current_page'] == 2
+    assert [e['id'] for e in by_page['entries']] == [e['id'] for e in by_cursor['entries']]
+    assert by_page['next_cursor'] == by_cursor['next_cursor']
+
+    last = client.get('/api/time-entries?per_page=2&page=3').get_json()
+    assert len(last['entries']) == 1 and last['next_cursor'] is None
+
+
+def test_report_page_numbers_without_a_cursor_serve_that_page(app, make_user, login):
+    admin = make_user(role='admin')
+    add_entries(app, [admin.id], [None], 25)
+    client = login(admin)
+
+    first = client.get('/api/reports').get_json()
+    by_cursor = client.get(f"/api/reports?page=2&cursor={first['pagination']['next_cursor']}").get_json()
+    by_page = client.get('/api/reports?page=2').get_json()
+
+    assert by_page['pagination']['current_page'] == 2
+    assert by_page['table_data']['rows'] == by_cursor['table_data']['rows']
+    assert len(by_page['table_data']['rows']) == 5
+
+
+@pytest.mark.parametrize('url', ['/api/time-entries?page=0', '/api/reports?page=-1'])
+def test_page_numbers_below_one_are_rejected(app, make_user, login, url):
+    client = login(make_user(role='admin'))
+    response = client.get(url)
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'page must be at least 1'}
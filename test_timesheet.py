@@ -0,0 +1,27 @@
+import pytest
+
+
+@pytest.mark.parametrize('start_date, end_date, group_by', [
+    ('2025-01-01', '2026-01-02', 'day'),
+    ('2020-01-01', '2023-12-31', 'week'),
+    ('0001-01-01', '9999-12-31', 'month'),
+])
+def test_ranges_longer_than_the_grouping_allows_are_rejected(app, make_user, login, start_date, end_date, group_by):
+    client = login(make_user())
+    response = client.get(f'/api/timesheet-summary?start_date={start_date}&end_date={end_date}&group_by={group_by}')
+    assert response.status_code == 400
+    assert 'at most' in response.get_json()['error']
+
+
+@pytest.mark.parametrize('start_date, group_by, buckets', [
+    ('9999-12-01', 'day', 31),
+    ('9999-12-01', 'week', 5),
+    ('9999-01-01', 'month', 12),
+])
+def test_ranges_ending_on_the_last_day_of_the_calendar(app, make_user, login, start_date, group_by, buckets):
+    client = login(make_user())
+    response = client.get(f'/api/timesheet-summary?start_date={start_date}&end_date=9999-12-31&group_by={group_by}')
+    assert response.status_code == 200
+    summary = response.get_json()
+    assert len(summary['buckets']) == buckets
+    assert summary['buckets'][-1]['end'] == '9999-12-31'
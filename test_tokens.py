@@ -0,0 +1,92 @@
+from flask import jsonify
+from flask_jwt_extended import create_access_token, jwt_required
+
+from auth import require_role
+from tokens import jwt_user_id
+from test_query_counts import count_statements
+
+
+def call_with_token(app, token, role):
+    """Run a require_role protected view with the token, returning its status code"""
+    view = require_role(role)(lambda: jsonify({'ok': True}))
+    with app.test_request_context(headers={'Authorization': f'Bearer {token}'}):
+        response = app.make_response(view())
+    return response.status_code
+
+
+def login_tokens(app, user, password='password123'):
+    response = app.test_client().post('/login', json={'username': user.username, 'password': password})
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_roles_are_authorized_from_token_claims(app, make_user):
+    tokens = login_tokens(app, make_user('manager'))
+    assert call_with_token(app, tokens['access_token'], 'manager') == 200
+
+    with count_statements(app) as statements:
+        assert call_with_token(app, tokens['access_token'], 'employee') == 200
+        assert call_with_token(app, tokens['access_token'], 'admin') == 403
+    assert statements == []
+
+
+def test_role_change_revokes_issued_tokens(app, make_user, login):
+    admin = make_user('admin')
+    manager = make_user('manager')
+    tokens = login_tokens(app, manager)
+    assert call_with_token(app, tokens['access_token'], 'manager') == 200
+
+    response = login(admin).put(f'/api/users/{manager.id}', json={'role': 'employee'})
+    assert response.status_code == 200
+
+    assert call_with_token(app, tokens['access_token'], 'employee') == 401
+    client = app.test_client()
+    refresh = client.post('/api/token/refresh', headers={'Authorization': f"Bearer {tokens['refresh_token']}"})
+    assert refresh.status_code == 401
+
+    tokens = login_tokens(app, manager)
+    assert call_with_token(app, tokens['access_token'], 'employee') == 200
+    assert call_with_token(app, tokens['access_token'], 'manager') == 403
+
+    refresh = client.post('/api/token/refresh', headers={'Authorization': f"Bearer {tokens['refresh_token']}"})
+    assert refresh.status_code == 200
+    assert call_with_token(app, refresh.get_json()['access_token'], 'employee') == 200
+
+
+def call_with_user_id(app, token):
+    """Run a jwt_user_id() view with the token, returning its status code and body"""
+    view = jwt_required()(lambda: jsonify({'user_id': jwt_user_id()}))
+    with app.test_request_context(headers={'Authorization': f'Bearer {token}'}):
+        try:
+            response = app.make_response(view())
+        except Exception as e:
+            response = app.make_response(app.handle_user_exception(e))
+    return response.status_code, response.get_json()
+
+
+def test_user_id_comes_back_as_an_int(app, make_user):
+    user = make_user()
+    assert call_with_user_id(app, login_tokens(app, user)['access_token']) == (200, {'user_id': user.id})
+
+
+def test_kiosk_tokens_are_not_user_tokens(app):
+    with app.app_context():
+        token = create_access_token(identity='kiosk:1', additional_claims={'kiosk_terminal': 1})
+
+    status, body = call_with_user_id(app, token)
+    assert status == 401
+    assert body == {'error': 'A user access token is required'}
+
+
+def test_kiosk_auth_rejects_malformed_terminal_ids(app, make_user, login):
+    client = login(make_user('admin'))
+    terminal = client.post('/api/kiosk/terminals', json={'name': 'Front door'}).get_json()
+
+    for terminal_id in (None, 'front-door', [terminal['id']], {'id': terminal['id']}):
+        response = client.post('/api/kiosk/auth', json={'terminal_id': terminal_id, 'secret': terminal['secret']})
+        assert response.status_code == 400
+
+    assert client.post('/api/kiosk/auth', json={'terminal_id': terminal['id'], 'secret': 'wrong'}).status_code == 401
+    response = client.post('/api/kiosk/auth', json={'terminal_id': str(terminal['id']), 'secret': terminal['secret']})
+    assert response.status_code == 200
+    assert response.get_json()['access_token']
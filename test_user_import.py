@@ -0,0 +1,90 @@
+import io
+
+from database import db
+from models import Department, User
+from password_pool import password_pool
+from test_query_counts import count_statements
+import user_import
+from user_import import import_users
+
+CSV = """email,first_name,last_name,role,department,password,badge_code
+ana.novak@example.com,Ana,Novak,employee,Operations,password123,B-100
+ana.novak@example.org,Ana,Novak,manager,operations,,
+{bad_email},Bad,Row,employee,Nowhere,short,B-100
+"""
+
+
+def add_department(app, name):
+    with app.app_context():
+        department = Department(name=name)
+        db.session.add(department)
+        db.session.commit()
+        return department.id
+
+
+def post_csv(client, content, **options):
+    query = '&'.join(f'{key}=true' for key in options)
+    return client.post(f'/api/users/import?{query}', data=content, content_type='text/csv')
+
+
+def test_invalid_rows_block_the_import_unless_skipped(app, make_user, login):
+    department_id = add_department(app, 'Operations')
+    client = login(make_user('admin'))
+    content = CSV.format(bad_email='not-an-email')
+
+    response = post_csv(client, content)
+    assert response.status_code == 400
+    results = response.get_json()['results']
+    assert [result['status'] for result in results] == ['not_imported', 'not_imported', 'invalid']
+    assert len(results[2]['errors']) == 4
+
+    response = post_csv(client, content, skip_invalid=True)
+    assert response.status_code == 200
+    summary = response.get_json()
+    assert summary['created'] == 2
+    # Both rows derive the same base, so the second gets a suffix
+    assert [result.get('username') for result in summary['results']] == ['ana.novak', 'ana.novak1', None]
+
+    with app.app_context():
+        created = db.session.get(User, summary['results'][1]['user_id'])
+        assert (created.role, created.department_id, created.password_hash) == ('manager', department_id, None)
+
+    upload = {'file': (io.BytesIO(content.encode('utf-8')), 'users.csv')}
+    response = client.post('/api/users/import', data=upload, content_type='multipart/form-data')
+    assert [result['errors'] for result in response.get_json()['results'][:2]] == [
+        ['Email address already registered', 'Badge code is already assigned'],
+        ['Email address already registered']
+    ]
+
+    assert app.test_client().post('/login', json={'username': 'ana.novak', 'password': 'password123'}).status_code == 200
+
+
+def test_import_statements_do_not_grow_with_rows(app):
+    def rows(prefix, count):
+        return [{'email': f'{prefix}{n}@example.com', 'first_name': 'Bulk', 'last_name': str(n)}
+                for n in range(count)]
+
+    with app.app_context():
+        with count_statements(app) as few:
+            assert import_users(rows('few', 5))['created'] == 5
+        with count_statements(app) as many:
+            assert import_users(rows('many', 400))['created'] == 400
+        assert User.query.count() == 405
+
+    assert len(many) == len(few)
+
+
+def test_large_password_imports_are_sent_to_the_cli(app, make_user, login, monkeypatch):
+    monkeypatch.setattr(user_import, 'USER_IMPORT_WEB_PASSWORD_ROWS', 1)
+    client = login(make_user('admin'))
+    header = "email,first_name,last_name,password\n"
+    content = header + "bulk1@example.com,Bulk,One,password123\nbulk2@example.com,Bulk,Two,password123\n"
+
+    response = post_csv(client, content)
+    assert response.status_code == 413
+    assert 'import_users.py' in response.get_json()['error']
+    assert post_csv(client, content, dry_run=True).status_code == 200
+
+    # Imports that fit hash in their own pool, never the one logins use
+    monkeypatch.setattr(password_pool, 'hash_many', None)
+    assert post_csv(client, header + "bulk3@example.com,Bulk,Three,password123\n").get_json()['created'] == 1
@@ -0,0 +1,49 @@
+import usernames
+from database import db
+from models import User
+from test_query_counts import count_statements
+from usernames import allocate_username, save_new_user, username_base
+
+
+def add_users(app, names):
+    with app.app_context():
+        for name in names:
+            db.session.add(User(username=name, email=f'{name}@example.com', first_name='Test', last_name=name))
+        db.session.commit()
+
+
+def new_user(email):
+    return User(email=email, first_name='New', last_name='User')
+
+
+def test_smallest_free_suffix_is_found_in_one_query(app):
+    add_users(app, ['john', 'john1', 'john3', 'johnny', 'john01', 'jo%n', 'a_b'])
+
+    with app.app_context():
+        with count_statements(app) as statements:
+            assert allocate_username('john') == 'john2'
+        assert len(statements) == 1
+
+        # Wildcards in the base are matched literally
+        assert allocate_username('jo_n') == 'jo_n'
+        assert allocate_username('jo%n') == 'jo%n1'
+        assert allocate_username('axb') == 'axb'
+        assert username_base('Mary.Smith@example.com') == 'Mary.Smith'
+
+
+def test_username_taken_concurrently_is_retried(app, monkeypatch):
+    add_users(app, ['john'])
+    allocate = usernames.allocate_username
+    calls = []
+
+    def allocate_after_race(base):
+        calls.append(base)
+        # The first allocation loses to a sign-up that commits the same name
+        return 'john' if len(calls) == 1 else allocate(base)
+
+    monkeypatch.setattr(usernames, 'allocate_username', allocate_after_race)
+
+    with app.app_context():
+        user = save_new_user(new_user('john@example.org'), 'john')
+        assert user.username == 'john1'
+        assert len(calls) == 2
@@ -1,8 +1,17 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
 from models import TimeEntry, User, Project, Geofence
 from auth import log_action, validate_geofence, require_role
+from tokens import jwt_user_id
 from app import db
+from rollups import entry_snapshot, record_entry_change, split_entry_overtime, rebuild_entry_overtime
+from timesheet import parse_timesheet_range, summarize_timesheet
+from pagination import keyset_page, count_entries
+from change_feed import publish_entry_change
+from clock_events import ClockEventError, apply_clock_events
+from active_sessions import get_open_entry, open_session, close_session
 from datetime import datetime, timedelta
 import json
 
@@ -11,13 +20,10 @@ time_bp = Blueprint('time', __name__)
 @time_bp.route('/api/clock-in', methods=['POST'])
 @jwt_required()
 def clock_in():
-    user_id = get_jwt_identity()
+    user_id = jwt_user_id()
     data = request.get_json()
 
-    existing_entry = TimeEntry.query.filter_by(
-        user_id=user_id,
-        clock_out_time=None
-    ).first()
+    existing_entry = get_open_entry(user_id)
 
     if existing_entry:
         return jsonify({'error': 'Already clocked in'}), 400
@@ -40,7 +46,16 @@ def clock_in():
     )
 
     db.session.add(time_entry)
-    db.session.commit()
+    open_session(time_entry)
+
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent request clocked this user in first
+        db.session.rollback()
+        return jsonify({'error': 'Already clocked in'}), 400
+
+    publish_entry_change(user_id, time_entry.clock_in_time.date())
 
     log_action(user_id, 'CLOCK_IN', 'time_entries', time_entry.id)
 
@@ -53,17 +68,19 @@ def clock_in():
 @time_bp.route('/api/clock-out', methods=['POST'])
 @jwt_required()
 def clock_out():
-    user_id = get_jwt_identity()
+    user_id = jwt_user_id()
     data = request.get_json()
 
-    time_entry = TimeEntry.query.filter_by(
-        user_id=user_id,
-        clock_out_time=None
-    ).first()
+    time_entry = get_open_entry(user_id)
 
     if not time_entry:
         return jsonify({'error': 'Not currently clocked in'}), 400
 
+    if not close_session(time_entry):
+        db.session.rollback()
+        return jsonify({'error': 'Not currently clocked in'}), 400
+
+    before = entry_snapshot(time_entry)
     time_entry.clock_out_time = datetime.utcnow()
     time_entry.break_duration = data.get('break_duration', 0)
 
@@ -71,34 +88,31 @@ def clock_out():
     total_hours = duration.total_seconds() / 3600
     time_entry.total_hours = max(0, total_hours - time_entry.break_duration)
 
-    user = User.query.get(user_id)
-    daily_hours = get_daily_hours(user_id, time_entry.clock_in_time.date())
-
-    if daily_hours > 8:
-        time_entry.is_overtime = True
+    record_entry_change(before, time_entry)
+    split_entry_overtime(time_entry)
 
     if data.get('notes'):
         time_entry.notes += f"\nClock-out notes: {data.get('notes')}"
 
     db.session.commit()
+    publish_entry_change(user_id, time_entry.clock_in_time.date())
 
     log_action(user_id, 'CLOCK_OUT', 'time_entries', time_entry.id)
 
     return jsonify({
         'message': 'Clocked out successfully',
         'total_hours': time_entry.total_hours,
+        'regular_hours': time_entry.regular_hours,
+        'overtime_hours': time_entry.overtime_hours,
         'is_overtime': time_entry.is_overtime
     })
 
 @time_bp.route('/api/break-start', methods=['POST'])
 @jwt_required()
 def start_break():
-    user_id = get_jwt_identity()
+    user_id = jwt_user_id()
 
-    active_entry = TimeEntry.query.filter_by(
-        user_id=user_id,
-        clock_out_time=None
-    ).first()
+    active_entry = get_open_entry(user_id)
 
     if not active_entry:
         return jsonify({'error': 'Not currently clocked in'}), 400
@@ -110,32 +124,57 @@ def start_break():
 @time_bp.route('/api/break-end', methods=['POST'])
 @jwt_required()
 def end_break():
-    user_id = get_jwt_identity()
+    user_id = jwt_user_id()
     data = request.get_json()
 
-    active_entry = TimeEntry.query.filter_by(
-        user_id=user_id,
-        clock_out_time=None
-    ).first()
+    active_entry = get_open_entry(user_id)
 
     if not active_entry:
         return jsonify({'error': 'Not currently clocked in'}), 400
 
+    before = entry_snapshot(active_entry)
     break_duration = data.get('break_duration', 0)
     active_entry.break_duration += break_duration
 
+    record_entry_change(before, active_entry)
     db.session.commit()
+    publish_entry_change(user_id, active_entry.clock_in_time.date())
 
     log_action(user_id, 'BREAK_END', 'time_entries', active_entry.id)
 
     return jsonify({'message': 'Break ended', 'total_break_duration': active_entry.break_duration})
 
+@time_bp.route('/api/clock-events/batch', methods=['POST'])
+@jwt_required()
+def clock_events_batch():
+    user_id = jwt_user_id()
+    data = request.get_json() or {}
+
+    try:
+        results = apply_clock_events(user_id, data.get('events'), validate_location=validate_location)
+    except ClockEventError as e:
+        return jsonify({'error': str(e)}), 400
+
+    applied = [result for result in results if result['status'] == 'applied']
+    if applied:
+        log_action(user_id, 'CLOCK_EVENTS_BATCH', 'time_entries', None, None, {'events': len(applied)})
+
+    return jsonify({
+        'applied': len(applied),
+        'rejected': len(results) - len(applied),
+        'results': results
+    })
+
+def validate_location(latitude, longitude):
+    return validate_geofence(latitude, longitude, [])
+
 @time_bp.route('/api/time-entries')
 @jwt_required()
 def get_time_entries():
-    user_id = get_jwt_identity()
+    user_id = jwt_user_id()
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
+    cursor = request.args.get('cursor') or None
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
 
@@ -146,9 +185,14 @@ def get_time_entries():
     if end_date:
         query = query.filter(TimeEntry.clock_in_time <= datetime.fromisoformat(end_date))
 
-    entries = query.order_by(TimeEntry.clock_in_time.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    try:
+        entries, next_cursor = keyset_page(
+            query.options(joinedload(TimeEntry.project)), cursor, per_page, descending=True, page=page
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    total = count_entries(query)
 
     return jsonify({
         'entries': [{
@@ -157,25 +201,29 @@ def get_time_entries():
             'clock_out_time': entry.clock_out_time.isoformat() if entry.clock_out_time else None,
             'total_hours': entry.total_hours,
             'break_duration': entry.break_duration,
+            'regular_hours': entry.regular_hours,
+            'overtime_hours': entry.overtime_hours,
             'is_overtime': entry.is_overtime,
             'project_id': entry.project_id,
             'project_name': entry.project.name if entry.project else None,
             'notes': entry.notes,
             'status': entry.status
-        } for entry in entries.items],
-        'total': entries.total,
-        'pages': entries.pages,
-        'current_page': entries.page
+        } for entry in entries],
+        'total': total,
+        'pages': max(1, (total + per_page - 1) // per_page),
+        'current_page': page,
+        'next_cursor': next_cursor
     })
 
 @time_bp.route('/api/time-entries/<int:entry_id>', methods=['PUT'])
 @jwt_required()
 @require_role('manager')
 def update_time_entry(entry_id):
-    user_id = get_jwt_identity()
+    user_id = jwt_user_id()
     data = request.get_json()
 
     time_entry = TimeEntry.query.get_or_404(entry_id)
+    before = entry_snapshot(time_entry)
     old_values = {
         'clock_in_time': time_entry.clock_in_time.isoformat(),
         'clock_out_time': time_entry.clock_out_time.isoformat() if time_entry.clock_out_time else None,
@@ -188,6 +236,8 @@ def update_time_entry(entry_id):
 
     if 'clock_out_time' in data:
         time_entry.clock_out_time = datetime.fromisoformat(data['clock_out_time'])
+        # Closing an open entry by hand ends the user's session
+        close_session(time_entry)
 
     if 'notes' in data:
         time_entry.notes = data['notes']
@@ -196,7 +246,12 @@ def update_time_entry(entry_id):
         duration = time_entry.clock_out_time - time_entry.clock_in_time
         time_entry.total_hours = max(0, (duration.total_seconds() / 3600) - time_entry.break_duration)
 
+    record_entry_change(before, time_entry)
+    # An edit can move hours across the thresholds for the rest of the week
+    work_dates = sorted({before[1] if before else None, time_entry.clock_in_time.date()} - {None})
+    rebuild_entry_overtime(work_dates[0], work_dates[-1], time_entry.user_id)
     db.session.commit()
+    publish_entry_change(time_entry.user_id, before[1] if before else None, time_entry.clock_in_time.date())
 
     new_values = {
         'clock_in_time': time_entry.clock_in_time.isoformat(),
@@ -212,12 +267,9 @@ def update_time_entry(entry_id):
 @time_bp.route('/api/current-status')
 @jwt_required()
 def get_current_status():
-    user_id = get_jwt_identity()
+    user_id = jwt_user_id()
 
-    active_entry = TimeEntry.query.filter_by(
-        user_id=user_id,
-        clock_out_time=None
-    ).first()
+    active_entry = get_open_entry(user_id)
 
     if active_entry:
         current_time = datetime.utcnow()
@@ -235,23 +287,10 @@ def get_current_status():
 
     return jsonify({'status': 'clocked_out'})
 
-def get_daily_hours(user_id, date):
-    start_of_day = datetime.combine(date, datetime.min.time())
-    end_of_day = start_of_day + timedelta(days=1)
-
-    entries = TimeEntry.query.filter(
-        TimeEntry.user_id == user_id,
-        TimeEntry.clock_in_time >= start_of_day,
-        TimeEntry.clock_in_time < end_of_day,
-        TimeEntry.total_hours.isnot(None)
-    ).all()
-
-    return sum(entry.total_hours for entry in entries)
-
 @time_bp.route('/api/weekly-summary')
 @jwt_required()
 def get_weekly_summary():
-    user_id = get_jwt_identity()
+    user_id = jwt_user_id()
     week_start = request.args.get('week_start')
 
     if week_start:
@@ -262,26 +301,38 @@ def get_weekly_summary():
 
     end_date = start_date + timedelta(days=6)
 
-    daily_hours = []
-    total_hours = 0
-    overtime_hours = 0
-
-    for i in range(7):
-        current_date = start_date + timedelta(days=i)
-        day_hours = get_daily_hours(user_id, current_date)
-        daily_hours.append({
-            'date': current_date.isoformat(),
-            'hours': day_hours,
-            'overtime': max(0, day_hours - 8)
-        })
-        total_hours += day_hours
-        overtime_hours += max(0, day_hours - 8)
+    summary = summarize_timesheet(user_id, start_date, end_date, 'day')
 
     return jsonify({
         'week_start': start_date.isoformat(),
         'week_end': end_date.isoformat(),
-        'daily_hours': daily_hours,
-        'total_hours': total_hours,
-        'overtime_hours': overtime_hours,
-        'regular_hours': min(total_hours, 40)
-    })
\ No newline at end of file
+        'daily_hours': [{
+            'date': bucket['start'],
+            'hours': bucket['hours'],
+            'overtime': bucket['overtime']
+        } for bucket in summary['buckets']],
+        'total_hours': summary['total_hours'],
+        'overtime_hours': summary['overtime_hours'],
+        'regular_hours': min(summary['total_hours'], 40)
+    })
+
+@time_bp.route('/api/timesheet-summary')
+@jwt_required()
+def get_timesheet_summary():
+    user_id = jwt_user_id()
+    user = User.query.get(user_id)
+
+    target_user_id = request.args.get('employee_id', type=int) or user_id
+    if target_user_id != user_id and user.role not in ['admin', 'manager']:
+        return jsonify({'error': 'Insufficient permissions'}), 403
+
+    try:
+        start_date, end_date = parse_timesheet_range(
+            request.args.get('start_date'),
+            request.args.get('end_date')
+        )
+        summary = summarize_timesheet(target_user_id, start_date, end_date, request.args.get('group_by', 'day'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify(summary)
\ No newline at end of file
@@ -0,0 +1,115 @@
+"""
+Timesheet summaries over arbitrary date ranges.
+
+All days in the range are read from daily_rollups with a single query and
+folded into day, week (Monday based) or month buckets, so a yearly summary
+costs one round trip regardless of the grouping. The span of a range is
+capped per grouping so one request cannot build an unbounded bucket list.
+"""
+from datetime import date, datetime, timedelta
+from models import DailyRollup
+
+TIMESHEET_GROUPINGS = ('day', 'week', 'month')
+# Longest range, in days, each grouping may cover
+TIMESHEET_MAX_DAYS = {'day': 366, 'week': 3 * 366, 'month': 10 * 366}
+
+
+def parse_timesheet_range(start_date, end_date):
+    """Parse YYYY-MM-DD query parameters, defaulting to the current week"""
+    today = datetime.now().date()
+
+    if start_date:
+        start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+    else:
+        start_date = today - timedelta(days=today.weekday())
+
+    if end_date:
+        end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+    else:
+        end_date = start_date + timedelta(days=6)
+
+    if end_date < start_date:
+        raise ValueError('end_date must not be before start_date')
+
+    return start_date, end_date
+
+
+def bucket_start(day, group_by):
+    if group_by == 'week':
+        return day - timedelta(days=day.weekday())
+    if group_by == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _next_bucket(start, group_by):
+    """The first day of the following bucket, or None past the end of the calendar"""
+    try:
+        if group_by == 'week':
+            return start + timedelta(days=7)
+        if group_by == 'month':
+            return date(start.year + start.month // 12, start.month % 12 + 1, 1)
+        return start + timedelta(days=1)
+    except (OverflowError, ValueError):
+        return None
+
+
+def summarize_timesheet(user_id, start_date, end_date, group_by='day'):
+    """Per-bucket hours and overtime for one user, inclusive of both ends"""
+    if group_by not in TIMESHEET_GROUPINGS:
+        raise ValueError(f"group_by must be one of: {', '.join(TIMESHEET_GROUPINGS)}")
+    if (end_date - start_date).days + 1 > TIMESHEET_MAX_DAYS[group_by]:
+        raise ValueError(f'Ranges grouped by {group_by} may cover at most {TIMESHEET_MAX_DAYS[group_by]} days')
+
+    # Every bucket in the range is listed, including ones without any work
+    buckets = {}
+    current = bucket_start(start_date, group_by)
+    while current is not None and current <= end_date:
+        following = _next_bucket(current, group_by)
+        last_day = following - timedelta(days=1) if following else date.max
+        buckets[current] = {
+            'start': max(current, start_date).isoformat(),
+            'end': min(last_day, end_date).isoformat(),
+            'hours': 0,
+            'overtime': 0,
+            'break_hours': 0,
+            'entries_count': 0
+        }
+        current = following
+
+    rows = DailyRollup.query.with_entities(
+        DailyRollup.work_date,
+        DailyRollup.worked_hours,
+        DailyRollup.overtime_hours,
+        DailyRollup.break_hours,
+        DailyRollup.entry_count
+    ).filter(
+        DailyRollup.user_id == user_id,
+        DailyRollup.work_date >= start_date,
+        DailyRollup.work_date <= end_date
+    ).all()
+
+    for work_date, worked, overtime, breaks, entries in rows:
+        bucket = buckets[bucket_start(work_date, group_by)]
+        bucket['hours'] += worked or 0
+        bucket['overtime'] += overtime or 0
+        bucket['break_hours'] += breaks or 0
+        bucket['entries_count'] += entries or 0
+
+    for bucket in buckets.values():
+        bucket['regular_hours'] = bucket['hours'] - bucket['overtime']
+
+    total_hours = sum(bucket['hours'] for bucket in buckets.values())
+    overtime_hours = sum(bucket['overtime'] for bucket in buckets.values())
+
+    return {
+        'user_id': user_id,
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'group_by': group_by,
+        'buckets': list(buckets.values()),
+        'total_hours': total_hours,
+        'overtime_hours': overtime_hours,
+        'regular_hours': total_hours - overtime_hours,
+        'entries_count': sum(bucket['entries_count'] for bucket in buckets.values())
+    }
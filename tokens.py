@@ -0,0 +1,69 @@
+"""
+Access tokens that carry the claims needed for authorization.
+
+Access tokens are short lived and include the user's role, department and
+token version, so require_role() can authorize from the token alone. The
+only other check is that the token's version still matches the user's
+token_version, read from the identity cache. Changing a user's role,
+department or active flag bumps the version. That revokes the user's tokens
+as soon as the change feed reaches each worker, without waiting for them to
+expire. Refresh tokens are exchanged for a new access token with the
+user's current claims. The subject is the user id as a string, as PyJWT
+requires; views read it back with jwt_user_id(), which also turns away kiosk
+terminal tokens.
+"""
+from flask_jwt_extended import create_access_token, create_refresh_token, get_jwt
+from identity_cache import get_identity
+
+# Changes to these columns invalidate tokens issued before them
+TOKEN_CLAIM_COLUMNS = ('role', 'department_id', 'is_active')
+
+
+class UserTokenRequired(Exception):
+    pass
+
+
+def _claims(user):
+    return {'role': user.role, 'dept': user.department_id, 'ver': user.token_version or 0}
+
+
+def create_user_tokens(user):
+    """An access and a refresh token for the user"""
+    return {
+        'access_token': create_access_token(identity=str(user.id), additional_claims=_claims(user)),
+        'refresh_token': create_refresh_token(identity=str(user.id),
+                                              additional_claims={'ver': user.token_version or 0})
+    }
+
+
+def refresh_access_token(claims):
+    """A new access token for a verified refresh token's claims, or None if it was revoked"""
+    identity = current_identity(claims)
+    if identity is None:
+        return None
+    return create_access_token(identity=str(identity.id), additional_claims=_claims(identity))
+
+
+def jwt_user_id():
+    """The user id of the request's verified access token, as an int"""
+    claims = get_jwt()
+    # Kiosk terminal tokens carry no user claims
+    if 'role' not in claims or 'ver' not in claims:
+        raise UserTokenRequired('A user access token is required')
+    try:
+        return int(claims['sub'])
+    except (KeyError, TypeError, ValueError):
+        raise UserTokenRequired('A user access token is required')
+
+
+def current_identity(claims):
+    """The token's user, or None if the user is gone, inactive or the token was revoked"""
+    identity = get_identity(claims.get('sub'))
+    if identity is None or not identity.is_active or claims.get('ver') != (identity.token_version or 0):
+        return None
+    return identity
+
+
+def revoke_user_tokens(user):
+    """Invalidate the user's outstanding tokens when the change is committed"""
+    user.token_version = (user.token_version or 0) + 1
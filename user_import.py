@@ -0,0 +1,258 @@
+"""
+Bulk user provisioning from CSV or JSON.
+
+Every row is validated before anything is written: required fields, email
+format, roles, hire dates and departments. Emails, usernames and badge codes
+must be unique within the file and against existing users. Departments may
+be given by name or id and are resolved from one query of all departments.
+Existing emails and badge codes are looked up with batched IN queries, and
+usernames are loaded once so generated names can be picked in memory.
+Passwords are then hashed in a process pool of their own, so an import never
+queues ahead of logins, and all rows are inserted in batches inside one
+transaction. The result lists the outcome of every row. Web requests may only
+hash USER_IMPORT_WEB_PASSWORD_ROWS passwords; larger imports with passwords
+go through import_users.py.
+"""
+import atexit
+import csv
+import io
+import json
+import os
+import re
+from datetime import datetime
+from sqlalchemy import func
+from database import db
+from models import Department, User
+from password_pool import PasswordPool
+from usernames import pick_username, username_base, USERNAME_MAX_LENGTH
+from change_feed import publish
+
+USER_IMPORT_MAX_ROWS = int(os.getenv('USER_IMPORT_MAX_ROWS', '10000'))
+USER_IMPORT_BATCH_SIZE = 500
+USER_IMPORT_ROLES = ('employee', 'manager', 'hr', 'admin')
+USER_IMPORT_POOL_SIZE = int(os.getenv('USER_IMPORT_POOL_SIZE', '1'))
+USER_IMPORT_WEB_PASSWORD_ROWS = int(os.getenv('USER_IMPORT_WEB_PASSWORD_ROWS', '50'))
+
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+# Oracle accepts at most 1000 expressions in an IN list
+IN_LIST_SIZE = 1000
+
+
+# Kept apart from the login pool in password_pool
+import_password_pool = PasswordPool(size=USER_IMPORT_POOL_SIZE)
+atexit.register(import_password_pool.shutdown)
+
+
+class UserImportError(ValueError):
+    pass
+
+
+def parse_import(content, format_type):
+    """Rows from CSV text or a JSON list of objects (optionally under a 'users' key)"""
+    if format_type == 'csv':
+        rows = list(csv.DictReader(io.StringIO(content)))
+    elif format_type == 'json':
+        try:
+            data = json.loads(content) if isinstance(content, str) else content
+        except ValueError as e:
+            raise UserImportError(f'Invalid JSON: {e}')
+        rows = data.get('users') if isinstance(data, dict) else data
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise UserImportError('JSON imports must be a list of user objects')
+    else:
+        raise UserImportError(f'Unsupported import format: {format_type}')
+
+    if not rows:
+        raise UserImportError('No users to import')
+    if len(rows) > USER_IMPORT_MAX_ROWS:
+        raise UserImportError(f'At most {USER_IMPORT_MAX_ROWS} users can be imported at once')
+    return rows
+
+
+def count_passwords(rows):
+    """The number of rows whose password would have to be hashed"""
+    return sum(1 for row in rows if row.get('password'))
+
+
+def _text(row, field):
+    value = row.get(field)
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _flag(value, default=True):
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'y')
+
+
+def _existing(column, values):
+    """The values of column already present in users, one query per IN_LIST_SIZE values"""
+    values = sorted(values)
+    found = set()
+    for i in range(0, len(values), IN_LIST_SIZE):
+        found.update(value for (value,) in db.session.query(column).filter(column.in_(values[i:i + IN_LIST_SIZE])))
+    return found
+
+
+def validate_rows(rows):
+    """Normalised users and per-row errors, checking the file and the database"""
+    departments = Department.query.with_entities(Department.id, Department.name).all()
+    department_ids = {department.id for department in departments}
+    department_names = {department.name.strip().lower(): department.id for department in departments}
+
+    emails = {(_text(row, 'email') or '').lower() for row in rows} - {''}
+    explicit_usernames = {_text(row, 'username') for row in rows} - {None}
+    badges = {_text(row, 'badge_code') for row in rows} - {None}
+    taken_emails = {email.lower() for email in _existing(func.lower(User.email), emails)}
+    taken_badges = _existing(User.badge_code, badges)
+    # All usernames, so generated names can be picked in memory
+    taken_usernames = {username for (username,) in db.session.query(User.username)}
+    # Generated names also avoid explicit usernames later in the file
+    reserved_usernames = taken_usernames | explicit_usernames
+
+    users, errors = [], []
+    seen_emails, seen_badges = set(), set()
+    for row in rows:
+        row_errors = []
+        email = (_text(row, 'email') or '').lower()
+        first_name, last_name = _text(row, 'first_name'), _text(row, 'last_name')
+        role = (_text(row, 'role') or 'employee').lower()
+        badge_code = _text(row, 'badge_code')
+
+        for field, value in (('email', email), ('first_name', first_name), ('last_name', last_name)):
+            if not value:
+                row_errors.append(f'{field} is required')
+        if email and not EMAIL_PATTERN.match(email):
+            row_errors.append('Invalid email format')
+        elif email in taken_emails:
+            row_errors.append('Email address already registered')
+        elif email in seen_emails:
+            row_errors.append('Email address appears more than once in the import')
+        if role not in USER_IMPORT_ROLES:
+            row_errors.append(f"role must be one of: {', '.join(USER_IMPORT_ROLES)}")
+        if badge_code and (badge_code in taken_badges or badge_code in seen_badges):
+            row_errors.append('Badge code is already assigned')
+
+        department_id = None
+        if _text(row, 'department_id'):
+            try:
+                department_id = int(_text(row, 'department_id'))
+            except ValueError:
+                department_id = -1
+            if department_id not in department_ids:
+                row_errors.append(f"Unknown department id: {_text(row, 'department_id')}")
+        elif _text(row, 'department'):
+            department_id = department_names.get(_text(row, 'department').lower())
+            if department_id is None:
+                row_errors.append(f"Unknown department: {_text(row, 'department')}")
+
+        hire_date = None
+        if _text(row, 'hire_date'):
+            try:
+                hire_date = datetime.strptime(_text(row, 'hire_date'), '%Y-%m-%d').date()
+            except ValueError:
+                row_errors.append('hire_date must be in YYYY-MM-DD format')
+
+        password = row.get('password') or None
+        if password is not None and len(str(password)) < 8:
+            row_errors.append('Password must be at least 8 characters long')
+
+        username = _text(row, 'username')
+        if username:
+            if len(username) > USERNAME_MAX_LENGTH:
+                row_errors.append(f'username must be at most {USERNAME_MAX_LENGTH} characters')
+            elif username in taken_usernames:
+                row_errors.append('Username is already taken')
+
+        if row_errors:
+            errors.append(row_errors)
+            users.append(None)
+            continue
+
+        if not username:
+            username = pick_username(username_base(email), reserved_usernames)
+        taken_usernames.add(username)
+        reserved_usernames.add(username)
+        seen_emails.add(email)
+        if badge_code:
+            seen_badges.add(badge_code)
+
+        errors.append([])
+        users.append({
+            'username': username,
+            'email': email,
+            'first_name': first_name,
+            'last_name': last_name,
+            'role': role,
+            'department_id': department_id,
+            'hire_date': hire_date,
+            'badge_code': badge_code,
+            'is_active': _flag(row.get('is_active')),
+            'auth_provider': 'local',
+            'password': None if password is None else str(password)
+        })
+
+    return users, errors
+
+
+def import_users(rows, dry_run=False, skip_invalid=False, pool=None):
+    """
+    Validate and create users, returning a summary with one result per row.
+
+    Nothing is written if any row is invalid, unless skip_invalid is set.
+    """
+    pool = pool or import_password_pool
+    users, errors = validate_rows(rows)
+    invalid = sum(1 for row_errors in errors if row_errors)
+    write = not dry_run and (skip_invalid or not invalid)
+    valid_users = [user for user in users if user is not None]
+
+    if write and valid_users:
+        with_password = [user for user in valid_users if user['password'] is not None]
+        for user, password_hash in zip(with_password, pool.hash_many(user['password'] for user in with_password)):
+            user['password_hash'] = password_hash
+
+        now = datetime.utcnow()
+        records = [dict({key: value for key, value in user.items() if key != 'password'},
+                        password_hash=user.get('password_hash'), created_at=now) for user in valid_users]
+        try:
+            for i in range(0, len(records), USER_IMPORT_BATCH_SIZE):
+                db.session.execute(User.__table__.insert(), records[i:i + USER_IMPORT_BATCH_SIZE])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        # Lets kiosk directories pick up imported badge codes
+        publish('users', imported=len(records))
+
+        created_ids = {}
+        usernames = [user['username'] for user in valid_users]
+        for i in range(0, len(usernames), IN_LIST_SIZE):
+            created_ids.update(db.session.query(User.username, User.id).filter(
+                User.username.in_(usernames[i:i + IN_LIST_SIZE])))
+    else:
+        created_ids = {}
+
+    results = []
+    for index, (user, row_errors) in enumerate(zip(users, errors)):
+        result = {'row': index + 1}
+        if row_errors:
+            result.update(status='invalid', errors=row_errors)
+        elif not write:
+            result.update(status='valid' if dry_run else 'not_imported', username=user['username'])
+        else:
+            result.update(status='created', username=user['username'], user_id=created_ids.get(user['username']))
+        results.append(result)
+
+    return {
+        'total': len(rows),
+        'created': len(valid_users) if write else 0,
+        'invalid': invalid,
+        'dry_run': dry_run,
+        'results': results
+    }
@@ -0,0 +1,56 @@
+"""
+Username allocation for new accounts.
+
+Usernames are derived from the email address, with the smallest free numeric
+suffix appended on a collision (john, john1, john2, ...). Every existing
+username starting with the base is fetched in one LIKE query, with the
+base's own wildcards escaped, and the suffix is picked in memory.
+save_new_user() relies on the unique constraint for concurrent sign-ups: if
+another request takes the username first, it allocates again and retries.
+"""
+from sqlalchemy.exc import IntegrityError
+from database import db
+from models import User
+
+USERNAME_MAX_LENGTH = User.__table__.c.username.type.length
+# Room left for the numeric suffix
+USERNAME_BASE_LENGTH = USERNAME_MAX_LENGTH - 6
+USERNAME_ATTEMPTS = 5
+
+
+def username_base(email):
+    return (email.split('@')[0].strip() or 'user')[:USERNAME_BASE_LENGTH]
+
+
+def allocate_username(base):
+    """The base if it is free, otherwise the base with the smallest free suffix"""
+    taken = {row.username for row in User.query.with_entities(User.username).filter(
+        User.username.startswith(base, autoescape=True)
+    )}
+    return pick_username(base, taken)
+
+
+def pick_username(base, taken):
+    """The base or its smallest suffixed form not in the taken usernames"""
+    if base not in taken:
+        return base
+
+    suffix = 1
+    while f'{base}{suffix}' in taken:
+        suffix += 1
+    return f'{base}{suffix}'
+
+
+def save_new_user(user, base):
+    """Give a new user the first free username for the base and commit it"""
+    for attempt in range(USERNAME_ATTEMPTS):
+        user.username = allocate_username(base)
+        db.session.add(user)
+        try:
+            db.session.commit()
+            return user
+        except IntegrityError:
+            db.session.rollback()
+            # Some other constraint failed, such as a duplicate email
+            if attempt == USERNAME_ATTEMPTS - 1 or not User.query.filter_by(username=user.username).first():
+                raise